@@ -0,0 +1,104 @@
+"""
+Per-step HTTP overhead of the VoyagerEnv transport.
+
+Runs a tiny keep-alive HTTP server that answers /pause, /step and /fused_step
+instantly, then compares
+  - legacy: three bare requests.post calls per step (new connection each time)
+  - pooled: the same three calls over one HttpTransport session
+  - fused:  one /fused_step call over one HttpTransport session
+
+Usage (from the repo root, after `pip install -e .`):
+    python benchmarks/env_transport.py [--steps 500]
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from voyager.env.transport import HttpTransport
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # node's http server sets TCP_NODELAY as well
+    disable_nagle_algorithm = True
+    observation = json.dumps(json.dumps([["observe", {"inventory": {}}]]))
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        self.rfile.read(length)
+        if self.path == "/pause":
+            body = b'{"message": "Success"}'
+        else:
+            body = self.observation.encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def legacy_step(server, data):
+    requests.post(f"{server}/pause")
+    res = requests.post(f"{server}/step", json=data, timeout=600)
+    returned = res.json()
+    requests.post(f"{server}/pause")
+    return json.loads(returned)
+
+
+def pooled_step(transport, data):
+    transport.post("/pause")
+    returned = transport.post("/step", json=data).json()
+    transport.post("/pause")
+    return json.loads(returned)
+
+
+def fused_step(transport, data):
+    return json.loads(transport.post("/fused_step", json=dict(data, unpause=True)).json())
+
+
+def timeit(fn, steps):
+    fn()  # warm up
+    start = time.perf_counter()
+    for _ in range(steps):
+        fn()
+    return (time.perf_counter() - start) / steps * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--steps", type=int, default=500)
+    args = parser.parse_args()
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _StubHandler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    server = f"http://127.0.0.1:{httpd.server_address[1]}"
+    transport = HttpTransport(server)
+    data = {"code": "bot.chat('hello');", "programs": ""}
+
+    results = {
+        "legacy (3 requests, no session)": timeit(
+            lambda: legacy_step(server, data), args.steps
+        ),
+        "pooled (3 requests, session)": timeit(
+            lambda: pooled_step(transport, data), args.steps
+        ),
+        "fused (1 request, session)": timeit(
+            lambda: fused_step(transport, data), args.steps
+        ),
+    }
+    baseline = results["legacy (3 requests, no session)"]
+    for name, ms in results.items():
+        print(f"{name:<34} {ms:8.3f} ms/step  ({baseline / ms:5.2f}x)")
+    transport.close()
+    httpd.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Throughput and skill retrieval quality of the offline HashingEmbeddings.
+
+Embeds the descriptions of a skill library, repeated to --texts texts, and
+reports texts per second. Then indexes the descriptions in a VectorIndex and
+queries it with a task written from each skill name, e.g. craftStonePickaxe
+becomes "Craft stone pickaxe", counting how often the skill is in the top k.
+Runs without network access.
+
+Usage (from the repo root, after `pip install -e .`):
+    python benchmarks/hashing_embeddings.py [--skills skill_library/trial1/skill]
+"""
+import argparse
+import re
+import tempfile
+import time
+
+import voyager.utils as U
+from voyager.agents.embeddings import HashingEmbeddings
+from voyager.agents.vector_index import VectorIndex
+
+
+def task_for(name):
+    words = re.findall(r"[A-Z]?[a-z]+|\d+", name)
+    return " ".join(words).capitalize()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--skills", default="skill_library/trial1/skill")
+    parser.add_argument("--texts", type=int, default=5000)
+    parser.add_argument("--dim", type=int, default=512)
+    parser.add_argument("-k", type=int, default=5)
+    args = parser.parse_args()
+    skills = U.load_json(f"{args.skills}/skills.json")
+    embeddings = HashingEmbeddings(dim=args.dim)
+
+    descriptions = [entry["description"] for entry in skills.values()]
+    texts = (descriptions * (args.texts // len(descriptions) + 1))[: args.texts]
+    start = time.perf_counter()
+    embeddings.embed_documents(texts)
+    seconds = time.perf_counter() - start
+    print(f"embedded {len(texts)} texts at {len(texts) / seconds:.0f} texts/s")
+
+    index = VectorIndex("skill_vectordb", embeddings, tempfile.mkdtemp())
+    names = list(skills)
+    index.add_texts(descriptions, ids=names, metadatas=[{"name": n} for n in names])
+    found = 0
+    for name in names:
+        results = index.similarity_search_with_score(task_for(name), k=args.k)
+        found += name in [doc.metadata["name"] for doc, _ in results]
+    print(f"skill in top {args.k} for {found}/{len(names)} tasks")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Parse latency of ActionAgent.process_ai_message.
+
+Times parsing a typical action agent response through the javascript bridge (one
+IPC call per AST property, the previous path) and through the persistent
+ParseWorker (one pipe round trip). Both need @babel/core and @babel/generator,
+which the javascript package installs on first use.
+
+Usage (from the repo root, after `pip install -e .`):
+    python benchmarks/parse_worker.py [--runs 50]
+"""
+import argparse
+import time
+
+from langchain.schema import AIMessage
+
+from voyager.agents.action import ActionAgent
+from voyager.agents.parse_worker import ParseWorker
+
+RESPONSE = """Explain: I need more logs before I can craft planks.
+
+Code:
+```javascript
+async function collectLogs(bot, count) {
+  const logNames = ["oak_log", "birch_log", "spruce_log"];
+  for (const name of logNames) {
+    const block = bot.findBlock({ matching: mcData.blocksByName[name].id });
+    if (block) {
+      await mineBlock(bot, name, count);
+      return;
+    }
+  }
+  await exploreUntil(bot, new Vec3(1, 0, 1), 60, () => bot.findBlock({}));
+}
+
+async function craftWoodenPickaxe(bot) {
+  await collectLogs(bot, 3);
+  await craftItem(bot, "oak_planks", 3);
+  await craftItem(bot, "stick", 2);
+  await placeItem(bot, "crafting_table", bot.entity.position.offset(1, 0, 0));
+  await craftItem(bot, "wooden_pickaxe", 1);
+  bot.chat("Crafted a wooden pickaxe");
+}
+```"""
+
+
+def agent(parse_worker):
+    # only the parsing is measured, skip the llm and checkpoint setup
+    action_agent = object.__new__(ActionAgent)
+    action_agent.parse_worker = parse_worker
+    return action_agent
+
+
+def measure(name, action_agent, runs):
+    message = AIMessage(content=RESPONSE)
+    start = time.perf_counter()
+    result = action_agent.process_ai_message(message)
+    first_ms = (time.perf_counter() - start) * 1000
+    assert isinstance(result, dict), result
+    start = time.perf_counter()
+    for _ in range(runs):
+        action_agent.process_ai_message(message)
+    per_ms = (time.perf_counter() - start) / runs * 1000
+    print(f"{name:>7}: first {first_ms:8.1f} ms, then {per_ms:7.2f} ms per parse")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=50)
+    args = parser.parse_args()
+    measure("bridge", agent(None), args.runs)
+    worker = ParseWorker()
+    try:
+        measure("worker", agent(worker), args.runs)
+    finally:
+        worker.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Line throughput of SubprocessMonitor.
+
+Spawns a child that prints mineflayer-like lines as fast as it can and measures
+how many lines per second the monitor consumes, compared with the previous
+reader loop (readline, an uncompiled re.search per matcher and a synchronous
+logging.FileHandler per line).
+
+Usage (from the repo root, after `pip install -e .`):
+    python benchmarks/process_monitor.py [--lines 200000]
+"""
+import argparse
+import logging
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+import psutil
+
+from voyager.env.process_monitor import SubprocessMonitor
+
+CHILD = (
+    "import sys\n"
+    "print('Server started on port 3000', flush=True)\n"
+    "line = 'Position: Vec3 { x: 12.5, y: 64, z: -3.5 } collecting oak_log 3/8 ' * 2\n"
+    "write = sys.stdout.write\n"
+    "for i in range(LINES):\n"
+    "    write(str(i) + ' ' + line + '\\n')\n"
+)
+
+
+def legacy(commands, log_path):
+    logger = logging.getLogger("legacy_monitor")
+    handler = logging.FileHandler(f"{log_path}/legacy.log")
+    handler.setFormatter(
+        logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    )
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    process = psutil.Popen(
+        commands,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        universal_newlines=True,
+    )
+    for line in iter(process.stdout.readline, ""):
+        logger.info(line.strip())
+        if re.search(r"Server started on port (\d+)", line):
+            pass
+        if re.search(r"^(?!x)x$", line):
+            pass
+    process.wait()
+    logger.removeHandler(handler)
+    handler.close()
+
+
+def monitor(commands, log_path):
+    process_monitor = SubprocessMonitor(
+        commands=commands,
+        name="benchmark",
+        ready_match=r"Server started on port (\d+)",
+        log_path=log_path,
+    )
+    process_monitor.run()
+    process_monitor.thread.join()
+    process_monitor.log.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lines", type=int, default=200000)
+    args = parser.parse_args()
+    commands = [sys.executable, "-c", CHILD.replace("LINES", str(args.lines))]
+    for name, fn in (("legacy", legacy), ("monitor", monitor)):
+        log_path = tempfile.mkdtemp()
+        start = time.perf_counter()
+        fn(commands, log_path)
+        elapsed = time.perf_counter() - start
+        print(f"{name:>8}: {args.lines / elapsed:12,.0f} lines/s ({elapsed:.2f} s)")
+
+
+if __name__ == "__main__":
+    main()
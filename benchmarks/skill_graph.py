@@ -0,0 +1,56 @@
+"""
+Programs sent per step with and without pruning by the skill graph.
+
+Loads a skill library, then for every skill takes the code a step would run for
+it, the skill itself plus the call of its main function, and compares the
+programs the whole library bundle sends with those the skill graph keeps.
+
+Usage (from the repo root, after `pip install -e .`):
+    python benchmarks/skill_graph.py [--skills skill_library/trial1/skill]
+"""
+import argparse
+import statistics
+import time
+
+import voyager.utils as U
+from voyager.agents.program_bundle import ProgramBundle
+from voyager.agents.skill_graph import SkillGraph
+from voyager.control_primitives import load_control_primitives
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--skills", default="skill_library/trial1/skill")
+    args = parser.parse_args()
+    skills = U.load_json(f"{args.skills}/skills.json")
+    bundle = ProgramBundle.from_library(skills, load_control_primitives())
+    graph = SkillGraph()
+    start = time.perf_counter()
+    graph.update(bundle.sources)
+    update_ms = (time.perf_counter() - start) * 1000
+
+    full_bytes = sum(len(source) for source in bundle.sources)
+    counts = []
+    sizes = []
+    start = time.perf_counter()
+    for name, entry in skills.items():
+        code = f"{entry['code']}\nawait {name}(bot);"
+        sources = graph.reachable(code)
+        counts.append(len(sources))
+        sizes.append(sum(len(source) for source in sources))
+    reach_ms = (time.perf_counter() - start) / len(skills) * 1000
+
+    print(f"library: {len(skills)} skills, {len(bundle.sources)} programs")
+    print(f"graph update {update_ms:.2f} ms, reachable {reach_ms:.3f} ms per step")
+    print(
+        f"whole bundle: {len(bundle.sources)} programs, {full_bytes} bytes per step"
+    )
+    print(
+        f"pruned: {statistics.mean(counts):.1f} programs "
+        f"(max {max(counts)}), {statistics.mean(sizes):.0f} bytes "
+        f"(max {max(sizes)}) per step"
+    )
+
+
+if __name__ == "__main__":
+    main()
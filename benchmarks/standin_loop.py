@@ -0,0 +1,66 @@
+"""
+Env loop throughput against the pure Python mineflayer stand-in.
+
+Starts voyager/env/standin.py through VoyagerEnv exactly like the node server
+would be started, then times reset plus a number of steps for a few env
+configurations. Pass --events to replay a ckpt/events directory instead of the
+scripted world, and --latency to simulate program execution time.
+
+Usage (from the repo root, after `pip install -e .`):
+    python benchmarks/standin_loop.py [--steps 200] [--events ckpt/events]
+"""
+import argparse
+import tempfile
+import time
+
+from voyager.env import VoyagerEnv, standin
+
+CONFIGS = {
+    "json": {},
+    "msgpack+delta": {"wire_format": "msgpack", "delta_observations": True},
+}
+
+CODE = 'bot.chat("hello"); await mineBlock(bot, "oak_log", 1);'
+PROGRAMS = [
+    f"async function skill{i}(bot) {{ await mineBlock(bot, 'stone', {i}); }}"
+    for i in range(50)
+]
+
+
+def run(name, env_kwargs, args, port):
+    command = standin.COMMAND + ["--latency", str(args.latency)]
+    if args.events:
+        command += ["--events", args.events]
+    env = VoyagerEnv(
+        mc_port=25565,
+        server_port=port,
+        log_path=tempfile.mkdtemp(),
+        server_command=command,
+        **env_kwargs,
+    )
+    try:
+        start = time.perf_counter()
+        env.reset(options={"mode": "hard"})
+        reset_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        for _ in range(args.steps):
+            env.step(CODE, programs=PROGRAMS)
+        step_ms = (time.perf_counter() - start) / args.steps * 1000
+    finally:
+        env.close()
+    print(f"{name:>14}: reset {reset_ms:8.1f} ms, step {step_ms:6.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--steps", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--events")
+    parser.add_argument("--port", type=int, default=3100)
+    args = parser.parse_args()
+    for i, (name, env_kwargs) in enumerate(CONFIGS.items()):
+        run(name, env_kwargs, args, args.port + i)
+
+
+if __name__ == "__main__":
+    main()
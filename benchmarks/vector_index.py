@@ -0,0 +1,75 @@
+"""
+Skill retrieval latency of the in-process VectorIndex against Chroma.
+
+Fills both backends with the same random embeddings (1536 dimensions like the
+OpenAI embeddings), then times opening the persisted index and the top k
+query. Embedding the query is excluded, the embedding function returns
+precomputed vectors. Chroma is skipped when chromadb is not installed.
+
+Usage (from the repo root, after `pip install -e .`):
+    python benchmarks/vector_index.py [--skills 300] [--queries 200]
+"""
+import argparse
+import importlib.util
+import tempfile
+import time
+
+import numpy as np
+
+from voyager.agents.vector_index import BACKENDS
+
+
+class RandomEmbeddings:
+    def __init__(self, dim, seed=0):
+        self.dim = dim
+        self.rng = np.random.default_rng(seed)
+        self.vectors = {}
+
+    def vector(self, text):
+        if text not in self.vectors:
+            vector = self.rng.normal(size=self.dim)
+            self.vectors[text] = (vector / np.linalg.norm(vector)).tolist()
+        return self.vectors[text]
+
+    def embed_documents(self, texts):
+        return [self.vector(text) for text in texts]
+
+    def embed_query(self, text):
+        return self.vector(text)
+
+
+def measure(backend, embeddings, args):
+    directory = tempfile.mkdtemp()
+    index = BACKENDS[backend]("skill_vectordb", embeddings, directory)
+    names = [f"skill{i}" for i in range(args.skills)]
+    index.add_texts(names, ids=names, metadatas=[{"name": name} for name in names])
+    index.persist()
+    start = time.perf_counter()
+    index = BACKENDS[backend]("skill_vectordb", embeddings, directory)
+    open_ms = (time.perf_counter() - start) * 1000
+    queries = [f"query{i}" for i in range(args.queries)]
+    embeddings.embed_documents(queries)
+    start = time.perf_counter()
+    for query in queries:
+        index.similarity_search_with_score(query, k=args.k)
+    query_ms = (time.perf_counter() - start) / len(queries) * 1000
+    print(f"{backend:>6}: open {open_ms:8.2f} ms, query {query_ms:7.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--skills", type=int, default=300)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("-k", type=int, default=5)
+    args = parser.parse_args()
+    embeddings = RandomEmbeddings(args.dim)
+    measure("numpy", embeddings, args)
+    if importlib.util.find_spec("chromadb") is None:
+        print("chroma: skipped, chromadb is not installed")
+        return
+    measure("chroma", embeddings, args)
+
+
+if __name__ == "__main__":
+    main()
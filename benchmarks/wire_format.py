@@ -0,0 +1,114 @@
+"""
+Decode cost of the observation wire formats.
+
+Builds a synthetic event batch shaped like a long /step reply (many onChat
+events, each carrying the full observation) and compares
+  - legacy: JSON string inside JSON, decoded twice
+  - json:   single-encoded JSON
+  - msgpack: compact binary with interned keys (voyager.env.wire), decoded
+    with the msgpack C extension when installed and in pure Python otherwise
+
+Usage (from the repo root, after `pip install -e .`):
+    python benchmarks/wire_format.py [--events 500] [--repeat 20]
+"""
+import argparse
+import json
+import random
+import time
+
+from voyager.env import wire
+
+
+def make_event(name, rng):
+    blocks = ["stone", "dirt", "grass_block", "oak_log", "coal_ore", "water"]
+    event = {
+        "voxels": rng.sample(blocks, 4),
+        "status": {
+            "health": 20,
+            "food": 20,
+            "saturation": 5,
+            "oxygen": 20,
+            "position": {
+                "x": rng.uniform(-100, 100),
+                "y": 64.0,
+                "z": rng.uniform(-100, 100),
+            },
+            "velocity": {"x": 0, "y": -0.0784000015258789, "z": 0},
+            "yaw": rng.uniform(0, 6.28),
+            "pitch": 0,
+            "onGround": True,
+            "equipment": [None, None, None, None, "stone_pickaxe", None],
+            "name": "bot",
+            "timeSinceOnGround": 0,
+            "isInWater": False,
+            "isInLava": False,
+            "isInWeb": False,
+            "isCollidedHorizontally": False,
+            "isCollidedVertically": True,
+            "biome": "plains",
+            "entities": {"sheep": rng.uniform(0, 32), "cow": rng.uniform(0, 32)},
+            "timeOfDay": "day",
+            "inventoryUsed": 9,
+            "elapsedTime": rng.randint(0, 10000),
+        },
+        "inventory": {
+            "oak_log": 3,
+            "cobblestone": 41,
+            "stick": 4,
+            "crafting_table": 1,
+            "stone_pickaxe": 1,
+            "coal": 7,
+        },
+        "nearbyChests": {},
+        "blockRecords": blocks,
+    }
+    if name == "onChat":
+        event["onChat"] = "Collected 1 cobblestone, 12 more to go."
+    return [name, event]
+
+
+def pure_python_decode(data):
+    keys, pos = wire._decode(data, 1, None)
+    return wire._decode(data, pos, keys)[0]
+
+
+def timeit(fn, repeat):
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--events", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    events = [make_event("onChat", rng) for _ in range(args.events)]
+    events.append(make_event("observe", rng))
+
+    single = json.dumps(events).encode()
+    double = json.dumps(json.dumps(events)).encode()
+    binary = wire.encode(events)
+    assert wire.decode(binary) == json.loads(single)
+
+    results = [
+        ("legacy (double json)", len(double), lambda: json.loads(json.loads(double))),
+        ("json", len(single), lambda: json.loads(single)),
+        ("msgpack (pure python)", len(binary), lambda: pure_python_decode(binary)),
+    ]
+    if wire.msgpack is not None:
+        results.append(
+            ("msgpack (C extension)", len(binary), lambda: wire.decode(binary))
+        )
+    print(f"{args.events} onChat events + 1 observe")
+    for name, size, fn in results:
+        ms = timeit(fn, args.repeat)
+        print(f"{name:<22} {size / 1024:9.1f} KiB  {ms:8.2f} ms/decode")
+
+
+if __name__ == "__main__":
+    main()
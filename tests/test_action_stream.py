@@ -0,0 +1,79 @@
+import re
+import threading
+
+from langchain.schema import AIMessage
+from langchain.schema.messages import AIMessageChunk
+
+from voyager.agents.action import ActionAgent
+
+# an example block before the program the model actually wants to run
+REPLY = """Explain: ...
+For example:
+```javascript
+async function mineWoodLog(bot) {
+  await mineBlock(bot, "oak_log", 1);
+}
+```
+Code:
+```javascript
+async function craftPlanks(bot) {
+  await mineWoodLog(bot);
+  await craftItem(bot, "oak_planks", 1);
+}
+```
+"""
+TRAILING = "This function crafts oak planks from a freshly mined log."
+
+
+class FakeLLM:
+    def __init__(self):
+        # the trailing text only comes once the test lets it
+        self.release = threading.Event()
+
+    def __call__(self, messages):
+        return AIMessage(content=REPLY + TRAILING)
+
+    def stream(self, messages):
+        for i in range(0, len(REPLY), 7):
+            yield AIMessageChunk(content=REPLY[i : i + 7])
+        assert self.release.wait(timeout=5)
+        yield AIMessageChunk(content=TRAILING)
+
+
+class FakeParseWorker:
+    def parse(self, code):
+        return [
+            {"name": name, "async": True, "params": ["bot"], "body": body}
+            for body, name in re.findall(
+                r"(async function (\w+)\(bot\) \{.*?\n\})", code, re.DOTALL
+            )
+        ]
+
+
+def action_agent():
+    agent = object.__new__(ActionAgent)
+    agent.llm = FakeLLM()
+    agent.parse_worker = FakeParseWorker()
+    return agent
+
+
+def test_program_starts_when_the_code_section_closes():
+    agent = action_agent()
+    parsed_result, ai_message = agent.stream_ai_message([])
+    # returned while the model is still writing
+    assert not ai_message.done()
+    assert parsed_result == agent.process_ai_message(agent.llm([]))
+    assert parsed_result["program_name"] == "craftPlanks"
+    assert parsed_result["exec_code"] == "await craftPlanks(bot);"
+    agent.llm.release.set()
+    assert ai_message.result(timeout=5).content == REPLY + TRAILING
+
+
+def test_block_outside_the_code_section_does_not_start_the_program():
+    agent = action_agent()
+    agent.llm.release.set()
+    reply = REPLY.replace("Code:\n", "")
+    agent.llm.stream = lambda messages: iter([AIMessageChunk(content=reply)])
+    parsed_result, ai_message = agent.stream_ai_message([])
+    assert ai_message.done()
+    assert parsed_result["program_name"] == "craftPlanks"
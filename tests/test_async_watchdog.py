@@ -0,0 +1,41 @@
+import asyncio
+import time
+
+import pytest
+
+from voyager.env.async_bridge import AsyncVoyagerEnv
+
+
+class SlowWatchdog:
+    reason = "no ticks for 30.0s"
+
+    def join(self):
+        # on_stall stopping the process
+        time.sleep(0.3)
+
+
+class Process:
+    def tail(self, lines):
+        return ["last log line"]
+
+
+def test_waiting_for_a_stall_does_not_block_the_loop():
+    env = object.__new__(AsyncVoyagerEnv)
+    env.watchdog = SlowWatchdog()
+    env.mineflayer = Process()
+    ticks = 0
+
+    async def other_env():
+        nonlocal ticks
+        while True:
+            await asyncio.sleep(0.01)
+            ticks += 1
+
+    async def main():
+        task = asyncio.create_task(other_env())
+        with pytest.raises(RuntimeError, match="no ticks for 30.0s"):
+            await env.araise_if_stalled(ConnectionError())
+        task.cancel()
+
+    asyncio.run(main())
+    assert ticks >= 10
@@ -0,0 +1,88 @@
+import pytest
+
+from voyager.env.delta import DeltaDecoder, DeltaEncoder
+
+
+def observe(position, inventory, **extra):
+    return [
+        "observe",
+        {
+            "status": {"health": 20.0, "position": position},
+            "inventory": inventory,
+            "voxels": ["grass_block", "oak_log"],
+            **extra,
+        },
+    ]
+
+
+STEPS = [
+    [observe({"x": 0, "y": 64}, {})],
+    [
+        ["onChat", {"onChat": "Collected 1 oak_log", "status": {"health": 20.0}}],
+        observe({"x": 1, "y": 64}, {"oak_log": 1}),
+    ],
+    [observe({"x": 1, "y": 64}, {"oak_log": 1})],
+    [observe({"x": 2, "y": 65}, {"oak_planks": 4})],
+]
+
+
+def rebuilt(events, decoded):
+    # the decoder carries the last observation fields into events that lack them
+    return [
+        [name, {**decoded_fields, **fields}]
+        for (name, fields), (_, decoded_fields) in zip(events, decoded)
+    ]
+
+
+def test_round_trip():
+    encoder, decoder = DeltaEncoder(), DeltaDecoder()
+    for events in STEPS:
+        decoded = decoder.decode(encoder.encode(events, decoder.seq))
+        assert decoded == rebuilt(events, decoded)
+        assert decoded[-1] == events[-1]
+
+
+def test_unchanged_fields_are_not_sent():
+    encoder, decoder = DeltaEncoder(), DeltaDecoder()
+    decoder.decode(encoder.encode(STEPS[0], decoder.seq))
+    message = encoder.encode(STEPS[2], decoder.seq)
+    assert message["base"] == 1
+    assert message["events"] == [
+        ["observe", {"status": STEPS[2][0][1]["status"], "inventory": {"oak_log": 1}}]
+    ]
+    assert decoder.decode(message) == STEPS[2]
+
+
+def test_dropped_message_triggers_a_full_observation():
+    encoder, decoder = DeltaEncoder(), DeltaDecoder()
+    decoder.decode(encoder.encode(STEPS[0], decoder.seq))
+    # lost on the way, the decoder still asks for a delta on sequence 1
+    encoder.encode(STEPS[1], decoder.seq)
+    message = encoder.encode(STEPS[2], decoder.seq)
+    assert message["base"] is None
+    assert message["events"] == STEPS[2]
+    assert decoder.decode(message) == STEPS[2]
+    assert decoder.seq == message["seq"]
+
+
+def test_delta_on_a_missing_base_resyncs():
+    encoder, decoder = DeltaEncoder(), DeltaDecoder()
+    decoder.decode(encoder.encode(STEPS[0], decoder.seq))
+    skipped = encoder.encode(STEPS[1], decoder.seq)
+    message = encoder.encode(STEPS[2], skipped["seq"])
+    with pytest.raises(RuntimeError, match="based on sequence 2"):
+        decoder.decode(message)
+    # the decoder forgot everything, so the next request gets everything
+    assert decoder.seq is None
+    message = encoder.encode(STEPS[3], decoder.seq)
+    assert message["base"] is None
+    assert decoder.decode(message) == STEPS[3]
+
+
+def test_encoder_reset_sends_a_full_observation():
+    encoder, decoder = DeltaEncoder(), DeltaDecoder()
+    decoder.decode(encoder.encode(STEPS[0], decoder.seq))
+    encoder.reset()
+    message = encoder.encode(STEPS[0], decoder.seq)
+    assert message["base"] is None
+    assert decoder.decode(message) == STEPS[0]
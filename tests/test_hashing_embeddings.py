@@ -0,0 +1,93 @@
+"""Resume checkpoints built with OpenAI embeddings using the offline backend."""
+import os
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+
+import numpy as np
+
+import voyager.utils as U
+from voyager.agents import CurriculumAgent, SkillManager
+from voyager.agents.embeddings import EmbeddingService, HashingEmbeddings
+from voyager.agents.vector_index import VectorIndex
+
+SKILLS = {
+    "craftStonePickaxe": "Craft a stone pickaxe from cobblestone and sticks.",
+    "killPig": "Find a pig and kill it for porkchops.",
+    "mineWoodLog": "Mine a wood log from the nearest tree.",
+}
+QUESTION = "What are the blocks that I can find in the forest in Minecraft?"
+
+
+class OpenAILikeEmbeddings:
+    model = "text-embedding-ada-002"
+
+    def embed_documents(self, texts):
+        return np.random.default_rng(0).normal(size=(len(texts), 1536)).tolist()
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def openai_ckpt(ckpt_dir):
+    """What a run with the OpenAI embeddings leaves behind."""
+    skills = {
+        name: {"code": f"async function {name}(bot) {{}}", "description": text}
+        for name, text in SKILLS.items()
+    }
+    U.f_mkdir(f"{ckpt_dir}/skill/vectordb")
+    U.dump_json(skills, f"{ckpt_dir}/skill/skills.json")
+    index = VectorIndex(
+        "skill_vectordb", OpenAILikeEmbeddings(), f"{ckpt_dir}/skill/vectordb"
+    )
+    index.add_texts(
+        list(SKILLS.values()),
+        ids=list(SKILLS),
+        metadatas=[{"name": name} for name in SKILLS],
+    )
+    index.persist()
+
+    U.f_mkdir(f"{ckpt_dir}/curriculum/vectordb")
+    U.dump_json([], f"{ckpt_dir}/curriculum/completed_tasks.json")
+    U.dump_json([], f"{ckpt_dir}/curriculum/failed_tasks.json")
+    U.dump_json({QUESTION: "Oak logs."}, f"{ckpt_dir}/curriculum/qa_cache.json")
+    index = VectorIndex(
+        "qa_cache_questions_vectordb",
+        OpenAILikeEmbeddings(),
+        f"{ckpt_dir}/curriculum/vectordb",
+    )
+    index.add_texts([QUESTION])
+    index.persist()
+
+
+def test_resume_skill_manager_with_hashing(tmp_path):
+    ckpt_dir = str(tmp_path)
+    openai_ckpt(ckpt_dir)
+    skill_manager = SkillManager(
+        ckpt_dir=ckpt_dir,
+        resume=True,
+        embeddings=EmbeddingService(HashingEmbeddings()),
+    )
+    skills = skill_manager.retrieve_skills("Kill a pig")
+    assert skills[0] == "async function killPig(bot) {}"
+
+
+def test_resume_curriculum_qa_cache_with_hashing(tmp_path):
+    ckpt_dir = str(tmp_path)
+    openai_ckpt(ckpt_dir)
+    curriculum = CurriculumAgent(
+        ckpt_dir=ckpt_dir,
+        resume=True,
+        core_inventory_items=r".*_log|.*_planks",
+        embeddings="hashing",
+    )
+    curriculum.run_qa_step1_ask_questions = lambda **kwargs: (
+        ["What are the blocks that I can find in the forest in Minecraft ?"],
+        [],
+    )
+
+    def answer(question):
+        raise AssertionError("the cached answer should be used")
+
+    curriculum.run_qa_step2_answer_questions = answer
+    questions, answers = curriculum.run_qa(events=[], chest_observation="")
+    assert (questions, answers) == ([QUESTION], ["Oak logs."])
@@ -0,0 +1,51 @@
+"""Retries after an unusable reply must reach the model, not the cache."""
+import os
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+
+from langchain.schema import AIMessage, HumanMessage, SystemMessage
+
+from voyager.agents import CriticAgent, CurriculumAgent
+from voyager.agents.llm_cache import CachedChatModel, LLMCache
+
+
+class ScriptedModel:
+    model_name = "scripted"
+    temperature = 0
+    max_tokens = None
+    n = 1
+    model_kwargs = {}
+
+    def __init__(self, replies):
+        self.replies = list(replies)
+        self.calls = 0
+
+    def __call__(self, messages):
+        self.calls += 1
+        return AIMessage(content=self.replies.pop(0))
+
+
+MESSAGES = [SystemMessage(content="system"), HumanMessage(content="human")]
+
+
+def test_critic_retry_after_parse_failure_reaches_model(tmp_path):
+    model = ScriptedModel(["not json", '{"success": true, "critique": ""}'])
+    cache = LLMCache(str(tmp_path / "cache.sqlite"))
+    critic = object.__new__(CriticAgent)
+    critic.llm = CachedChatModel(model, cache)
+    assert critic.ai_check_task_success(MESSAGES) == (True, "")
+    assert model.calls == 2
+    # only the usable reply is left for resumed runs
+    assert critic.ai_check_task_success(MESSAGES) == (True, "")
+    assert model.calls == 2
+    assert cache.stats()["entries"] == 1
+
+
+def test_curriculum_retry_after_parse_failure_reaches_model(tmp_path):
+    model = ScriptedModel(["garbage", "Reasoning: ...\nTask: Mine 1 wood log"])
+    curriculum = object.__new__(CurriculumAgent)
+    curriculum.llm = CachedChatModel(model, LLMCache(str(tmp_path / "c.sqlite")))
+    curriculum.get_task_context = lambda task: "context"
+    task, context = curriculum.propose_next_ai_task(messages=MESSAGES)
+    assert task == "Mine 1 wood log"
+    assert model.calls == 2
@@ -0,0 +1,84 @@
+import shutil
+
+import pytest
+
+from voyager.agents.parse_worker import ParseWorker, ParseWorkerError
+
+# answers like parse_worker.js after flooding stderr with warnings, written
+# synchronously so the worker blocks once the pipe is full and nothing is lost on exit
+NOISY_WORKER = """
+const fs = require("fs");
+const readline = require("readline");
+const warning = "warning: ".padEnd(1023, "x") + "\\n";
+for (let i = 0; i < 1024; i++) fs.writeSync(2, warning);
+const lines = readline.createInterface({ input: process.stdin });
+lines.on("line", (line) => {
+    const request = JSON.parse(line);
+    if (request.code === "exit") {
+        fs.writeSync(2, "worker crashed\\n");
+        process.exit(1);
+    }
+    for (let i = 0; i < 256; i++) fs.writeSync(2, warning);
+    process.stdout.write(JSON.stringify({ id: request.id, functions: [] }) + "\\n");
+});
+process.stdout.write(JSON.stringify({ ready: true }) + "\\n");
+"""
+
+needs_node = pytest.mark.skipif(
+    shutil.which("node") is None, reason="node is not installed"
+)
+
+
+def noisy_worker(tmp_path):
+    script = tmp_path / "noisy_worker.js"
+    script.write_text(NOISY_WORKER)
+    worker = ParseWorker(timeout=10)
+    worker.SCRIPT = str(script)
+    return worker
+
+
+def test_missing_node_is_a_parse_worker_error():
+    worker = ParseWorker(node="/nonexistent/node")
+    with pytest.raises(ParseWorkerError, match="Could not start"):
+        worker.parse("async function f(bot) {}")
+
+
+@needs_node
+def test_stderr_output_does_not_block_replies(tmp_path):
+    worker = noisy_worker(tmp_path)
+    try:
+        for _ in range(5):
+            assert worker.parse("async function f(bot) {}") == []
+    finally:
+        worker.close()
+
+
+@needs_node
+def test_exit_reports_the_end_of_stderr(tmp_path):
+    worker = noisy_worker(tmp_path)
+    with pytest.raises(ParseWorkerError, match="worker crashed"):
+        worker.parse("exit")
+
+
+@needs_node
+def test_functions_list_the_identifiers_they_call():
+    worker = ParseWorker()
+    code = """
+async function craftPlanks(bot) {
+    // mineBlock(bot, "oak_log", 1) is not needed anymore
+    bot.chat("call craftItem(bot) later");
+    await mineWoodLog(bot);
+    await Promise.all([placeItem(bot, "crafting_table")]);
+    bot.once("goal_reached", onGoalReached);
+}
+"""
+    try:
+        functions = worker.parse(code)
+    except ParseWorkerError as e:
+        pytest.skip(f"babel is not installed: {e}")
+    finally:
+        worker.close()
+    calls = set(functions[0]["calls"])
+    assert {"mineWoodLog", "placeItem", "onGoalReached"} <= calls
+    # only mentioned in the comment and the string
+    assert not {"mineBlock", "craftItem"} & calls
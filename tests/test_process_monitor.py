@@ -0,0 +1,33 @@
+import sys
+
+from voyager.env.process_monitor import SubprocessMonitor, _LogWriter
+
+
+def test_stop_closes_the_log(tmp_path):
+    monitor = SubprocessMonitor(
+        [sys.executable, "-c", "print('ready', flush=True)"],
+        "echo",
+        ready_match=r"ready",
+        log_path=str(tmp_path),
+    )
+    monitor.run()
+    monitor.thread.join(timeout=5)
+    monitor.stop()
+    assert not monitor.log.thread.is_alive()
+    with open(monitor.log.path) as f:
+        text = f.read()
+    assert "INFO - ready\n" in text
+    assert text.endswith("INFO - Stopping subprocess.\n")
+
+
+def test_write_after_close_reopens_the_log(tmp_path):
+    log = _LogWriter(str(tmp_path / "monitor.log"), "monitor")
+    log.write("first")
+    log.close()
+    log.write("second")
+    log.flush()
+    log.close()
+    assert not log.thread.is_alive()
+    with open(log.path) as f:
+        lines = f.read().splitlines()
+    assert [line.split(" - ")[-1] for line in lines] == ["first", "second"]
@@ -0,0 +1,54 @@
+import copy
+import pickle
+
+from voyager.agents.program_bundle import ProgramBundle
+
+MINE_WOOD_LOG = """async function mineWoodLog(bot) {
+  // ü is one character but two bytes
+  await mineBlock(bot, "oak_log", 1);
+}"""
+CRAFT_PLANKS = """async function craftPlanks(bot) {
+  await craftItem(bot, "oak_planks", 1);
+}"""
+MINE_BLOCK = "async function mineBlock(bot, name, count = 1) {}"
+SKILLS = {
+    "mineWoodLog": {"code": MINE_WOOD_LOG, "description": ""},
+    "craftPlanks": {"code": CRAFT_PLANKS, "description": ""},
+}
+
+
+def test_offsets_slice_back_to_each_program():
+    bundle = ProgramBundle.from_library(SKILLS, [MINE_BLOCK])
+    assert bundle.names == ("mineWoodLog", "craftPlanks", "mineBlock")
+    for name, source in zip(bundle.names, bundle.sources):
+        start, end = bundle.offsets[name]
+        assert bundle[start:end] == source
+        assert bundle.program(name) == source
+    assert bundle == f"{MINE_WOOD_LOG}\n\n{CRAFT_PLANKS}\n\n{MINE_BLOCK}\n\n"
+
+
+def test_primitive_sharing_a_skill_name_keeps_both():
+    skills = {"mineBlock": {"code": MINE_WOOD_LOG, "description": ""}}
+    bundle = ProgramBundle.from_library(skills, [MINE_BLOCK])
+    assert bundle.program("mineBlock") == MINE_WOOD_LOG
+    assert bundle.program("primitive:mineBlock") == MINE_BLOCK
+
+
+def test_digest_does_not_depend_on_the_order():
+    entries = [("mineWoodLog", MINE_WOOD_LOG), ("craftPlanks", CRAFT_PLANKS)]
+    bundle = ProgramBundle(entries)
+    reordered = ProgramBundle(entries[::-1])
+    assert bundle != reordered
+    assert bundle.digest == reordered.digest
+    changed = ProgramBundle([entries[0], ("craftPlanks", MINE_BLOCK)])
+    assert changed.digest != bundle.digest
+    renamed = ProgramBundle([entries[0], ("craftSticks", CRAFT_PLANKS)])
+    assert renamed.digest != bundle.digest
+
+
+def test_copies_keep_the_programs():
+    bundle = ProgramBundle.from_library(SKILLS, [MINE_BLOCK])
+    for other in [copy.copy(bundle), pickle.loads(pickle.dumps(bundle))]:
+        assert other == bundle
+        assert other.offsets == bundle.offsets
+        assert other.digest == bundle.digest
@@ -0,0 +1,62 @@
+"""A program that outlives its step must stop acting, see mineflayer/lib/preempt.js."""
+import json
+import os
+import shutil
+import subprocess
+
+import pytest
+
+PREEMPT = os.path.join(
+    os.path.dirname(__file__), "..", "voyager", "env", "mineflayer", "lib", "preempt.js"
+)
+
+SCRIPT = """
+const { guardBot } = require(process.argv[1]);
+const bot = {
+    actions: 0,
+    waitForTicks(ticks) {
+        return new Promise((resolve) => setTimeout(resolve, ticks));
+    },
+    chat() {
+        this.actions++;
+    },
+};
+const token = { cancelled: false, reason: null };
+const stepBot = guardBot(bot, token);
+const program = (async (bot) => {
+    while (true) {
+        await bot.waitForTicks(1);
+        bot.chat("still here");
+    }
+})(stepBot);
+let error = null;
+program.catch((e) => {
+    error = e.message;
+});
+setTimeout(() => {
+    // what the step handler does on a spent budget or an abort
+    token.cancelled = true;
+    token.reason = "tick budget of 20 exceeded";
+    const before = bot.actions;
+    setTimeout(() => {
+        console.log(
+            JSON.stringify({ before: before, after: bot.actions, error: error })
+        );
+    }, 50);
+}, 30);
+"""
+
+
+@pytest.mark.skipif(shutil.which("node") is None, reason="node is not installed")
+def test_infinite_program_stops_when_step_is_cancelled():
+    output = subprocess.run(
+        ["node", "-e", SCRIPT, os.path.abspath(PREEMPT)],
+        capture_output=True,
+        text=True,
+        timeout=30,
+        check=True,
+    ).stdout
+    result = json.loads(output)
+    assert result["before"] > 0
+    assert result["after"] == result["before"]
+    assert result["error"] == "Program stopped: tick budget of 20 exceeded"
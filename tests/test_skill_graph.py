@@ -0,0 +1,85 @@
+import re
+
+from voyager.agents.parse_worker import ParseWorkerError
+from voyager.agents.skill_graph import SkillGraph
+
+MINE_WOOD_LOG = """async function mineWoodLog(bot) {
+  await mineBlock(bot, "oak_log", 1);
+}"""
+CRAFT_PLANKS = """async function craftPlanks(bot) {
+  // craftSticks(bot) comes later
+  await mineWoodLog(bot);
+  await craftItem(bot, "oak_planks", 1);
+}"""
+CRAFT_STICKS = """async function craftSticks(bot) {
+  await craftItem(bot, "stick", 4);
+}"""
+MINE_BLOCK = "async function mineBlock(bot, name, count = 1) {}"
+CRAFT_ITEM = "async function craftItem(bot, name, count = 1) {}"
+LIBRARY = [MINE_WOOD_LOG, CRAFT_PLANKS, CRAFT_STICKS, MINE_BLOCK, CRAFT_ITEM]
+
+
+class FakeParseWorker:
+    """
+    Calls like parse_worker.js reports them, comments and strings left out.
+    """
+
+    def __init__(self):
+        self.requests = 0
+
+    def parse(self, code):
+        self.requests += 1
+        code = re.sub(r"//.*|\"[^\"]*\"", "", code)
+        name = re.search(r"function (\w+)", code).group(1)
+        calls = sorted(set(re.findall(r"(\w+)\(", code)) - {name})
+        return [{"name": name, "async": True, "params": ["bot"], "calls": calls}]
+
+
+class BrokenParseWorker:
+    def __init__(self):
+        self.requests = 0
+
+    def parse(self, code):
+        self.requests += 1
+        raise ParseWorkerError("Could not start the parse worker")
+
+
+def test_skill_used_by_a_kept_skill_is_kept():
+    graph = SkillGraph(FakeParseWorker())
+    graph.update(LIBRARY)
+    assert graph.reachable("await craftPlanks(bot);") == (
+        MINE_WOOD_LOG,
+        CRAFT_PLANKS,
+        MINE_BLOCK,
+        CRAFT_ITEM,
+    )
+
+
+def test_names_in_comments_and_strings_are_not_dependencies():
+    graph = SkillGraph(FakeParseWorker())
+    graph.update(LIBRARY)
+    code = 'bot.chat("craftSticks next");\nawait craftPlanks(bot);'
+    assert CRAFT_STICKS not in graph.reachable(code)
+
+
+def test_without_a_worker_every_mention_keeps_a_program():
+    graph = SkillGraph()
+    graph.update(LIBRARY)
+    # too many programs, never too few
+    assert graph.reachable("await craftPlanks(bot);") == tuple(LIBRARY)
+
+
+def test_unavailable_worker_is_asked_once():
+    worker = BrokenParseWorker()
+    graph = SkillGraph(worker)
+    graph.update(LIBRARY)
+    assert worker.requests == 1
+    assert MINE_WOOD_LOG in graph.reachable("await craftPlanks(bot);")
+
+
+def test_programs_are_analyzed_once():
+    worker = FakeParseWorker()
+    graph = SkillGraph(worker)
+    graph.update(LIBRARY)
+    graph.update(LIBRARY[::-1])
+    assert worker.requests == len(LIBRARY)
@@ -0,0 +1,145 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+
+from voyager.agents import CurriculumAgent
+from voyager.agents.embeddings import HashingEmbeddings
+from voyager.agents.vector_index import VectorIndex
+from voyager.voyager import Voyager
+
+
+class Curriculum:
+    def __init__(self):
+        # the stale proposal only finishes once the test lets it
+        self.release = threading.Event()
+
+    def task_signature(self, *, events, chest_observation):
+        return events
+
+    def propose_next_task(self, *, events, chest_observation, max_retries):
+        if events == "old":
+            assert self.release.wait(timeout=5)
+        return f"task for {events}", ""
+
+
+class Action:
+    def render_chest_observation(self):
+        return "Chests: None"
+
+
+def voyager():
+    agent = object.__new__(Voyager)
+    agent.curriculum_agent = Curriculum()
+    agent.action_agent = Action()
+    agent.speculation_executor = ThreadPoolExecutor(max_workers=2)
+    agent.speculation = None
+    return agent
+
+
+def test_discarding_a_running_proposal_does_not_wait():
+    agent = voyager()
+    future = agent.speculation_executor.submit(
+        agent.curriculum_agent.propose_next_task,
+        events="old",
+        chest_observation="",
+        max_retries=5,
+    )
+    agent.speculation = ("old", future)
+    time.sleep(0.05)
+    start = time.perf_counter()
+    agent.discard_speculation()
+    assert time.perf_counter() - start < 0.1
+    assert agent.speculation is None
+    agent.curriculum_agent.release.set()
+
+
+def test_stale_proposal_is_not_used_and_not_waited_for():
+    agent = voyager()
+    future = agent.speculation_executor.submit(
+        agent.curriculum_agent.propose_next_task,
+        events="old",
+        chest_observation="",
+        max_retries=5,
+    )
+    agent.speculation = ("old", future)
+    agent.last_events = "new"
+    time.sleep(0.05)
+    start = time.perf_counter()
+    assert agent.propose_next_task() == ("task for new", "")
+    assert time.perf_counter() - start < 0.1
+    assert not future.done()
+    agent.curriculum_agent.release.set()
+    assert future.result(timeout=5) == ("task for old", "")
+
+
+def curriculum_agent(tmp_path):
+    agent = object.__new__(CurriculumAgent)
+    agent.ckpt_dir = str(tmp_path)
+    os.makedirs(tmp_path / "curriculum")
+    agent.completed_tasks = []
+    agent.failed_tasks = []
+    agent.warm_up = {"optional_inventory_items": 0}
+    agent.qa_cache = {}
+    agent.qa_lock = threading.Lock()
+    agent.qa_max_workers = 2
+    agent.qa_cache_questions_vectordb = VectorIndex(
+        "qa_cache_questions_vectordb", HashingEmbeddings(), str(tmp_path)
+    )
+    return agent
+
+
+def events(entities):
+    status = {
+        "biome": "plains",
+        "timeOfDay": "day",
+        "entities": entities,
+        "health": 20.0,
+        "food": 20.0,
+        "position": {"x": 0.0, "y": 64.0, "z": 0.0},
+        "equipment": [None] * 6,
+        "inventoryUsed": 0,
+    }
+    observe = {
+        "voxels": ["grass_block"],
+        "blockRecords": ["grass_block"],
+        "status": status,
+        "inventory": {},
+    }
+    return [["observe", observe]]
+
+
+def test_signature_depends_on_nearby_entities(tmp_path):
+    agent = curriculum_agent(tmp_path)
+
+    def signature(entities):
+        return agent.task_signature(
+            events=events(entities), chest_observation="Chests: None\n\n"
+        )
+
+    assert signature({"pig": 3.0, "cow": 8.0}) == signature({"pig": 9.0, "cow": 2.0})
+    assert signature({"pig": 3.0}) != signature({"sheep": 3.0})
+
+
+def test_concurrent_proposals_share_the_qa_cache(tmp_path):
+    agent = curriculum_agent(tmp_path)
+    question = "What are the blocks that I can find in the plains in Minecraft?"
+    agent.run_qa_step1_ask_questions = lambda **kwargs: ([question], ["concepts"])
+
+    def answer(question):
+        time.sleep(0.1)
+        return "Answer: grass, dirt and flowers"
+
+    agent.run_qa_step2_answer_questions = answer
+    copy = agent.speculative_copy({"task": "Mine 1 wood log", "success": False})
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        futures = [
+            executor.submit(a.run_qa, events=events({}), chest_observation="")
+            for a in [agent, copy]
+        ]
+        results = [future.result() for future in futures]
+    assert results[0] == results[1]
+    assert agent.qa_cache == {question: "Answer: grass, dirt and flowers"}
+    assert agent.qa_cache_questions_vectordb.count() == 1
@@ -0,0 +1,46 @@
+import json
+
+import pytest
+
+from voyager.env.standin import ReplayWorld
+
+
+def observe(x, **event):
+    return dict(
+        event,
+        status={"position": {"x": x, "y": 64.0, "z": 0.0}, "elapsedTime": 20},
+        inventory={},
+    )
+
+
+def write(events_dir, name, events):
+    with open(events_dir / name, "w") as f:
+        json.dump(events, f)
+
+
+def test_replay_skips_steps_without_events(tmp_path):
+    write(tmp_path, "Mine_1_wood_log_20240101_120000", [["observe", observe(1)]])
+    # a program that did not parse
+    write(tmp_path, "Mine_1_wood_log_20240101_120001", [])
+    write(tmp_path, "Craft_planks_20240101_120002", [["observe", observe(2)]])
+    world = ReplayWorld(str(tmp_path))
+    assert len(world.records) == 2
+    world.start({"reset": "hard"})
+    assert world.step("")[-1][1]["status"]["position"]["x"] == 1
+    world.start({})
+    assert world.step("")[-1][1]["status"]["position"]["x"] == 2
+
+
+def test_replay_orders_steps_of_the_same_second_by_name(tmp_path):
+    names = ["c_20240101_120000", "a_20240101_120000", "b_20240101_120000"]
+    for x, name in enumerate(names):
+        write(tmp_path, name, [["observe", observe(x)]])
+    world = ReplayWorld(str(tmp_path))
+    xs = [world.step("")[-1][1]["status"]["position"]["x"] for _ in names]
+    assert xs == [1, 2, 0]
+
+
+def test_replay_without_events_is_rejected(tmp_path):
+    write(tmp_path, "Mine_1_wood_log_20240101_120000", [])
+    with pytest.raises(ValueError, match="No recorded events"):
+        ReplayWorld(str(tmp_path))
@@ -0,0 +1,26 @@
+from voyager.env.stream import RepeatedErrorPolicy
+
+
+def event(name, value):
+    return {"type": "event", "name": name, "value": value, "status": {}}
+
+
+def test_repeated_progress_chat_does_not_abort():
+    policy = RepeatedErrorPolicy(max_repeats=3)
+    for _ in range(10):
+        assert policy(event("onChat", "Collected 1 log")) is None
+        assert policy(event("onChat", "Placed torch")) is None
+
+
+def test_repeated_failure_chat_aborts():
+    policy = RepeatedErrorPolicy(max_repeats=3)
+    message = event("onChat", "No iron_ore nearby, please explore first")
+    assert policy(message) is None
+    assert policy(message) is None
+    assert "No iron_ore nearby" in policy(message)
+
+
+def test_repeated_error_aborts():
+    policy = RepeatedErrorPolicy(max_repeats=2)
+    assert policy(event("onError", "TypeError: x is undefined")) is None
+    assert policy(event("onError", "TypeError: x is undefined"))
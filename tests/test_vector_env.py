@@ -0,0 +1,36 @@
+import pytest
+
+from voyager.env import vector
+from voyager.env.vector import VoyagerVectorEnv
+
+
+class FakeEnv:
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+
+    def close(self):
+        pass
+
+
+@pytest.fixture(autouse=True)
+def fake_envs(monkeypatch):
+    monkeypatch.setattr(vector, "VoyagerEnv", FakeEnv)
+
+
+def test_every_bot_gets_its_own_ports():
+    env = VoyagerVectorEnv(25565, 3, server_port=3000, standby_port=3100)
+    ports = [(e.kwargs["server_port"], e.kwargs["standby_port"]) for e in env.envs]
+    assert ports == [(3000, 3100), (3001, 3101), (3002, 3102)]
+    env.close()
+
+
+def test_no_standby_port_by_default():
+    env = VoyagerVectorEnv(25565, 2)
+    assert [e.kwargs["standby_port"] for e in env.envs] == [None, None]
+    env.close()
+
+
+@pytest.mark.parametrize("standby_port", [2998, 3000, 3002])
+def test_standby_ports_must_not_overlap_server_ports(standby_port):
+    with pytest.raises(ValueError, match="overlap"):
+        VoyagerVectorEnv(25565, 3, server_port=3000, standby_port=standby_port)
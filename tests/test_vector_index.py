@@ -0,0 +1,109 @@
+import os
+
+import numpy as np
+
+import voyager.agents.vector_index as vector_index
+from voyager.agents.embeddings import HashingEmbeddings
+from voyager.agents.vector_index import VectorIndex
+
+TEXTS = {
+    "craftStonePickaxe": "Craft a stone pickaxe from cobblestone and sticks.",
+    "killPig": "Find a pig and kill it for porkchops.",
+    "mineWoodLog": "Mine a wood log from the nearest tree.",
+}
+
+
+class RandomEmbeddings:
+    """Stands in for a 1536 dimensional OpenAI model."""
+
+    model = "text-embedding-ada-002"
+
+    def __init__(self):
+        self.rng = np.random.default_rng(0)
+
+    def embed_documents(self, texts):
+        return self.rng.normal(size=(len(texts), 1536)).tolist()
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def build(directory, embeddings):
+    index = VectorIndex("skill_vectordb", embeddings, directory)
+    names = list(TEXTS)
+    index.add_texts(
+        [TEXTS[name] for name in names],
+        ids=names,
+        metadatas=[{"name": name} for name in names],
+    )
+    index.persist()
+    return index
+
+
+def test_reopening_with_another_model_reembeds(tmp_path):
+    build(str(tmp_path), RandomEmbeddings())
+    files = {name: os.path.getmtime(tmp_path / name) for name in os.listdir(tmp_path)}
+    index = VectorIndex("skill_vectordb", HashingEmbeddings(), str(tmp_path))
+    assert index.vectors.shape == (3, 512)
+    results = index.similarity_search_with_score("kill a pig", k=1)
+    assert results[0][0].metadata["name"] == "killPig"
+    # the stored index is only replaced by an explicit persist
+    assert {n: os.path.getmtime(tmp_path / n) for n in os.listdir(tmp_path)} == files
+
+
+def test_reopening_with_the_same_model_keeps_vectors(tmp_path):
+    build(str(tmp_path), HashingEmbeddings())
+    index = VectorIndex("skill_vectordb", HashingEmbeddings(), str(tmp_path))
+    assert isinstance(index.vectors, np.memmap)
+
+
+class Collection:
+    def get(self, include):
+        return {
+            "ids": list(TEXTS),
+            "documents": list(TEXTS.values()),
+            "metadatas": [{"name": name} for name in TEXTS],
+            "embeddings": np.ones((len(TEXTS), 1536)).tolist(),
+        }
+
+
+class Chroma:
+    opened = 0
+
+    def __init__(self, **kwargs):
+        Chroma.opened += 1
+        self._collection = Collection()
+
+
+def test_chroma_import_is_saved_once(tmp_path, monkeypatch):
+    monkeypatch.setattr(vector_index, "Chroma", Chroma)
+    Chroma.opened = 0
+    (tmp_path / "chroma-embeddings.parquet").write_bytes(b"")
+    index = VectorIndex("skill_vectordb", HashingEmbeddings(), str(tmp_path))
+    assert Chroma.opened == 1
+    # 1536 dimensional vectors cannot come from the 512 dimensional hashing model
+    results = index.similarity_search_with_score("mine a wood log", k=1)
+    assert results[0][0].metadata["name"] == "mineWoodLog"
+    assert index.vectors.shape == (3, 512)
+    index = VectorIndex("skill_vectordb", HashingEmbeddings(), str(tmp_path))
+    assert Chroma.opened == 1
+    assert isinstance(index.vectors, np.memmap)
+    assert index.ids == list(TEXTS)
+
+
+def test_chroma_import_of_a_skill_library_is_saved_elsewhere(tmp_path, monkeypatch):
+    monkeypatch.setattr(vector_index, "Chroma", Chroma)
+    Chroma.opened = 0
+    library = tmp_path / "library"
+    library.mkdir()
+    (library / "chroma.sqlite3").write_bytes(b"")
+    ckpt = str(tmp_path / "ckpt")
+    VectorIndex("skill_vectordb", HashingEmbeddings(), str(library), ckpt)
+    assert os.listdir(library) == ["chroma.sqlite3"]
+    index = VectorIndex("skill_vectordb", HashingEmbeddings(), str(library), ckpt)
+    assert Chroma.opened == 1
+    assert isinstance(index.vectors, np.memmap)
+    # a newer collection is imported again
+    os.utime(library / "chroma.sqlite3", (2e9, 2e9))
+    VectorIndex("skill_vectordb", HashingEmbeddings(), str(library), ckpt)
+    assert Chroma.opened == 2
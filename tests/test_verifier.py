@@ -0,0 +1,123 @@
+from voyager.agents.verifier import TaskVerifier
+
+verifier = TaskVerifier()
+
+
+def observation(inventory=None, equipment=None, voxels=None):
+    return {
+        "inventory": dict(inventory or {}),
+        "status": {"equipment": list(equipment or [None] * 6)},
+        "voxels": list(voxels or []),
+    }
+
+
+def verify(task, start, final, saves=()):
+    events = [["onSave", {"onSave": save}] for save in saves]
+    events.append(["observe", final])
+    return verifier.verify(events=events, task=task, start=start)
+
+
+def test_mine_counts_what_was_gained():
+    start = observation({"cobblestone": 2})
+    assert verify("Mine 3 stone", start, observation({"cobblestone": 5})) == (
+        True,
+        "",
+    )
+    # enough stone in the end, but only two of them are new
+    assert verify("Mine 3 stone", start, observation({"cobblestone": 4})) is None
+
+
+def test_mine_fails_with_a_critique():
+    success, critique = verify(
+        "Mine 3 iron ore", observation(), observation({"raw_iron": 1})
+    )
+    assert success is False
+    assert critique == (
+        "You have 1 raw iron but the task needs 3. Mining iron ore gives raw iron."
+    )
+
+
+def test_mine_wrong_variant():
+    success, critique = verify(
+        "Mine 1 oak log", observation(), observation({"birch_log": 1})
+    )
+    assert success is False
+    assert critique == "You have 0 oak log but the task needs 1."
+
+
+def test_mine_any_variant_of_a_family():
+    assert verify("Mine 1 wood log", observation(), observation({"birch_log": 1})) == (
+        True,
+        "",
+    )
+
+
+def test_collect_counts_what_was_gained():
+    start = observation({"wheat_seeds": 1})
+    assert verify("Collect 2 wheat seeds", start, observation({"wheat_seeds": 3}))[0]
+
+
+def test_craft_existing_item_is_not_a_success():
+    start = observation({"crafting_table": 1})
+    assert verify("Craft 1 crafting table", start, start) is None
+    assert verify(
+        "Craft 1 crafting table", start, observation({"crafting_table": 2})
+    ) == (True, "")
+
+
+def test_craft_counts_equipped_items():
+    final = observation(equipment=[None, "iron_chestplate", None, None, None, None])
+    assert verify("Craft 1 iron chestplate", observation(), final) == (True, "")
+
+
+def test_smelt_counts_the_output():
+    start = observation({"raw_iron": 3})
+    final = observation({"iron_ingot": 3})
+    assert verify("Smelt 3 raw iron", start, final) == (True, "")
+    success, critique = verify("Smelt 3 raw iron", start, observation({"raw_iron": 3}))
+    assert success is False
+    assert critique.startswith("You have 0 iron ingot but the task needs 3.")
+
+
+def test_cook_counts_the_cooked_food():
+    final = observation({"cooked_porkchop": 1})
+    assert verify("Cook 1 porkchop", observation(), final) == (True, "")
+
+
+def test_kill_needs_the_save_events():
+    final = observation()
+    assert verify("Kill 1 pig", observation(), final, saves=["pig_killed"]) == (
+        True,
+        "",
+    )
+    # it may have happened in an earlier step
+    assert verify("Kill 1 pig", observation(), final) is None
+
+
+def test_place_needs_a_new_block():
+    start = observation(voxels=["crafting_table", "dirt"])
+    assert verify("Place a crafting table", start, start) is None
+    final = observation(voxels=["furnace", "dirt"])
+    assert verify("Place a furnace", start, final) == (True, "")
+    assert verify(
+        "Place a crafting table", start, start, saves=["crafting_table_placed"]
+    ) == (True, "")
+
+
+def test_equip_needs_the_item_equipped():
+    final = observation(equipment=[None, "iron_chestplate", None, None, None, None])
+    assert verify("Equip iron chestplate", observation(), final) == (True, "")
+    # worn before the task started
+    assert verify("Equip iron chestplate", final, final) is None
+
+
+def test_equip_item_in_inventory_but_not_equipped():
+    final = observation({"iron_chestplate": 1})
+    assert verify("Equip iron chestplate", observation(), final) == (
+        False,
+        "You have iron chestplate but it is not equipped.",
+    )
+
+
+def test_unknown_task_is_left_to_the_llm():
+    assert verify("Build a house", observation(), observation()) is None
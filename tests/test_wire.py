@@ -0,0 +1,85 @@
+import json
+import os
+import shutil
+import subprocess
+
+import pytest
+
+from voyager.env import wire
+
+WIRE_JS = os.path.join(os.path.dirname(wire.__file__), "mineflayer", "lib", "wire.js")
+
+needs_node = pytest.mark.skipif(
+    shutil.which("node") is None, reason="node is not installed"
+)
+
+EVENTS = [
+    ["onChat", {"onChat": "Collected 1 oak_log"}],
+    [
+        "observe",
+        {
+            "voxels": ["grass_block", "oak_log"],
+            "status": {
+                "health": 20,
+                "food": 19.5,
+                "position": {"x": -12.5, "y": 64, "z": 300000},
+                "equipment": ["wooden_pickaxe", None, None, None, None, None],
+                "entities": {"zombie": 16.25},
+            },
+            "inventory": {"oak_log": 1, "stick": 70000},
+            # a field no mineflayer event has yet
+            "weather": {"raining": True, "thunder": False, "ticks": -1},
+            "nearbyChests": {},
+            "log": "x" * 300,
+        },
+    ],
+]
+
+
+@pytest.fixture(params=["msgpack", "pure python"])
+def decoder(request, monkeypatch):
+    if request.param == "msgpack":
+        if wire.msgpack is None:
+            pytest.skip("msgpack is not installed")
+    else:
+        monkeypatch.setattr(wire, "msgpack", None)
+    return wire.decode
+
+
+def test_round_trip_matches_json(decoder):
+    data = wire.encode(EVENTS)
+    assert decoder(data) == json.loads(json.dumps(EVENTS))
+
+
+def test_repeated_keys_are_sent_once():
+    data = wire.encode([{"status": {"x": 1}}, {"status": {"x": 2}}])
+    assert data.count(b"status") == 1
+
+
+def test_key_outside_the_table_is_rejected(decoder):
+    data = bytearray(wire.encode({"status": 1}))
+    # point the only key at index 1 of a one entry table
+    data[data.rindex(0x81) + 1] = 1
+    with pytest.raises(IndexError):
+        decoder(bytes(data))
+
+
+@needs_node
+def test_node_encoding_matches_json(decoder):
+    script = (
+        f"const wire = require({json.dumps(WIRE_JS)});"
+        "const events = JSON.parse(require('fs').readFileSync(0, 'utf8'));"
+        # dropped by JSON.stringify, so they must be dropped by msgpack too
+        "events[1][1].status.unset = undefined;"
+        "process.stdout.write(JSON.stringify([wire.encode(events).toString('hex'),"
+        " JSON.stringify(events)]));"
+    )
+    result = subprocess.run(
+        ["node", "-e", script],
+        input=json.dumps(EVENTS),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    data, text = json.loads(result.stdout)
+    assert decoder(bytes.fromhex(data)) == json.loads(text) == EVENTS
@@ -2,3 +2,6 @@ from .action import ActionAgent
 from .critic import CriticAgent
 from .curriculum import CurriculumAgent
 from .skill import SkillManager
+from .llm_cache import LLMCache, CachedChatModel
+from .program_bundle import ProgramBundle
+from .embeddings import EmbeddingService, HashingEmbeddings, make_embeddings
@@ -1,5 +1,7 @@
 import re
+import threading
 import time
+from concurrent.futures import Future
 
 import voyager.utils as U
 from javascript import require
@@ -10,6 +12,16 @@ from langchain.schema import AIMessage, HumanMessage, SystemMessage
 from voyager.prompts import load_prompt
 from voyager.control_primitives_context import load_control_primitives_context
 
+from .llm_cache import CachedChatModel
+from .parse_worker import JavaScriptParseError, ParseWorker, ParseWorkerError
+
+
+CODE_BLOCK = re.compile(r"```(?:javascript|js)(.*?)```", re.DOTALL)
+# the closed code block of the Code: section, the last one of the response format
+CODE_SECTION = re.compile(
+    r"^Code:\s*```(?:javascript|js)(.*?)```", re.DOTALL | re.MULTILINE
+)
+
 
 class ActionAgent:
     def __init__(
@@ -21,7 +33,14 @@ class ActionAgent:
         resume=False,
         chat_log=True,
         execution_error=True,
+        llm_cache=None,
+        parse_worker=True,
     ):
+        """
+        :param llm_cache: answer repeated prompts from this LLMCache
+        :param parse_worker: parse programs in a long-lived node process instead of
+        through the javascript bridge, see ParseWorker
+        """
         self.ckpt_dir = ckpt_dir
         self.chat_log = chat_log
         self.execution_error = execution_error
@@ -36,8 +55,15 @@ class ActionAgent:
             temperature=temperature,
             request_timeout=request_timout,
         )
+        if llm_cache is not None:
+            self.llm = CachedChatModel(self.llm, llm_cache, name="action")
+        self.parse_worker = ParseWorker() if parse_worker else None
 
-    def update_chest_memory(self, chests):
+    def update_chest_memory(self, chests, save=True):
+        """
+        :param save: also write the chest memory to disk, pass False to call
+        save_chest_memory later, e.g. off the critical path
+        """
         for position, chest in chests.items():
             if position in self.chest_memory:
                 if isinstance(chest, dict):
@@ -51,6 +77,10 @@ class ActionAgent:
                 if chest != "Invalid":
                     print(f"\033[32mAction Agent saving chest {position}: {chest}\033[0m")
                     self.chest_memory[position] = chest
+        if save:
+            self.save_chest_memory()
+
+    def save_chest_memory(self):
         U.dump_json(self.chest_memory, f"{self.ckpt_dir}/action/chest_memory.json")
 
     def render_chest_observation(self):
@@ -112,6 +142,13 @@ class ActionAgent:
                 chat_messages.append(event["onChat"])
             elif event_type == "onError":
                 error_messages.append(event["onError"])
+            elif event_type == "onTimeout":
+                timeout = event["onTimeout"]
+                error_messages.append(
+                    f"Execution timed out: the {timeout['budget']} budget of "
+                    f"{timeout['limit']} ran out after {timeout['ticks']} ticks "
+                    f"({timeout['seconds']:.1f}s)"
+                )
             elif event_type == "onDamage":
                 damage_messages.append(event["onDamage"])
             elif event_type == "observe":
@@ -201,6 +238,85 @@ class ActionAgent:
     def process_ai_message(self, message):
         assert isinstance(message, AIMessage)
 
+        code = "\n".join(CODE_BLOCK.findall(message.content))
+        functions = None
+        if self.parse_worker is not None:
+            try:
+                functions = self.parse_worker.parse(code)
+            except JavaScriptParseError as e:
+                return f"Error parsing action response (before program execution): {e}"
+            except ParseWorkerError as e:
+                print(f"\033[32mParse worker unavailable, using the bridge: {e}\033[0m")
+        if functions is None:
+            functions = self.parse_with_bridge(code)
+            if isinstance(functions, str):
+                return functions
+        try:
+            return self.build_program(functions)
+        except Exception as e:
+            return f"Error parsing action response (before program execution): {e}"
+
+    def stream_ai_message(self, messages):
+        """
+        Stream the response and return the program as soon as the code block of the
+        Code: section closes. The response format ends with that section, so no
+        further block can change the main function, and the rest of the response is
+        read while the program runs. A block outside the Code: section, e.g. an
+        example, never starts the program early.
+        :return: the result of process_ai_message and a future of the full AIMessage
+        """
+        chunks = iter(self.llm.stream(messages))
+        content = ""
+        for chunk in chunks:
+            content += chunk.content
+            if not CODE_SECTION.search(content):
+                continue
+            parsed_result = self.process_ai_message(AIMessage(content=content))
+            if not isinstance(parsed_result, dict):
+                # the full response gets the same error, or a later block fixes it
+                break
+            print(
+                f"\033[34m****Action Agent ai message (code complete)****\n{content}\033[0m"
+            )
+            ai_message = Future()
+            threading.Thread(
+                target=self._finish_stream,
+                args=(chunks, content, parsed_result, ai_message),
+                daemon=True,
+            ).start()
+            return parsed_result, ai_message
+        for chunk in chunks:
+            content += chunk.content
+        ai_message = AIMessage(content=content)
+        print(f"\033[34m****Action Agent ai message****\n{content}\033[0m")
+        future = Future()
+        future.set_result(ai_message)
+        return self.process_ai_message(ai_message), future
+
+    def _finish_stream(self, chunks, content, parsed_result, future):
+        blocks = len(CODE_BLOCK.findall(content))
+        try:
+            for chunk in chunks:
+                content += chunk.content
+        except Exception as e:
+            future.set_exception(e)
+            return
+        message = AIMessage(content=content)
+        if (
+            len(CODE_BLOCK.findall(content)) > blocks
+            and self.process_ai_message(message) != parsed_result
+        ):
+            print(
+                "\033[34mAction Agent: more code followed the Code: section, it was "
+                "not executed\033[0m"
+            )
+        future.set_result(message)
+
+    def parse_with_bridge(self, code):
+        """
+        Parse through the javascript bridge, one call per AST property.
+        :return: the functions like ParseWorker.parse, or an error message
+        """
         retry = 3
         error = None
         while retry > 0:
@@ -208,53 +324,49 @@ class ActionAgent:
                 babel = require("@babel/core")
                 babel_generator = require("@babel/generator").default
 
-                code_pattern = re.compile(r"```(?:javascript|js)(.*?)```", re.DOTALL)
-                code = "\n".join(code_pattern.findall(message.content))
                 parsed = babel.parse(code)
                 functions = []
                 assert len(list(parsed.program.body)) > 0, "No functions found"
                 for i, node in enumerate(parsed.program.body):
                     if node.type != "FunctionDeclaration":
                         continue
-                    node_type = (
-                        "AsyncFunctionDeclaration"
-                        if node["async"]
-                        else "FunctionDeclaration"
-                    )
                     functions.append(
                         {
                             "name": node.id.name,
-                            "type": node_type,
+                            "async": bool(node["async"]),
                             "body": babel_generator(node).code,
-                            "params": list(node["params"]),
+                            "params": [param.name for param in node["params"]],
                         }
                     )
-                # find the last async function
-                main_function = None
-                for function in reversed(functions):
-                    if function["type"] == "AsyncFunctionDeclaration":
-                        main_function = function
-                        break
-                assert (
-                    main_function is not None
-                ), "No async function found. Your main function must be async."
-                assert (
-                    len(main_function["params"]) == 1
-                    and main_function["params"][0].name == "bot"
-                ), f"Main function {main_function['name']} must take a single argument named 'bot'"
-                program_code = "\n\n".join(function["body"] for function in functions)
-                exec_code = f"await {main_function['name']}(bot);"
-                return {
-                    "program_code": program_code,
-                    "program_name": main_function["name"],
-                    "exec_code": exec_code,
-                }
+                return functions
             except Exception as e:
                 retry -= 1
                 error = e
                 time.sleep(1)
         return f"Error parsing action response (before program execution): {error}"
 
+    def build_program(self, functions):
+        assert len(functions) > 0, "No functions found"
+        # find the last async function
+        main_function = None
+        for function in reversed(functions):
+            if function["async"]:
+                main_function = function
+                break
+        assert (
+            main_function is not None
+        ), "No async function found. Your main function must be async."
+        assert (
+            len(main_function["params"]) == 1 and main_function["params"][0] == "bot"
+        ), f"Main function {main_function['name']} must take a single argument named 'bot'"
+        program_code = "\n\n".join(function["body"] for function in functions)
+        exec_code = f"await {main_function['name']}(bot);"
+        return {
+            "program_code": program_code,
+            "program_name": main_function["name"],
+            "exec_code": exec_code,
+        }
+
     def summarize_chatlog(self, events):
         def filter_item(message: str):
             craft_pattern = r"I cannot make \w+ because I need: (.*)"
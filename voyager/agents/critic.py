@@ -3,6 +3,9 @@ from voyager.utils.json_utils import fix_and_parse_json
 from langchain.chat_models import ChatOpenAI
 from langchain.schema import HumanMessage, SystemMessage
 
+from .llm_cache import CachedChatModel, evict
+from .verifier import TaskVerifier
+
 
 class CriticAgent:
     def __init__(
@@ -11,14 +14,33 @@ class CriticAgent:
         temperature=0,
         request_timout=120,
         mode="auto",
+        llm_cache=None,
+        verifier="on",
     ):
+        """
+        :param llm_cache: answer repeated prompts from this LLMCache
+        :param verifier: rule based check of countable tasks like "Mine 3 iron ore",
+        "on" decides those tasks without the llm, "shadow" runs both and only counts
+        how often they agree, "off" always asks the llm
+        """
         self.llm = ChatOpenAI(
             model_name=model_name,
             temperature=temperature,
             request_timeout=request_timout,
         )
+        if llm_cache is not None:
+            self.llm = CachedChatModel(self.llm, llm_cache, name="critic")
         assert mode in ["auto", "manual"]
         self.mode = mode
+        assert verifier in ["on", "shadow", "off"]
+        self.verifier_mode = verifier
+        self.verifier = TaskVerifier() if verifier != "off" else None
+        self.verifier_stats = {
+            "checked": 0,
+            "resolved": 0,
+            "compared": 0,
+            "agreed": 0,
+        }
 
     def render_system_message(self):
         system_message = SystemMessage(content=load_prompt("critic"))
@@ -40,6 +62,10 @@ class CriticAgent:
             if event_type == "onError":
                 print(f"\033[31mCritic Agent: Error occurs {event['onError']}\033[0m")
                 return None
+            if event_type == "onTimeout":
+                budget = event["onTimeout"]["budget"]
+                print(f"\033[31mCritic Agent: Execution timed out ({budget} budget)\033[0m")
+                return None
 
         observation = ""
 
@@ -108,14 +134,31 @@ class CriticAgent:
             return response["success"], response["critique"]
         except Exception as e:
             print(f"\033[31mError parsing critic response: {e} Trying again!\033[0m")
+            # the same messages would get the same cached reply
+            evict(self.llm, messages)
             return self.ai_check_task_success(
                 messages=messages,
                 max_retries=max_retries - 1,
             )
 
+    def rule_check_task_success(self, *, events, task, start):
+        self.verifier_stats["checked"] += 1
+        verdict = self.verifier.verify(events=events, task=task, start=start)
+        if verdict is not None:
+            self.verifier_stats["resolved"] += 1
+            print(
+                f"\033[31m****Critic Agent rule based verdict****\n"
+                f"success: {verdict[0]}, critique: {verdict[1]}\033[0m"
+            )
+        return verdict
+
     def check_task_success(
-        self, *, events, task, context, chest_observation, max_retries=5
+        self, *, events, task, context, chest_observation, max_retries=5, start=None
     ):
+        """
+        :param start: the observation the task started from, the rule based check
+        needs it to tell what the task gained and is skipped without it
+        """
         human_message = self.render_human_message(
             events=events,
             task=task,
@@ -131,8 +174,28 @@ class CriticAgent:
         if self.mode == "manual":
             return self.human_check_task_success()
         elif self.mode == "auto":
-            return self.ai_check_task_success(
+            verdict = None
+            if (
+                self.verifier is not None
+                and human_message is not None
+                and start is not None
+            ):
+                verdict = self.rule_check_task_success(
+                    events=events, task=task, start=start
+                )
+                if verdict is not None and self.verifier_mode == "on":
+                    return verdict
+            success, critique = self.ai_check_task_success(
                 messages=messages, max_retries=max_retries
             )
+            if verdict is not None:
+                self.verifier_stats["compared"] += 1
+                if verdict[0] == success:
+                    self.verifier_stats["agreed"] += 1
+                else:
+                    print(
+                        f"\033[31mCritic Agent: rule based verdict {verdict[0]} disagrees with the llm on {task}\033[0m"
+                    )
+            return success, critique
         else:
             raise ValueError(f"Invalid critic agent mode: {self.mode}")
@@ -1,15 +1,20 @@
 from __future__ import annotations
 
+import copy
 import random
 import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 import voyager.utils as U
 from voyager.prompts import load_prompt
 from voyager.utils.json_utils import fix_and_parse_json
 from langchain.chat_models import ChatOpenAI
-from langchain.embeddings.openai import OpenAIEmbeddings
 from langchain.schema import HumanMessage, SystemMessage
-from langchain.vectorstores import Chroma
+
+from .embeddings import make_embeddings
+from .llm_cache import CachedChatModel, evict
+from .vector_index import open_index
 
 
 class CurriculumAgent:
@@ -25,7 +30,21 @@ class CurriculumAgent:
         mode="auto",
         warm_up=None,
         core_inventory_items: str | None = None,
+        llm_cache=None,
+        qa_max_workers=4,
+        embeddings="openai",
+        retrieval_backend="numpy",
     ):
+        """
+        :param llm_cache: answer repeated prompts of both the curriculum and the
+        question answering model from this LLMCache
+        :param qa_max_workers: how many questions are answered by the qa model at once
+        :param embeddings: embeddings shared with the other agents, e.g. an
+        EmbeddingService, or a backend name for make_embeddings, "openai" or the
+        offline "hashing"
+        :param retrieval_backend: "numpy" for the in-process VectorIndex of the qa
+        cache questions, which imports an existing Chroma vectordb, or "chroma"
+        """
         self.llm = ChatOpenAI(
             model_name=model_name,
             temperature=temperature,
@@ -36,11 +55,15 @@ class CurriculumAgent:
             temperature=qa_temperature,
             request_timeout=request_timout,
         )
+        if llm_cache is not None:
+            self.llm = CachedChatModel(self.llm, llm_cache, name="curriculum")
+            self.qa_llm = CachedChatModel(self.qa_llm, llm_cache, name="curriculum_qa")
         assert mode in [
             "auto",
             "manual",
         ], f"mode {mode} not supported"
         self.mode = mode
+        self.qa_max_workers = qa_max_workers
         self.ckpt_dir = ckpt_dir
         U.f_mkdir(f"{ckpt_dir}/curriculum/vectordb")
         if resume:
@@ -54,17 +77,22 @@ class CurriculumAgent:
             self.completed_tasks = []
             self.failed_tasks = []
             self.qa_cache = {}
+        if isinstance(embeddings, str):
+            embeddings = make_embeddings(embeddings)
+        # guards the qa cache and its vectordb, a speculative copy shares them
+        self.qa_lock = threading.Lock()
         # vectordb for qa cache
-        self.qa_cache_questions_vectordb = Chroma(
+        self.qa_cache_questions_vectordb = open_index(
+            retrieval_backend,
             collection_name="qa_cache_questions_vectordb",
-            embedding_function=OpenAIEmbeddings(),
+            embedding_function=embeddings,
             persist_directory=f"{ckpt_dir}/curriculum/vectordb",
         )
-        assert self.qa_cache_questions_vectordb._collection.count() == len(
+        assert self.qa_cache_questions_vectordb.count() == len(
             self.qa_cache
         ), (
             f"Curriculum Agent's qa cache question vectordb is not synced with qa_cache.json.\n"
-            f"There are {self.qa_cache_questions_vectordb._collection.count()} questions in vectordb "
+            f"There are {self.qa_cache_questions_vectordb.count()} questions in vectordb "
             f"but {len(self.qa_cache)} questions in qa_cache.json.\n"
             f"Did you set resume=False when initializing the agent?\n"
             f"You may need to manually delete the qa cache question vectordb directory for running from scratch.\n"
@@ -303,6 +331,8 @@ class CurriculumAgent:
             print(
                 f"\033[35mError parsing curriculum response: {e}. Trying again!\033[0m"
             )
+            # the same messages would get the same cached reply
+            evict(self.llm, messages)
             return self.propose_next_ai_task(
                 messages=messages,
                 max_retries=max_retries - 1,
@@ -333,22 +363,37 @@ class CurriculumAgent:
             return
         if info["success"]:
             print(f"\033[35mCompleted task {task}.\033[0m")
-            self.completed_tasks.append(task)
         else:
             print(
                 f"\033[35mFailed to complete task {task}. Skipping to next task.\033[0m"
             )
-            self.failed_tasks.append(task)
+        self.completed_tasks, self.failed_tasks = self.predict_progress(info)
 
         # clean up tasks and dump to disk
         self.clean_up_tasks()
 
-    def clean_up_tasks(self):
+    def predict_progress(self, info):
+        """
+        :return: the completed and failed tasks after update_exploration_progress(info),
+        without changing the agent
+        """
+        completed_tasks = list(self.completed_tasks)
+        failed_tasks = list(self.failed_tasks)
+        task = info["task"]
+        if not task.startswith("Deposit useless items into the chest at"):
+            if info["success"]:
+                completed_tasks.append(task)
+            else:
+                failed_tasks.append(task)
+        return self._clean_up_tasks(completed_tasks, failed_tasks)
+
+    @staticmethod
+    def _clean_up_tasks(completed_tasks, failed_tasks):
         updated_completed_tasks = []
         # record repeated failed tasks
-        updated_failed_tasks = self.failed_tasks
+        updated_failed_tasks = failed_tasks
         # dedup but keep order
-        for task in self.completed_tasks:
+        for task in completed_tasks:
             if task not in updated_completed_tasks:
                 updated_completed_tasks.append(task)
 
@@ -356,9 +401,12 @@ class CurriculumAgent:
         for task in updated_completed_tasks:
             while task in updated_failed_tasks:
                 updated_failed_tasks.remove(task)
+        return updated_completed_tasks, updated_failed_tasks
 
-        self.completed_tasks = updated_completed_tasks
-        self.failed_tasks = updated_failed_tasks
+    def clean_up_tasks(self):
+        self.completed_tasks, self.failed_tasks = self._clean_up_tasks(
+            self.completed_tasks, self.failed_tasks
+        )
 
         # dump to json
         U.dump_json(
@@ -366,6 +414,43 @@ class CurriculumAgent:
         )
         U.dump_json(self.failed_tasks, f"{self.ckpt_dir}/curriculum/failed_tasks.json")
 
+    # observation fields a task proposal depends on, position, time, health and
+    # hunger drift on every step and are left out
+    SPECULATION_KEYS = [
+        "biome",
+        "nearby_blocks",
+        "nearby_entities",
+        "inventory",
+        "equipment",
+        "chests",
+        "completed_tasks",
+        "failed_tasks",
+    ]
+
+    def speculative_copy(self, info):
+        """
+        A shallow copy of the agent whose progress is the one after the rollout ends
+        with info. It shares the models and the qa cache, which qa_lock guards, so it
+        can run next to the agent itself.
+        """
+        agent = copy.copy(self)
+        agent.completed_tasks, agent.failed_tasks = self.predict_progress(info)
+        return agent
+
+    def task_signature(self, *, events, chest_observation):
+        """
+        The inputs of propose_next_task that matter, two proposals with the same
+        signature are interchangeable.
+        """
+        observation = self.render_observation(
+            events=events, chest_observation=chest_observation
+        )
+        # the entities are listed by distance, only which ones are near matters
+        observation["nearby_entities"] = tuple(
+            sorted(events[-1][1]["status"]["entities"])
+        )
+        return tuple(observation[key] for key in self.SPECULATION_KEYS)
+
     def decompose_task(self, task, events):
         messages = [
             SystemMessage(
@@ -387,30 +472,57 @@ class CurriculumAgent:
         )
         questions = []
         answers = []
-        for question in questions_new:
-            if self.qa_cache_questions_vectordb._collection.count() > 0:
-                docs_and_scores = (
-                    self.qa_cache_questions_vectordb.similarity_search_with_score(
-                        question, k=1
+        # positions of the questions that are not cached yet, answered below
+        uncached = {}
+        with self.qa_lock:
+            for question in questions_new:
+                if question in self.qa_cache:
+                    questions.append(question)
+                    answers.append(self.qa_cache[question])
+                    continue
+                if self.qa_cache_questions_vectordb.count() > 0:
+                    docs_and_scores = (
+                        self.qa_cache_questions_vectordb.similarity_search_with_score(
+                            question, k=1
+                        )
+                    )
+                    if docs_and_scores and docs_and_scores[0][1] < 0.05:
+                        question_cached = docs_and_scores[0][0].page_content
+                        assert question_cached in self.qa_cache
+                        answer_cached = self.qa_cache[question_cached]
+                        questions.append(question_cached)
+                        answers.append(answer_cached)
+                        continue
+                uncached.setdefault(question, []).append(len(questions))
+                questions.append(question)
+                answers.append(None)
+        if uncached:
+            # one llm round trip for all questions instead of one per question
+            with ThreadPoolExecutor(
+                max_workers=min(self.qa_max_workers, len(uncached))
+            ) as executor:
+                new_answers = list(
+                    executor.map(
+                        lambda question: self.run_qa_step2_answer_questions(
+                            question=question
+                        ),
+                        uncached,
                     )
                 )
-                if docs_and_scores and docs_and_scores[0][1] < 0.05:
-                    question_cached = docs_and_scores[0][0].page_content
-                    assert question_cached in self.qa_cache
-                    answer_cached = self.qa_cache[question_cached]
-                    questions.append(question_cached)
-                    answers.append(answer_cached)
-                    continue
-            answer = self.run_qa_step2_answer_questions(question=question)
-            assert question not in self.qa_cache
-            self.qa_cache[question] = answer
-            self.qa_cache_questions_vectordb.add_texts(
-                texts=[question],
-            )
-            U.dump_json(self.qa_cache, f"{self.ckpt_dir}/curriculum/qa_cache.json")
-            self.qa_cache_questions_vectordb.persist()
-            questions.append(question)
-            answers.append(answer)
+            with self.qa_lock:
+                added = []
+                for (question, positions), answer in zip(
+                    uncached.items(), new_answers
+                ):
+                    # a proposal running next to this one may have answered it
+                    if question in self.qa_cache:
+                        answer = self.qa_cache[question]
+                    else:
+                        self.qa_cache[question] = answer
+                        added.append(question)
+                    for i in positions:
+                        answers[i] = answer
+                self.save_qa_cache(added)
         assert len(questions_new) == len(questions) == len(answers)
         return questions, answers
 
@@ -420,19 +532,29 @@ class CurriculumAgent:
             f"How to {task.replace('_', ' ').replace(' ore', '').replace(' ores', '').replace('.', '').strip().lower()}"
             f" in Minecraft?"
         )
-        if question in self.qa_cache:
-            answer = self.qa_cache[question]
-        else:
+        with self.qa_lock:
+            answer = self.qa_cache.get(question)
+        if answer is None:
             answer = self.run_qa_step2_answer_questions(question=question)
-            self.qa_cache[question] = answer
-            self.qa_cache_questions_vectordb.add_texts(
-                texts=[question],
-            )
-            U.dump_json(self.qa_cache, f"{self.ckpt_dir}/curriculum/qa_cache.json")
-            self.qa_cache_questions_vectordb.persist()
+            with self.qa_lock:
+                if question in self.qa_cache:
+                    answer = self.qa_cache[question]
+                else:
+                    self.qa_cache[question] = answer
+                    self.save_qa_cache([question])
         context = f"Question: {question}\n{answer}"
         return context
 
+    def save_qa_cache(self, questions):
+        """
+        Index the newly answered questions and write the cache, with qa_lock held.
+        """
+        if not questions:
+            return
+        self.qa_cache_questions_vectordb.add_texts(texts=questions)
+        U.dump_json(self.qa_cache, f"{self.ckpt_dir}/curriculum/qa_cache.json")
+        self.qa_cache_questions_vectordb.persist()
+
     def render_system_message_qa_step1_ask_questions(self):
         return SystemMessage(content=load_prompt("curriculum_qa_step1_ask_questions"))
 
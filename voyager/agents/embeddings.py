@@ -0,0 +1,250 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+from langchain.embeddings.base import Embeddings
+from langchain.embeddings.openai import OpenAIEmbeddings
+
+
+# words, splitting camelCase skill names like mineWoodLog into mine wood log
+WORD = re.compile(r"[A-Z]?[a-z]+|[A-Z]+(?![a-z])|\d+")
+# common english words and the boilerplate around every skill description
+STOPWORDS = {
+    "a",
+    "an",
+    "and",
+    "async",
+    "bot",
+    "by",
+    "for",
+    "from",
+    "function",
+    "in",
+    "is",
+    "it",
+    "of",
+    "on",
+    "the",
+    "then",
+    "to",
+    "with",
+}
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    Deterministic local embeddings by feature hashing, for running retrieval and
+    the QA cache without network access, e.g. in benchmarks and regression tests.
+
+    Every word and word n-gram of the text is hashed with crc32 into one of dim
+    signed buckets, counts are damped with log(1 + count) and the vector is
+    normalized. Texts sharing words end up close, there is no notion of synonyms.
+    """
+
+    def __init__(self, dim=512, ngrams=2):
+        """
+        :param dim: vector size
+        :param ngrams: longest word n-gram hashed next to the single words
+        """
+        self.dim = dim
+        self.ngrams = ngrams
+        # part of the EmbeddingService cache key
+        self.model = f"hashing-{dim}-{ngrams}"
+
+    def features(self, text):
+        words = [
+            word
+            for word in (match.lower() for match in WORD.findall(text))
+            if word not in STOPWORDS
+        ]
+        features = list(words)
+        for n in range(2, self.ngrams + 1):
+            features += [" ".join(words[i : i + n]) for i in range(len(words) - n + 1)]
+        return features
+
+    def embed(self, text):
+        hashes = np.array(
+            [zlib.crc32(feature.encode("utf-8")) for feature in self.features(text)],
+            dtype=np.int64,
+        )
+        vector = np.zeros(self.dim, dtype=np.float64)
+        if len(hashes):
+            # the top bit decides the sign, so colliding features tend to cancel
+            signs = np.where(hashes >> 31, -1.0, 1.0)
+            np.add.at(vector, hashes % self.dim, signs)
+            vector = np.sign(vector) * np.log1p(np.abs(vector))
+            norm = np.linalg.norm(vector)
+            if norm:
+                vector /= norm
+        return vector.tolist()
+
+    def embed_documents(self, texts):
+        return [self.embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self.embed(text)
+
+
+BACKENDS = {"openai": OpenAIEmbeddings, "hashing": HashingEmbeddings}
+
+
+def model_name(embeddings):
+    """
+    :return: the name identifying which model produced a vector, e.g.
+    text-embedding-ada-002 or hashing-512-2
+    """
+    return getattr(embeddings, "model", type(embeddings).__name__)
+
+
+def make_embeddings(backend="openai", **kwargs):
+    """
+    :param backend: "openai" for OpenAIEmbeddings or "hashing" for the offline
+    HashingEmbeddings
+    """
+    if backend not in BACKENDS:
+        raise ValueError(
+            f"Unknown embedding backend {backend}, expected one of {list(BACKENDS)}"
+        )
+    return BACKENDS[backend](**kwargs)
+
+
+class EmbeddingService(Embeddings):
+    """
+    One embedding model for the whole process, shared by the skill manager and the
+    curriculum agent, with every text embedded at most once.
+
+    Vectors are keyed by the sha256 of the model name and the text. They are kept
+    in an in-memory LRU and, when a path is given, in a sqlite file, so resuming a
+    checkpoint or rebuilding an index embeds nothing it has seen before. Texts
+    that miss both are deduplicated and sent to the model in batches.
+    """
+
+    def __init__(
+        self, embeddings=None, path=None, max_memory_entries=10000, batch_size=64
+    ):
+        """
+        :param embeddings: the langchain embeddings to wrap, OpenAIEmbeddings by
+        default
+        :param path: sqlite file keeping the vectors across runs, None to keep them
+        in memory only
+        :param max_memory_entries: how many vectors the in-memory LRU holds
+        :param batch_size: how many texts are sent to the model in one request
+        """
+        self.embeddings = embeddings if embeddings is not None else OpenAIEmbeddings()
+        self.model = model_name(self.embeddings)
+        self.max_memory_entries = max_memory_entries
+        self.batch_size = batch_size
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.requests = 0
+        self.db = None
+        if path:
+            dirname = os.path.dirname(path)
+            if dirname:
+                os.makedirs(dirname, exist_ok=True)
+            self.db = sqlite3.connect(path, check_same_thread=False)
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, "
+                "model TEXT, vector BLOB)"
+            )
+            self.db.commit()
+
+    def make_key(self, text):
+        return hashlib.sha256(f"{self.model}\n{text}".encode("utf-8")).hexdigest()
+
+    def embed_documents(self, texts):
+        keys = [self.make_key(text) for text in texts]
+        vectors = {}
+        with self.lock:
+            for key in keys:
+                if key in vectors:
+                    continue
+                vector = self.memory.get(key)
+                if vector is not None:
+                    self.memory.move_to_end(key)
+                    self.memory_hits += 1
+                    vectors[key] = vector
+            missing = [key for key in dict.fromkeys(keys) if key not in vectors]
+            for key, vector in self._load(missing).items():
+                self.disk_hits += 1
+                vectors[key] = vector
+                self._remember(key, vector)
+        pending = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors:
+                pending[key] = text
+        if pending:
+            new = self._embed(pending)
+            with self.lock:
+                self.misses += len(new)
+                for key, vector in new.items():
+                    self._remember(key, vector)
+                self._store(new)
+            vectors.update(new)
+        return [vectors[key].tolist() for key in keys]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+    def _embed(self, pending):
+        keys = list(pending)
+        texts = list(pending.values())
+        vectors = {}
+        for i in range(0, len(texts), self.batch_size):
+            self.requests += 1
+            batch = self.embeddings.embed_documents(texts[i : i + self.batch_size])
+            for key, vector in zip(keys[i : i + self.batch_size], batch):
+                vectors[key] = np.asarray(vector, dtype=np.float32)
+        return vectors
+
+    def _remember(self, key, vector):
+        self.memory[key] = vector
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_memory_entries:
+            self.memory.popitem(last=False)
+
+    def _load(self, keys):
+        if self.db is None or not keys:
+            return {}
+        vectors = {}
+        # stay below the sqlite limit on bound parameters
+        for i in range(0, len(keys), 500):
+            chunk = keys[i : i + 500]
+            rows = self.db.execute(
+                "SELECT key, vector FROM embeddings WHERE key IN "
+                f"({', '.join('?' * len(chunk))})",
+                chunk,
+            ).fetchall()
+            for key, blob in rows:
+                vectors[key] = np.frombuffer(blob, dtype=np.float32)
+        return vectors
+
+    def _store(self, vectors):
+        if self.db is None:
+            return
+        self.db.executemany(
+            "INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?)",
+            [(key, self.model, vector.tobytes()) for key, vector in vectors.items()],
+        )
+        self.db.commit()
+
+    def stats(self):
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "requests": self.requests,
+        }
+
+    def close(self):
+        if self.db is not None:
+            with self.lock:
+                self.db.close()
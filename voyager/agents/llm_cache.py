@@ -0,0 +1,241 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from langchain.schema import AIMessage
+from langchain.schema.messages import AIMessageChunk
+
+
+class LLMCache:
+    """
+    Disk backed cache of chat model responses, shared by all agents.
+
+    Responses are keyed by the model, its sampling parameters and a canonical hash
+    of the message list, and stored in a sqlite database so they survive restarts.
+    When the cache grows past max_entries or max_bytes, the least recently used
+    responses are evicted.
+    """
+
+    def __init__(self, path, max_entries=100000, max_bytes=512 * 1024 * 1024):
+        """
+        :param path: sqlite database file, created if missing
+        :param max_entries: how many responses are kept at most, None for no limit
+        :param max_bytes: how many bytes of responses are kept at most, None for no
+        limit
+        """
+        dirname = os.path.dirname(path)
+        if dirname:
+            os.makedirs(dirname, exist_ok=True)
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, model TEXT, response TEXT, size INTEGER, "
+            "accessed REAL)"
+        )
+        self.db.execute(
+            "CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)"
+        )
+        self.db.commit()
+
+    @staticmethod
+    def make_key(model, params, messages):
+        """
+        :param params: the sampling parameters, e.g. temperature and max_tokens
+        :param messages: langchain messages
+        """
+        canonical = json.dumps(
+            {
+                "model": model,
+                "params": params,
+                "messages": [[message.type, message.content] for message in messages],
+            },
+            sort_keys=True,
+            separators=(",", ":"),
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """
+        :return: the cached response as a dict, or None
+        """
+        with self.lock:
+            row = self.db.execute(
+                "SELECT response FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.db.execute(
+                "UPDATE responses SET accessed = ? WHERE key = ?", (time.time(), key)
+            )
+            self.db.commit()
+        return json.loads(row[0])
+
+    def put(self, key, model, response):
+        data = json.dumps(response, ensure_ascii=False)
+        with self.lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                (key, model, data, len(data), time.time()),
+            )
+            self._evict()
+            self.db.commit()
+
+    def _evict(self):
+        entries, size = self.db.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()
+        excess_entries = entries - self.max_entries if self.max_entries else 0
+        excess_bytes = size - self.max_bytes if self.max_bytes else 0
+        if excess_entries <= 0 and excess_bytes <= 0:
+            return
+        evicted = []
+        rows = self.db.execute(
+            "SELECT key, size FROM responses ORDER BY accessed ASC"
+        ).fetchall()
+        for key, row_size in rows:
+            if excess_entries <= 0 and excess_bytes <= 0:
+                break
+            evicted.append((key,))
+            excess_entries -= 1
+            excess_bytes -= row_size
+        self.db.executemany("DELETE FROM responses WHERE key = ?", evicted)
+
+    def delete(self, key):
+        with self.lock:
+            self.db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self.db.commit()
+
+    def clear(self):
+        with self.lock:
+            self.db.execute("DELETE FROM responses")
+            self.db.commit()
+
+    def stats(self):
+        with self.lock:
+            entries, size = self.db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": entries,
+            "bytes": size,
+        }
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+
+class CachedChatModel:
+    """
+    Wrap a langchain chat model so calls with the same messages are answered from
+    an LLMCache. Only calls go through the cache, every other attribute is the one
+    of the wrapped model.
+    """
+
+    def __init__(self, llm, cache, name="llm"):
+        """
+        :param name: shown in the hit and miss counters, e.g. the agent name
+        """
+        self.llm = llm
+        self.cache = cache
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def params(self):
+        return {
+            "temperature": self.llm.temperature,
+            "max_tokens": self.llm.max_tokens,
+            "n": self.llm.n,
+            "model_kwargs": self.llm.model_kwargs,
+        }
+
+    def __call__(self, messages, **kwargs):
+        if kwargs:
+            # stop sequences and callbacks change the call, do not cache it
+            return self.llm(messages, **kwargs)
+        key = self.cache.make_key(self.llm.model_name, self.params, messages)
+        cached = self.cache.get(key)
+        if cached is not None:
+            self.hits += 1
+            return AIMessage(
+                content=cached["content"],
+                additional_kwargs=cached["additional_kwargs"],
+            )
+        self.misses += 1
+        message = self.llm(messages)
+        self.cache.put(
+            key,
+            self.llm.model_name,
+            {
+                "content": message.content,
+                "additional_kwargs": message.additional_kwargs,
+            },
+        )
+        return message
+
+    def stream(self, messages, **kwargs):
+        """
+        Like the stream of the wrapped model. A cached response comes as one chunk,
+        a new one is cached once the stream has been read to the end.
+        """
+        if kwargs:
+            yield from self.llm.stream(messages, **kwargs)
+            return
+        key = self.cache.make_key(self.llm.model_name, self.params, messages)
+        cached = self.cache.get(key)
+        if cached is not None:
+            self.hits += 1
+            yield AIMessageChunk(
+                content=cached["content"],
+                additional_kwargs=cached["additional_kwargs"],
+            )
+            return
+        self.misses += 1
+        content = ""
+        for chunk in self.llm.stream(messages):
+            content += chunk.content
+            yield chunk
+        self.cache.put(
+            key,
+            self.llm.model_name,
+            {"content": content, "additional_kwargs": {}},
+        )
+
+    def evict(self, messages):
+        """
+        Drop the cached response to messages, e.g. because it could not be parsed,
+        so asking again reaches the model.
+        """
+        key = self.cache.make_key(self.llm.model_name, self.params, messages)
+        self.cache.delete(key)
+
+    def __getattr__(self, name):
+        return getattr(self.llm, name)
+
+    def stats(self):
+        return {"name": self.name, "hits": self.hits, "misses": self.misses}
+
+
+def evict(llm, messages):
+    """
+    Drop the cached response to messages if llm is a CachedChatModel, call this
+    before retrying with the same messages after a reply could not be used.
+    """
+    if isinstance(llm, CachedChatModel):
+        llm.evict(messages)
@@ -0,0 +1,66 @@
+// Long-lived parser for the programs written by the action agent.
+// Reads one JSON request per line on stdin, {"id": 1, "code": "..."}, and
+// answers each with one JSON line on stdout:
+// {"id": 1, "functions": [{"name", "async", "params", "body", "calls"}]}
+// or {"id": 1, "error": "..."} when the code does not parse.
+const babel = require("@babel/core");
+const generate = require("@babel/generator").default;
+const readline = require("readline");
+
+// every identifier called in node, e.g. mineBlock in await mineBlock(bot, ...),
+// or passed straight to a call, like a callback in bot.on("chat", onChat)
+function calledIdentifiers(node, calls) {
+    if (!node || typeof node.type !== "string") return calls;
+    if (node.type === "CallExpression") {
+        for (const callee of [node.callee, ...node.arguments]) {
+            if (callee.type === "Identifier") calls.add(callee.name);
+        }
+    }
+    for (const key of Object.keys(node)) {
+        if (key === "loc" || key.endsWith("Comments")) continue;
+        const value = node[key];
+        if (Array.isArray(value)) {
+            for (const child of value) calledIdentifiers(child, calls);
+        } else if (value && typeof value === "object") {
+            calledIdentifiers(value, calls);
+        }
+    }
+    return calls;
+}
+
+function parse(code) {
+    const ast = babel.parse(code);
+    if (ast.program.body.length === 0) {
+        throw new Error("No functions found");
+    }
+    const functions = [];
+    for (const node of ast.program.body) {
+        if (node.type !== "FunctionDeclaration") continue;
+        functions.push({
+            name: node.id.name,
+            async: node.async,
+            params: node.params.map((param) =>
+                param.type === "Identifier" ? param.name : generate(param).code
+            ),
+            body: generate(node).code,
+            calls: Array.from(calledIdentifiers(node.body, new Set())),
+        });
+    }
+    return functions;
+}
+
+const lines = readline.createInterface({ input: process.stdin });
+lines.on("line", (line) => {
+    if (!line.trim()) return;
+    const request = JSON.parse(line);
+    let reply;
+    try {
+        reply = { id: request.id, functions: parse(request.code) };
+    } catch (e) {
+        reply = { id: request.id, error: e.message };
+    }
+    process.stdout.write(JSON.stringify(reply) + "\n");
+});
+
+// the python side waits for this line before sending requests
+process.stdout.write(JSON.stringify({ ready: true }) + "\n");
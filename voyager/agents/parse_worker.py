@@ -0,0 +1,150 @@
+import collections
+import json
+import os
+import queue
+import subprocess
+import threading
+
+import javascript
+
+
+class ParseWorkerError(RuntimeError):
+    """
+    The worker could not be started or stopped answering.
+    """
+
+
+class JavaScriptParseError(ValueError):
+    """
+    The code does not parse.
+    """
+
+
+class ParseWorker:
+    """
+    A long-lived node process parsing the programs of the action agent with babel.
+
+    One request sends the raw code and gets back every top level function with its
+    name, async flag, parameter names, regenerated code and the identifiers it
+    calls, so parsing costs one pipe round trip instead of one bridge call per AST
+    property.
+    babel is resolved from the modules the javascript package installs.
+    """
+
+    SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "parse_worker.js")
+
+    def __init__(self, node="node", timeout=10.0, node_path=None):
+        """
+        :param timeout: seconds to wait for the worker to start or to answer
+        :param node_path: where to look for @babel/core, defaults to the node_modules
+        of the javascript package
+        """
+        self.node = node
+        self.timeout = timeout
+        self.node_path = node_path or os.path.join(
+            os.path.dirname(javascript.__file__), "js", "node_modules"
+        )
+        self.process = None
+        self.replies = None
+        # last lines of stderr, read as they come so the pipe never fills up
+        self.stderr = collections.deque(maxlen=20)
+        self.lock = threading.Lock()
+        self.next_id = 0
+
+    def start(self):
+        env = dict(os.environ)
+        env["NODE_PATH"] = os.pathsep.join(
+            path for path in [self.node_path, env.get("NODE_PATH")] if path
+        )
+        try:
+            self.process = subprocess.Popen(
+                [self.node, self.SCRIPT],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True,
+                bufsize=1,
+                env=env,
+            )
+        except OSError as e:
+            self.process = None
+            raise ParseWorkerError(f"Could not start the parse worker: {e}")
+        self.replies = queue.SimpleQueue()
+        self.stderr = collections.deque(maxlen=20)
+        threading.Thread(
+            target=self._read, args=(self.process, self.replies), daemon=True
+        ).start()
+        self.drainer = threading.Thread(
+            target=self._drain, args=(self.process, self.stderr), daemon=True
+        )
+        self.drainer.start()
+        reply = self._reply()
+        if not reply.get("ready"):
+            raise ParseWorkerError(f"Unexpected first line from parse worker: {reply}")
+
+    @staticmethod
+    def _read(process, replies):
+        for line in process.stdout:
+            replies.put(line)
+        # end of output, the worker is gone
+        replies.put(None)
+
+    @staticmethod
+    def _drain(process, lines):
+        try:
+            for line in process.stderr:
+                lines.append(line.rstrip())
+        except (OSError, ValueError):
+            # closed by close()
+            pass
+
+    def _reply(self):
+        try:
+            line = self.replies.get(timeout=self.timeout)
+        except queue.Empty:
+            self.close()
+            raise ParseWorkerError(f"Parse worker did not answer in {self.timeout}s")
+        if line is None:
+            self.process.wait()
+            self.drainer.join(timeout=1)
+            self.close()
+            stderr = "\n".join(self.stderr)
+            raise ParseWorkerError(f"Parse worker exited: {stderr}")
+        return json.loads(line)
+
+    @property
+    def is_running(self):
+        return self.process is not None and self.process.poll() is None
+
+    def parse(self, code):
+        """
+        :return: the top level functions, dicts with name, async, params, body and
+        calls, the identifiers called or passed to a call anywhere in the body
+        """
+        with self.lock:
+            if not self.is_running:
+                self.start()
+            self.next_id += 1
+            request = json.dumps({"id": self.next_id, "code": code})
+            try:
+                self.process.stdin.write(request + "\n")
+                self.process.stdin.flush()
+            except OSError as e:
+                self.close()
+                raise ParseWorkerError(f"Parse worker is gone: {e}")
+            reply = self._reply()
+        if "error" in reply:
+            raise JavaScriptParseError(reply["error"])
+        return reply["functions"]
+
+    def close(self):
+        if self.process is None:
+            return
+        if self.process.poll() is None:
+            self.process.kill()
+        self.process.wait()
+        for stream in [self.process.stdin, self.process.stdout, self.process.stderr]:
+            try:
+                stream.close()
+            except OSError:
+                pass
@@ -0,0 +1,68 @@
+import hashlib
+import json
+import re
+
+FUNCTION_NAME = re.compile(r"(?:async\s+)?function\s+(\w+)")
+
+
+class ProgramBundle(str):
+    """
+    The skills and control primitives joined into the string evaluated before the
+    code of a step, built once and then shared until the library changes.
+
+    It is a plain immutable str, so it can be passed wherever the programs string
+    was used, and additionally carries:
+    - sources: the separate program sources, in order, see VoyagerEnv.step
+    - offsets: name -> (start, end) of each program inside the string
+    - digest: sha1 of the (name, source) pairs, usable as a cache key downstream,
+      the same for the same programs in any order
+    """
+
+    def __new__(cls, entries=()):
+        """
+        :param entries: (name, source) pairs in the order they should be bound
+        """
+        entries = list(entries)
+        parts = []
+        offsets = {}
+        start = 0
+        for name, source in entries:
+            offsets[name] = (start, start + len(source))
+            parts.append(f"{source}\n\n")
+            start += len(source) + 2
+        bundle = super().__new__(cls, "".join(parts))
+        bundle.names = tuple(name for name, _ in entries)
+        bundle.sources = tuple(source for _, source in entries)
+        bundle.offsets = offsets
+        # sorted, so a library rebuilt from a reordered dict keeps its digest
+        bundle.digest = hashlib.sha1(
+            json.dumps(sorted(entries)).encode("utf-8")
+        ).hexdigest()
+        return bundle
+
+    @classmethod
+    def from_library(cls, skills, control_primitives):
+        """
+        :param skills: the skills of SkillManager, name -> {"code", "description"}
+        :param control_primitives: control primitive sources
+        """
+        entries = [(name, entry["code"]) for name, entry in skills.items()]
+        for i, source in enumerate(control_primitives):
+            match = FUNCTION_NAME.search(source)
+            name = match.group(1) if match else f"primitive_{i}"
+            # a skill may share its name with a primitive, keep both offsets
+            if name in skills:
+                name = f"primitive:{name}"
+            entries.append((name, source))
+        return cls(entries)
+
+    def program(self, name):
+        """
+        :return: the source of the program called name
+        """
+        start, end = self.offsets[name]
+        return self[start:end]
+
+    def __reduce__(self):
+        # copy and pickle would otherwise pass the joined string as the entries
+        return type(self), (list(zip(self.names, self.sources)),)
@@ -2,13 +2,17 @@ import os
 
 import voyager.utils as U
 from langchain.chat_models import ChatOpenAI
-from langchain.embeddings.openai import OpenAIEmbeddings
 from langchain.schema import HumanMessage, SystemMessage
-from langchain.vectorstores import Chroma
 
 from voyager.prompts import load_prompt
 from voyager.control_primitives import load_control_primitives
 
+from .embeddings import make_embeddings
+from .llm_cache import CachedChatModel
+from .program_bundle import ProgramBundle
+from .skill_graph import SkillGraph
+from .vector_index import open_index
+
 
 class SkillManager:
     def __init__(
@@ -19,12 +23,31 @@ class SkillManager:
         request_timout=120,
         ckpt_dir="ckpt",
         resume=False,
+        llm_cache=None,
+        retrieval_backend="numpy",
+        embeddings="openai",
+        parse_worker=None,
+        vectordb_import_dir=None,
     ):
+        """
+        :param llm_cache: answer repeated prompts from this LLMCache
+        :param retrieval_backend: "numpy" for the in-process VectorIndex, which
+        imports an existing Chroma vectordb on first start, or "chroma"
+        :param embeddings: embeddings shared with the other agents, e.g. an
+        EmbeddingService, or a backend name for make_embeddings, "openai" or the
+        offline "hashing"
+        :param parse_worker: the ParseWorker of the action agent, the skill graph
+        takes the calls of each program from it
+        :param vectordb_import_dir: where a Chroma vectordb found in ckpt_dir is saved
+        once imported, defaults to the vectordb directory itself
+        """
         self.llm = ChatOpenAI(
             model_name=model_name,
             temperature=temperature,
             request_timeout=request_timout,
         )
+        if llm_cache is not None:
+            self.llm = CachedChatModel(self.llm, llm_cache, name="skill")
         U.f_mkdir(f"{ckpt_dir}/skill/code")
         U.f_mkdir(f"{ckpt_dir}/skill/description")
         U.f_mkdir(f"{ckpt_dir}/skill/vectordb")
@@ -37,26 +60,50 @@ class SkillManager:
             self.skills = {}
         self.retrieval_top_k = retrieval_top_k
         self.ckpt_dir = ckpt_dir
-        self.vectordb = Chroma(
+        if isinstance(embeddings, str):
+            embeddings = make_embeddings(embeddings)
+        self.vectordb = open_index(
+            retrieval_backend,
             collection_name="skill_vectordb",
-            embedding_function=OpenAIEmbeddings(),
+            embedding_function=embeddings,
             persist_directory=f"{ckpt_dir}/skill/vectordb",
+            import_directory=vectordb_import_dir,
         )
-        assert self.vectordb._collection.count() == len(self.skills), (
+        assert self.vectordb.count() == len(self.skills), (
             f"Skill Manager's vectordb is not synced with skills.json.\n"
-            f"There are {self.vectordb._collection.count()} skills in vectordb but {len(self.skills)} skills in skills.json.\n"
+            f"There are {self.vectordb.count()} skills in vectordb but {len(self.skills)} skills in skills.json.\n"
             f"Did you set resume=False when initializing the manager?\n"
             f"You may need to manually delete the vectordb directory for running from scratch."
         )
+        self.graph = SkillGraph(parse_worker)
+        self.update_bundle()
+
+    def update_bundle(self):
+        self.bundle = ProgramBundle.from_library(self.skills, self.control_primitives)
+        self.graph.update(self.bundle.sources)
 
     @property
     def programs(self):
-        programs = ""
-        for skill_name, entry in self.skills.items():
-            programs += f"{entry['code']}\n\n"
-        for primitives in self.control_primitives:
-            programs += f"{primitives}\n\n"
-        return programs
+        """
+        All skills and control primitives as one ProgramBundle, rebuilt only when
+        add_new_skill changes the library.
+        """
+        return self.bundle
+
+    @property
+    def program_sources(self):
+        """
+        Skills and control primitives as separate sources, so the env can cache
+        each of them on the mineflayer side by content hash.
+        """
+        return self.bundle.sources
+
+    def program_sources_for(self, code):
+        """
+        Only the skills and control primitives code can reach through the calls of
+        the skill graph, in the same order as program_sources.
+        """
+        return self.graph.reachable(code)
 
     def add_new_skill(self, info):
         if info["task"].startswith("Deposit useless items into the chest at"):
@@ -70,7 +117,7 @@ class SkillManager:
         )
         if program_name in self.skills:
             print(f"\033[33mSkill {program_name} already exists. Rewriting!\033[0m")
-            self.vectordb._collection.delete(ids=[program_name])
+            self.vectordb.delete(ids=[program_name])
             i = 2
             while f"{program_name}V{i}.js" in os.listdir(f"{self.ckpt_dir}/skill/code"):
                 i += 1
@@ -86,7 +133,7 @@ class SkillManager:
             "code": program_code,
             "description": skill_description,
         }
-        assert self.vectordb._collection.count() == len(
+        assert self.vectordb.count() == len(
             self.skills
         ), "vectordb is not synced with skills.json"
         U.dump_text(
@@ -96,6 +143,7 @@ class SkillManager:
             skill_description,
             f"{self.ckpt_dir}/skill/description/{dumped_program_name}.txt",
         )
+        self.update_bundle()
         U.dump_json(self.skills, f"{self.ckpt_dir}/skill/skills.json")
         self.vectordb.persist()
 
@@ -112,7 +160,7 @@ class SkillManager:
         return f"async function {program_name}(bot) {{\n{skill_description}\n}}"
 
     def retrieve_skills(self, query):
-        k = min(self.vectordb._collection.count(), self.retrieval_top_k)
+        k = min(self.vectordb.count(), self.retrieval_top_k)
         if k == 0:
             return []
         print(f"\033[33mSkill Manager retrieving for {k} skills\033[0m")
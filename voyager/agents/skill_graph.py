@@ -0,0 +1,98 @@
+import re
+
+from .parse_worker import JavaScriptParseError, ParseWorkerError
+
+# same declarations mineflayer/lib/programRegistry.js binds into the scope
+DECLARATION = re.compile(r"^(?:async\s+)?function\s*\*?\s*([A-Za-z_$][\w$]*)", re.M)
+IDENTIFIER = re.compile(r"[A-Za-z_$][\w$]*")
+
+
+class SkillGraph:
+    """
+    Which skills and control primitives a piece of code can reach.
+
+    Every program is analyzed once for the functions it declares and the
+    identifiers it calls, taken from the AST by the parse worker, so a name in a
+    comment or string is not a dependency. A step then only needs the programs
+    declaring a name called by its code, plus, transitively, the programs those
+    call. Without a worker, or for code that does not parse, every identifier
+    mentioned counts instead, which keeps programs that were not needed but never
+    drops one that was.
+    """
+
+    def __init__(self, parse_worker=None):
+        """
+        :param parse_worker: the ParseWorker of the action agent, None to scan for
+        identifiers only
+        """
+        self.parse_worker = parse_worker
+        # source -> (declared names, called identifiers), kept across bundles
+        self.analyses = {}
+        self.sources = ()
+        self.providers = {}
+
+    def calls(self, code):
+        """
+        :return: the identifiers code calls, including its top level statements
+        like await main(bot)
+        """
+        if self.parse_worker is not None:
+            try:
+                # one function around everything, so its calls cover all the code
+                functions = self.parse_worker.parse(
+                    f"async function step(bot) {{\n{code}\n}}"
+                )
+                return frozenset(functions[0]["calls"])
+            except JavaScriptParseError:
+                pass
+            except ParseWorkerError as e:
+                # do not start a node process for every program that follows
+                print(
+                    "\033[33mParse worker unavailable, scanning identifiers: "
+                    f"{e}\033[0m"
+                )
+                self.parse_worker = None
+        return frozenset(IDENTIFIER.findall(code))
+
+    def analyze(self, source):
+        analysis = self.analyses.get(source)
+        if analysis is None:
+            analysis = (frozenset(DECLARATION.findall(source)), self.calls(source))
+            self.analyses[source] = analysis
+        return analysis
+
+    def update(self, sources):
+        """
+        :param sources: all program sources in the order they are bound, only
+        sources not seen before are analyzed
+        """
+        self.sources = tuple(sources)
+        self.providers = {}
+        for i, source in enumerate(self.sources):
+            for name in self.analyze(source)[0]:
+                self.providers.setdefault(name, []).append(i)
+        # programs removed from the library are not needed anymore
+        live = set(self.sources)
+        self.analyses = {
+            source: analysis
+            for source, analysis in self.analyses.items()
+            if source in live
+        }
+
+    def reachable(self, code):
+        """
+        :return: the sources code needs, in bound order
+        """
+        needed = set()
+        pending = list(self.calls(code))
+        seen = set(pending)
+        while pending:
+            name = pending.pop()
+            for i in self.providers.get(name, ()):
+                if i in needed:
+                    continue
+                needed.add(i)
+                for call in self.analyses[self.sources[i]][1] - seen:
+                    seen.add(call)
+                    pending.append(call)
+        return tuple(self.sources[i] for i in sorted(needed))
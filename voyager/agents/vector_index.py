@@ -0,0 +1,288 @@
+import json
+import os
+import uuid
+
+import numpy as np
+from langchain.schema import Document
+from langchain.vectorstores import Chroma
+
+from .embeddings import model_name
+
+
+class VectorIndex:
+    """
+    Exact nearest neighbour index over a few hundred or thousand texts, kept as one
+    contiguous float32 matrix. A query is one matrix-vector product plus an
+    argpartition for the top k, ranked by squared L2 distance like Chroma does.
+
+    It offers the parts of the Chroma vectorstore the agents use. On disk it is a
+    .npy matrix, memory mapped on load, and a small json file with the ids, texts
+    and metadatas naming the current matrix file. Both are written to new files
+    and the json is swapped in last, so a crash never leaves a torn index. A
+    directory that only holds a Chroma collection is imported on the first open
+    and the copy is saved, next to it or in import_directory, so later starts
+    memory map it instead of reading Chroma again.
+
+    The json also records the embedding model and dimension. An index opened with
+    a different model, e.g. an OpenAI built skill library with the offline hashing
+    embeddings, is re-embedded from its stored texts in memory.
+    """
+
+    def __init__(
+        self,
+        collection_name,
+        embedding_function,
+        persist_directory,
+        import_directory=None,
+    ):
+        """
+        :param import_directory: where the copy of a Chroma collection found in
+        persist_directory is saved, e.g. under the checkpoint when persist_directory
+        belongs to a shared skill library, defaults to persist_directory
+        """
+        self.collection_name = collection_name
+        self.embedding_function = embedding_function
+        self.persist_directory = persist_directory
+        self.path = self.meta_path(persist_directory)
+        self.ids = []
+        self.texts = []
+        self.metadatas = []
+        self.vectors = None
+        self.squared_norms = None
+        self.generation = 0
+        self.model = model_name(embedding_function)
+        # the model the vectors come from, None when unknown, e.g. after an import
+        self.vectors_model = None
+        if os.path.exists(self.path):
+            self.load(self.path)
+        elif self.chroma_files(persist_directory):
+            import_directory = import_directory or persist_directory
+            imported = self.meta_path(import_directory)
+            if os.path.exists(imported) and os.path.getmtime(imported) >= max(
+                os.path.getmtime(path) for path in self.chroma_files(persist_directory)
+            ):
+                self.load(imported)
+            else:
+                self.import_chroma()
+                self.persist(import_directory)
+
+    def meta_path(self, directory):
+        return os.path.join(directory, f"{self.collection_name}.json")
+
+    @staticmethod
+    def chroma_files(directory):
+        paths = [
+            os.path.join(directory, name)
+            for name in ["chroma.sqlite3", "chroma-embeddings.parquet"]
+        ]
+        return [path for path in paths if os.path.exists(path)]
+
+    def load(self, path):
+        with open(path, encoding="utf-8") as f:
+            meta = json.load(f)
+        self.ids = meta["ids"]
+        self.texts = meta["texts"]
+        self.metadatas = meta["metadatas"]
+        self.generation = meta["generation"]
+        if meta["vectors"] is not None:
+            vectors = np.load(
+                os.path.join(os.path.dirname(path), meta["vectors"]), mmap_mode="r"
+            )
+            if len(vectors) != len(self.ids):
+                raise ValueError(
+                    f"Vector index {path} lists {len(self.ids)} ids but its "
+                    f"matrix has {len(vectors)} rows"
+                )
+            self.set_vectors(vectors)
+            self.vectors_model = meta.get("model")
+            if self.vectors_model not in [None, self.model]:
+                self.reembed(f"it was built with {self.vectors_model}")
+
+    def import_chroma(self):
+        print(
+            f"\033[33mImporting Chroma collection {self.collection_name} from "
+            f"{self.persist_directory}\033[0m"
+        )
+        collection = Chroma(
+            collection_name=self.collection_name,
+            embedding_function=self.embedding_function,
+            persist_directory=self.persist_directory,
+        )._collection
+        data = collection.get(include=["embeddings", "documents", "metadatas"])
+        self.ids = list(data["ids"])
+        self.texts = list(data["documents"])
+        self.metadatas = [metadata or {} for metadata in data["metadatas"]]
+        if self.ids:
+            self.set_vectors(np.asarray(data["embeddings"], dtype=np.float32))
+
+    def reembed(self, reason):
+        print(
+            f"\033[33mRe-embedding {len(self.texts)} texts of {self.collection_name} "
+            f"with {self.model}, {reason}\033[0m"
+        )
+        self.set_vectors(
+            np.asarray(
+                self.embedding_function.embed_documents(self.texts), dtype=np.float32
+            )
+        )
+        self.vectors_model = self.model
+
+    def check_dim(self, dim):
+        # an import does not say which model it came from, the size may tell
+        if self.vectors is not None and self.vectors.shape[1] != dim:
+            self.reembed(f"it holds {self.vectors.shape[1]} dimensional vectors")
+
+    def set_vectors(self, vectors):
+        self.vectors = vectors
+        self.squared_norms = np.einsum("ij,ij->i", vectors, vectors)
+
+    def count(self):
+        return len(self.ids)
+
+    def add_texts(self, texts, ids=None, metadatas=None):
+        """
+        :param ids: one per text, ids already in the index are replaced, random
+        ones by default like Chroma
+        """
+        texts = list(texts)
+        if ids is None:
+            ids = [str(uuid.uuid4()) for _ in texts]
+        metadatas = list(metadatas) if metadatas else [{} for _ in texts]
+        self.delete(ids=[i for i in ids if i in self.ids])
+        vectors = np.asarray(
+            self.embedding_function.embed_documents(texts), dtype=np.float32
+        )
+        self.check_dim(vectors.shape[1])
+        if self.vectors is not None:
+            vectors = np.concatenate([self.vectors, vectors])
+        else:
+            self.vectors_model = self.model
+        self.set_vectors(vectors)
+        self.ids += list(ids)
+        self.texts += texts
+        self.metadatas += metadatas
+        return list(ids)
+
+    def delete(self, ids):
+        ids = set(ids)
+        keep = [i for i, id_ in enumerate(self.ids) if id_ not in ids]
+        if len(keep) == len(self.ids):
+            return
+        self.ids = [self.ids[i] for i in keep]
+        self.texts = [self.texts[i] for i in keep]
+        self.metadatas = [self.metadatas[i] for i in keep]
+        if keep:
+            self.set_vectors(np.ascontiguousarray(self.vectors[keep]))
+        else:
+            self.vectors = self.squared_norms = None
+
+    def similarity_search_with_score(self, query, k=4):
+        """
+        :return: up to k (Document, squared L2 distance) pairs, closest first
+        """
+        if not self.ids:
+            return []
+        k = min(k, len(self.ids))
+        query = np.asarray(self.embedding_function.embed_query(query), dtype=np.float32)
+        self.check_dim(len(query))
+        distances = self.squared_norms - 2 * (self.vectors @ query) + query @ query
+        top = np.argpartition(distances, k - 1)[:k]
+        top = top[np.argsort(distances[top])]
+        return [
+            (
+                Document(page_content=self.texts[i], metadata=self.metadatas[i]),
+                float(distances[i]),
+            )
+            for i in top
+        ]
+
+    def persist(self, directory=None):
+        """
+        :param directory: where to write the index, defaults to persist_directory
+        """
+        directory = directory or self.persist_directory
+        path = self.meta_path(directory)
+        os.makedirs(directory, exist_ok=True)
+        old_meta = None
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                old_meta = json.load(f)
+        self.generation += 1
+        vectors_name = None
+        if self.vectors is not None:
+            vectors_name = f"{self.collection_name}.{self.generation}.npy"
+            vectors_path = os.path.join(directory, vectors_name)
+            with open(vectors_path + ".tmp", "wb") as f:
+                np.save(f, np.ascontiguousarray(self.vectors, dtype=np.float32))
+            os.replace(vectors_path + ".tmp", vectors_path)
+        meta = {
+            "generation": self.generation,
+            "model": self.vectors_model,
+            "dim": None if self.vectors is None else int(self.vectors.shape[1]),
+            "vectors": vectors_name,
+            "ids": self.ids,
+            "texts": self.texts,
+            "metadatas": self.metadatas,
+        }
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(path + ".tmp", path)
+        if old_meta is not None and old_meta["vectors"] not in [None, vectors_name]:
+            try:
+                os.remove(os.path.join(directory, old_meta["vectors"]))
+            except OSError:
+                # still mapped on platforms that lock open files
+                pass
+
+
+class ChromaIndex:
+    """
+    The persisted Chroma collection behind the same methods as VectorIndex.
+    """
+
+    def __init__(self, collection_name, embedding_function, persist_directory):
+        self.db = Chroma(
+            collection_name=collection_name,
+            embedding_function=embedding_function,
+            persist_directory=persist_directory,
+        )
+
+    def count(self):
+        return self.db._collection.count()
+
+    def add_texts(self, texts, ids=None, metadatas=None):
+        return self.db.add_texts(texts=texts, ids=ids, metadatas=metadatas)
+
+    def delete(self, ids):
+        self.db._collection.delete(ids=ids)
+
+    def similarity_search_with_score(self, query, k=4):
+        return self.db.similarity_search_with_score(query, k=k)
+
+    def persist(self):
+        self.db.persist()
+
+
+BACKENDS = {"numpy": VectorIndex, "chroma": ChromaIndex}
+
+
+def open_index(
+    backend,
+    collection_name,
+    embedding_function,
+    persist_directory,
+    import_directory=None,
+):
+    """
+    :param backend: "numpy" for VectorIndex or "chroma" for ChromaIndex
+    :param import_directory: see VectorIndex, Chroma reads persist_directory itself
+    """
+    if backend not in BACKENDS:
+        raise ValueError(
+            f"Unknown retrieval backend {backend}, expected one of {list(BACKENDS)}"
+        )
+    if backend == "numpy":
+        return VectorIndex(
+            collection_name, embedding_function, persist_directory, import_directory
+        )
+    return BACKENDS[backend](collection_name, embedding_function, persist_directory)
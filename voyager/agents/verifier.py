@@ -0,0 +1,308 @@
+import re
+
+# what mining a block leaves in the inventory
+MINE_DROPS = {
+    "stone": ["cobblestone", "stone"],
+    "grass_block": ["dirt", "grass_block"],
+    "deepslate": ["cobbled_deepslate", "deepslate"],
+    "coal_ore": ["coal"],
+    "iron_ore": ["raw_iron", "iron_ore"],
+    "gold_ore": ["raw_gold", "gold_ore"],
+    "copper_ore": ["raw_copper", "copper_ore"],
+    "diamond_ore": ["diamond"],
+    "emerald_ore": ["emerald"],
+    "lapis_ore": ["lapis_lazuli"],
+    "lapis_lazuli_ore": ["lapis_lazuli"],
+    "redstone_ore": ["redstone"],
+    "nether_quartz_ore": ["quartz"],
+    "gravel": ["gravel", "flint"],
+    "clay": ["clay_ball"],
+    "snow": ["snowball"],
+    "glowstone": ["glowstone_dust"],
+}
+
+# what smelting or cooking an item produces
+SMELT_OUTPUTS = {
+    "raw_iron": "iron_ingot",
+    "iron_ore": "iron_ingot",
+    "raw_gold": "gold_ingot",
+    "gold_ore": "gold_ingot",
+    "raw_copper": "copper_ingot",
+    "copper_ore": "copper_ingot",
+    "sand": "glass",
+    "cobblestone": "stone",
+    "clay_ball": "brick",
+    "log": "charcoal",
+    "beef": "cooked_beef",
+    "porkchop": "cooked_porkchop",
+    "chicken": "cooked_chicken",
+    "mutton": "cooked_mutton",
+    "rabbit": "cooked_rabbit",
+    "cod": "cooked_cod",
+    "salmon": "cooked_salmon",
+    "potato": "baked_potato",
+    "kelp": "dried_kelp",
+}
+
+# names that stand for any wood type or color, e.g. log matches oak_log
+FAMILIES = {"log", "planks", "wool", "bed", "boat", "sapling", "leaves", "carpet"}
+
+# item names the curriculum uses, a task naming one of them can be failed without
+# asking the llm, other names may be loose and are left to it
+COMMON_ITEMS = (
+    {
+        f"{material}_{tool}"
+        for material in ["wooden", "stone", "iron", "golden", "diamond"]
+        for tool in ["pickaxe", "axe", "shovel", "sword", "hoe"]
+    }
+    | {
+        f"{material}_{piece}"
+        for material in ["leather", "iron", "golden", "diamond"]
+        for piece in ["helmet", "chestplate", "leggings", "boots"]
+    }
+    | set(SMELT_OUTPUTS)
+    | set(SMELT_OUTPUTS.values())
+    | {drop for drops in MINE_DROPS.values() for drop in drops}
+    | {
+        "stick",
+        "crafting_table",
+        "furnace",
+        "chest",
+        "torch",
+        "bucket",
+        "water_bucket",
+        "lava_bucket",
+        "shield",
+        "bow",
+        "arrow",
+        "fishing_rod",
+        "shears",
+        "flint_and_steel",
+        "compass",
+        "clock",
+        "bread",
+        "wheat",
+        "wheat_seeds",
+        "sugar_cane",
+        "paper",
+        "book",
+        "string",
+        "feather",
+        "leather",
+        "bone",
+        "bone_meal",
+        "gunpowder",
+        "iron_nugget",
+        "gold_nugget",
+        "iron_block",
+        "ladder",
+        "sign",
+        "bowl",
+        "apple",
+        "egg",
+        "milk_bucket",
+    }
+)
+
+GERUNDS = {"mine": "Mining", "smelt": "Smelting", "cook": "Cooking"}
+
+NUMBERS = {
+    "a": 1,
+    "an": 1,
+    "one": 1,
+    "two": 2,
+    "three": 3,
+    "four": 4,
+    "five": 5,
+    "six": 6,
+    "seven": 7,
+    "eight": 8,
+    "nine": 9,
+    "ten": 10,
+}
+
+
+class TaskVerifier:
+    """
+    Deterministic success check for the countable curriculum tasks, e.g.
+    "Mine 3 iron ore", "Craft 1 stone pickaxe", "Smelt 4 raw iron", "Kill 1 pig",
+    "Equip iron chestplate" or "Place a crafting table".
+
+    The check compares the final inventory, equipment and nearby blocks with those
+    the task started from, so what the bot already had does not pass a task, and
+    looks at the onSave events of the step. verify returns None whenever the task
+    is not one of these templates or the outcome is not clear, e.g. the bot had
+    enough before the task started, the llm decides then.
+    """
+
+    TASK = re.compile(
+        r"^(?P<verb>mine|collect|obtain|gather|get|craft|smelt|cook|kill|hunt|equip"
+        r"|place)\s+(?:(?P<count>\d+|a|an|one|two|three|four|five|six|seven|eight"
+        r"|nine|ten)\s+)?(?P<name>[a-z][a-z_ ]*?)\s*$"
+    )
+
+    def parse(self, task):
+        """
+        :return: (verb, count, name) or None if the task is not a known template
+        """
+        match = self.TASK.match(task.strip().rstrip(".").lower())
+        if match is None:
+            return None
+        count = match.group("count") or "1"
+        count = int(count) if count.isdigit() else NUMBERS[count]
+        name = re.sub(r"\s+", "_", match.group("name").strip())
+        name = re.sub(r"^(wood|wooden)_(log|logs|planks)$", r"\2", name)
+        if name in ["wood", "wood_log", "wood_logs"]:
+            name = "log"
+        return match.group("verb"), count, name
+
+    def verify(self, *, events, task, start):
+        """
+        :param start: the observation the task started from, e.g. the last event of
+        the step peeking at the world in Voyager.reset
+        :return: (success, critique), or None when the llm has to decide
+        """
+        parsed = self.parse(task)
+        if parsed is None:
+            return None
+        verb, count, name = parsed
+        final = events[-1][1]
+        items = self._items(final)
+        saves = [event["onSave"] for kind, event in events if kind == "onSave"]
+
+        if verb in ["kill", "hunt"]:
+            return self._check_saves(saves, "killed", count, name)
+        if verb == "place":
+            result = self._check_saves(saves, "placed", count, name)
+            if (
+                result is None
+                and self._resolve(name, final["voxels"]) is not None
+                and self._resolve(name, start["voxels"]) is None
+            ):
+                return True, ""
+            return result
+        if verb == "equip":
+            equipment = [item for item in final["status"]["equipment"] if item]
+            if self._resolve(name, equipment) is not None:
+                worn = [item for item in start["status"]["equipment"] if item]
+                # already equipped when the task started
+                if self._resolve(name, worn) is not None:
+                    return None
+                return True, ""
+            item = self._resolve(name, final["inventory"])
+            if item is not None:
+                noun = item.replace("_", " ")
+                return False, f"You have {noun} but it is not equipped."
+            return None
+
+        targets = self._targets(verb, name, items)
+        if targets is None:
+            return None
+        have = self._count(items, targets)
+        gained = have - self._count(self._items(start), targets)
+        if gained >= count:
+            return True, ""
+        if have >= count:
+            # some of them were there before the task started
+            return None
+        if not any(self._known(target, items) for target in targets):
+            return None
+        noun = targets[0].replace("_", " ")
+        critique = f"You have {have} {noun} but the task needs {count}."
+        if verb in GERUNDS and targets[0] != name:
+            critique += f" {GERUNDS[verb]} {name.replace('_', ' ')} gives {noun}."
+        return False, critique
+
+    @staticmethod
+    def _items(observation):
+        items = dict(observation["inventory"])
+        # the main hand item is already part of the inventory
+        for i, item in enumerate(observation["status"]["equipment"]):
+            if item and i != 4:
+                items[item] = items.get(item, 0) + 1
+        return items
+
+    def _count(self, items, targets):
+        return sum(
+            amount
+            for item, amount in items.items()
+            if any(self._matches(item, target) for target in targets)
+        )
+
+    def _targets(self, verb, name, items):
+        """
+        The inventory items that count for the task.
+        """
+        candidates = self._candidates(name)
+        if verb in ["smelt", "cook"]:
+            for candidate in candidates:
+                base = re.sub(r"^raw_", "", candidate) if verb == "cook" else candidate
+                if base in SMELT_OUTPUTS:
+                    return [SMELT_OUTPUTS[base]]
+                if candidate in SMELT_OUTPUTS.values():
+                    return [candidate]
+                if f"cooked_{candidate}" in SMELT_OUTPUTS.values():
+                    return [f"cooked_{candidate}"]
+            return None
+        if verb == "craft":
+            return [self._best(candidates, items)]
+        for candidate in candidates:
+            block = re.sub(r"^deepslate_(\w+_ore)$", r"\1", candidate)
+            if block in MINE_DROPS:
+                return MINE_DROPS[block]
+        return [self._best(candidates, items)]
+
+    def _check_saves(self, saves, suffix, count, name):
+        for candidate in self._candidates(name):
+            done = sum(
+                1
+                for save in saves
+                if self._matches(save[: -len(suffix) - 1], candidate)
+                and save.endswith(f"_{suffix}")
+            )
+            if done >= count:
+                return True, ""
+        # it may have happened in an earlier step
+        return None
+
+    def _resolve(self, name, names):
+        for candidate in self._candidates(name):
+            for other in names:
+                if self._matches(other, candidate):
+                    return other
+        return None
+
+    def _best(self, candidates, items):
+        for candidate in candidates:
+            if any(self._matches(item, candidate) for item in items):
+                return candidate
+        for candidate in candidates:
+            if self._known(candidate, items):
+                return candidate
+        return candidates[0]
+
+    @staticmethod
+    def _candidates(name):
+        # plural forms, logs -> log, torches -> torch, but glass stays glass
+        candidates = [name]
+        if name.endswith("es"):
+            candidates.append(name[:-2])
+        if name.endswith("s") and not name.endswith("ss"):
+            candidates.append(name[:-1])
+        return candidates
+
+    @staticmethod
+    def _matches(item, target):
+        if item == target:
+            return True
+        return target in FAMILIES and item.endswith(f"_{target}")
+
+    @staticmethod
+    def _known(target, items):
+        # one variant of a family, e.g. oak_log, is a real item name too
+        return (
+            target in COMMON_ITEMS
+            or target in FAMILIES
+            or target.rsplit("_", 1)[-1] in FAMILIES
+            or target in items
+        )
@@ -1 +1,3 @@
 from .bridge import VoyagerEnv
+from .vector import VoyagerVectorEnv
+from .async_bridge import AsyncVoyagerEnv
@@ -0,0 +1,205 @@
+import asyncio
+from typing import Any, Callable, Dict, List, Optional, Sequence, Union
+
+import aiohttp
+
+from . import wire
+from .bridge import VoyagerEnv
+from .stream import StepStream
+from .transport import AsyncHttpTransport
+
+
+class AsyncVoyagerEnv(VoyagerEnv):
+    """
+    VoyagerEnv with coroutine reset, step, pause, unpause and close, so one event
+    loop can drive many bots and interleave LLM calls with code execution.
+
+    Options and semantics are the same as VoyagerEnv. Requests go through aiohttp,
+    and process start and stop are awaited instead of blocking the loop.
+    """
+
+    def get_transport(self):
+        return AsyncHttpTransport(
+            self.server,
+            request_timeout=self.request_timeout,
+            headers={"Accept": wire.accept_header(self.wire_format)},
+        )
+
+    async def check_process(self):
+        retry = 0
+        while not self.mineflayer.is_running:
+            print("Mineflayer process has exited, restarting")
+            if not self.swap_in_standby():
+                await self.mineflayer.arun()
+            if not self.mineflayer.is_running:
+                if retry > 3:
+                    output = "\n".join(self.mineflayer.tail(20))
+                    raise RuntimeError(
+                        f"Mineflayer process failed to start, last output:\n{output}"
+                    )
+                else:
+                    retry += 1
+                    continue
+            self.launch_standby()
+            print(self.mineflayer.ready_line)
+            self.resources.attach(self.mineflayer.process.pid)
+            # connections pooled to the previous process are dead
+            await self.transport.reset()
+            self.program_cache.reset()
+            res = await self.transport.post("/start", json=self.reset_options)
+            if res.status_code != 200:
+                await self.mineflayer.astop()
+                raise RuntimeError(
+                    f"Minecraft server reply with code {res.status_code}"
+                )
+            self.healthy = True
+            return wire.decode_response(res)
+
+    async def warm_start(self):
+        try:
+            res = await self.transport.post(
+                "/start", json=dict(self.reset_options, warm=True)
+            )
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            print(f"Warm reset failed, restarting mineflayer: {e}")
+            return None
+        if res.status_code != 200:
+            print(
+                f"Warm reset failed with code {res.status_code}, restarting mineflayer"
+            )
+            return None
+        return wire.decode_response(res)
+
+    async def step(
+        self,
+        code: str,
+        programs: Union[str, Sequence[str]] = "",
+        policy: Optional[Callable[[Dict], Optional[str]]] = None,
+        tick_budget: Optional[int] = None,
+        wall_budget: Optional[float] = None,
+    ) -> List[Any]:
+        if not self.has_reset:
+            raise RuntimeError("Environment has not been reset yet")
+        await self.check_process()
+        data, sources = self.get_step_data(
+            code, programs, tick_budget=tick_budget, wall_budget=wall_budget
+        )
+        if policy is not None:
+            data["stream"] = True
+        # the watchdog polls from its own thread, it never blocks the event loop
+        self.start_watchdog()
+        try:
+            if self.fused_step and self.pause_server:
+                data["unpause"] = self.server_paused
+                res = await self.post_step("/fused_step", data, sources)
+                # the server always re-pauses before replying
+                self.server_paused = True
+                return await self.read_events(res, policy)
+            await self.unpause()
+            res = await self.post_step("/step", data, sources)
+            events = await self.read_events(res, policy)
+            await self.pause()
+            return events
+        except BaseException as e:
+            # also covers the step task being cancelled mid request
+            self.step_failed()
+            await self.araise_if_stalled(e)
+            raise
+        finally:
+            self.stop_watchdog()
+
+    async def araise_if_stalled(self, error):
+        if self.stalled():
+            # wait for on_stall off the loop, other envs keep stepping meanwhile
+            await asyncio.get_running_loop().run_in_executor(None, self.watchdog.join)
+            raise self.stall_error() from error
+
+    async def post_step(self, route, data, sources):
+        stream = data.get("stream", False)
+        res = await self.transport.post(route, json=data, stream=stream)
+        if res.status_code == 409 and sources is not None:
+            self.resend_programs(data, sources, res.json()["missing"])
+            res = await self.transport.post(route, json=data, stream=stream)
+        if res.status_code != 200:
+            raise RuntimeError("Failed to step Minecraft server")
+        if sources is not None:
+            self.program_cache.mark_sent(data["registry"])
+        return res
+
+    async def read_events(self, res, policy):
+        if policy is None:
+            return self.decode_events(res)
+        step_stream = StepStream(policy)
+        try:
+            async for line in res.iter_lines():
+                reason = step_stream.feed(line)
+                if reason:
+                    await self.abort(reason)
+        finally:
+            res.close()
+        return self.decode_observation(step_stream.result())
+
+    async def abort(self, reason):
+        print(f"\033[33mAborting step: {reason}\033[0m")
+        res = await self.transport.post("/abort", json={"reason": reason})
+        return res.status_code == 200
+
+    async def reset(
+        self,
+        *,
+        seed=None,
+        options=None,
+    ) -> List[Any]:
+        self.reset_options = self.get_reset_options(options)
+
+        await self.unpause()
+        if self.delta is not None:
+            self.delta.reset()
+        returned_data = None
+        if self.warm_reset and self.healthy and self.mineflayer.is_running:
+            returned_data = await self.warm_start()
+        if returned_data is None:
+            await self.mineflayer.astop()
+            if self.standby is None:
+                await asyncio.sleep(1)  # wait for mineflayer to exit
+            returned_data = await self.check_process()
+        self.reset_done()
+        await self.pause()
+        return returned_data
+
+    async def recycle(self):
+        await self.mineflayer.astop()
+        self.step_failed()
+
+    async def close(self):
+        await self.unpause()
+        if self.connected and self.mineflayer.is_running:
+            res = await self.transport.post("/stop")
+            if res.status_code == 200:
+                self.connected = False
+        await self.mineflayer.astop()
+        if self.standby is not None:
+            await self.standby.astop()
+        self.resources.stop()
+        if self.watchdog is not None:
+            self.watchdog.close()
+        await self.transport.close()
+        return not self.connected
+
+    async def pause(self):
+        if not self.pause_server:
+            return self.server_paused
+        if self.mineflayer.is_running and not self.server_paused:
+            res = await self.transport.post("/pause")
+            if res.status_code == 200:
+                self.server_paused = True
+        return self.server_paused
+
+    async def unpause(self):
+        if self.mineflayer.is_running and self.server_paused:
+            res = await self.transport.post("/pause")
+            if res.status_code == 200:
+                self.server_paused = False
+            else:
+                print(res.json())
+        return self.server_paused
@@ -1,17 +1,23 @@
 import os.path
+import threading
 import time
 import warnings
-from typing import SupportsFloat, Any, Tuple, Dict
-
-import requests
-import json
+from typing import SupportsFloat, Any, Tuple, Dict, Sequence, Union, Callable, Optional
 
 import gymnasium as gym
+import requests
 from gymnasium.core import ObsType
 
 import voyager.utils as U
 
+from . import wire
+from .delta import DeltaDecoder
 from .process_monitor import SubprocessMonitor
+from .resource_monitor import ResourceSampler
+from .program_cache import ProgramCache
+from .stream import StepStream
+from .transport import HttpTransport
+from .watchdog import Watchdog
 
 
 class VoyagerEnv(gym.Env):
@@ -22,79 +28,339 @@ class VoyagerEnv(gym.Env):
         server_port=3000,
         request_timeout=600,
         log_path="./logs",
+        fused_step=True,
+        wire_format="json",
+        delta_observations=False,
+        warm_reset=False,
+        standby_port=None,
+        bot_username="bot",
+        pause_server=True,
+        server_command=None,
+        resource_sample_interval=5.0,
+        recycle_thresholds=None,
+        watchdog_timeout=30.0,
+        watchdog_interval=2.0,
     ):
+        """
+        :param fused_step: unpause, execute and re-pause in a single request instead of
+        three separate /pause, /step, /pause round trips
+        :param wire_format: encoding of the observations sent by mineflayer, "json" or
+        "msgpack" (compact binary with interned keys)
+        :param delta_observations: let mineflayer send only the observation fields that
+        changed since the last event, full events are rebuilt on the python side
+        :param warm_reset: keep the mineflayer process and its connection alive across
+        resets and only reinitialize the bot state, the process is restarted only when
+        it is unhealthy
+        :param standby_port: if set, keep a second pre-spawned mineflayer process
+        listening on this port and swap it in whenever the active process has to be
+        restarted
+        :param bot_username: name the bot joins the Minecraft server with, bots sharing
+        one server need distinct names
+        :param pause_server: pause the Minecraft server between steps, this has to be
+        turned off when several bots play on the same server
+        :param server_command: command that starts the mineflayer server, the port is
+        appended to it, e.g. standin.COMMAND to run against the pure Python stand-in
+        in voyager/env/standin.py, defaults to node
+        :param resource_sample_interval: seconds between two samples of the memory, cpu,
+        file descriptor and thread usage of the mineflayer process
+        :param recycle_thresholds: limits on those samples, e.g. {"rss_mb": 2048}, once
+        one is crossed needs_recycle tells the caller to recycle the process between
+        tasks, see ResourceSampler
+        :param watchdog_timeout: fail a step once mineflayer stopped making progress for
+        this many seconds instead of waiting for request_timeout, None disables the
+        watchdog, see voyager/env/watchdog.py
+        :param watchdog_interval: seconds between two /health polls of the watchdog
+        """
         if not mc_port:
             raise ValueError("mc_port must be specified")
         self.mc_port = mc_port
+        self.server_host = server_host
         self.server = f"{server_host}:{server_port}"
         self.server_port = server_port
         self.request_timeout = request_timeout
         self.log_path = log_path
-        self.mineflayer = self.get_mineflayer_process(server_port)
+        self.fused_step = fused_step
+        self.bot_username = bot_username
+        self.pause_server = pause_server
+        self.server_command = server_command
+        if bot_username == "bot":
+            self.process_name = "mineflayer"
+        else:
+            self.process_name = f"mineflayer_{bot_username}"
+        self.wire_format = wire_format
+        self.delta = DeltaDecoder() if delta_observations else None
+        self.program_cache = ProgramCache()
+        self.transport = self.get_transport()
+        self.mineflayer = self.get_mineflayer_process(server_port, self.process_name)
+        self.resources = ResourceSampler(
+            interval=resource_sample_interval, thresholds=recycle_thresholds
+        )
+        self.watchdog = None
+        if watchdog_timeout is not None:
+            self.watchdog = Watchdog(
+                self.server,
+                self.on_stall,
+                interval=watchdog_interval,
+                stall_timeout=watchdog_timeout,
+            )
+        self.warm_reset = warm_reset
+        self.standby_port = standby_port
+        self.standby = None
+        self.standby_thread = None
+        if standby_port is not None:
+            self.standby = self.get_mineflayer_process(
+                standby_port, name=f"{self.process_name}_standby"
+            )
         self.mc_instance = None
         self.has_reset = False
         self.reset_options = None
         self.connected = False
         self.server_paused = False
+        # whether the process answered the last request properly and can be reused
+        self.healthy = False
 
-    def get_mineflayer_process(self, server_port):
+    def get_transport(self):
+        return HttpTransport(
+            self.server,
+            request_timeout=self.request_timeout,
+            headers={"Accept": wire.accept_header(self.wire_format)},
+        )
+
+    def get_mineflayer_process(self, server_port, name="mineflayer"):
         U.f_mkdir(self.log_path, "mineflayer")
         file_path = os.path.abspath(os.path.dirname(__file__))
+        if self.server_command is None:
+            commands = ["node", U.f_join(file_path, "mineflayer/index.js")]
+        else:
+            commands = list(self.server_command)
         return SubprocessMonitor(
-            commands=[
-                "node",
-                U.f_join(file_path, "mineflayer/index.js"),
-                str(server_port),
-            ],
-            name="mineflayer",
+            commands=commands + [str(server_port)],
+            name=name,
             ready_match=r"Server started on port (\d+)",
             log_path=U.f_join(self.log_path, "mineflayer"),
         )
 
+    def launch_standby(self):
+        if self.standby is None or self.standby.is_running:
+            return
+        if self.standby_thread is not None and self.standby_thread.is_alive():
+            return
+        self.standby_thread = threading.Thread(target=self.standby.run, daemon=True)
+        self.standby_thread.start()
+
+    def swap_in_standby(self):
+        if (
+            self.standby is None
+            or not self.standby.is_running
+            or self.standby.ready_line is None
+        ):
+            return False
+        print(f"Swapping in standby mineflayer process on port {self.standby_port}")
+        # the two processes trade roles, the dead one is relaunched as standby
+        self.mineflayer, self.standby = self.standby, self.mineflayer
+        self.server_port, self.standby_port = self.standby_port, self.server_port
+        self.server = f"{self.server_host}:{self.server_port}"
+        self.transport.server = self.server
+        return True
+
     def check_process(self):
         retry = 0
         while not self.mineflayer.is_running:
             print("Mineflayer process has exited, restarting")
-            self.mineflayer.run()
+            if not self.swap_in_standby():
+                self.mineflayer.run()
             if not self.mineflayer.is_running:
                 if retry > 3:
-                    raise RuntimeError("Mineflayer process failed to start")
+                    output = "\n".join(self.mineflayer.tail(20))
+                    raise RuntimeError(
+                        f"Mineflayer process failed to start, last output:\n{output}"
+                    )
                 else:
+                    retry += 1
                     continue
+            self.launch_standby()
             print(self.mineflayer.ready_line)
-            res = requests.post(
-                f"{self.server}/start",
-                json=self.reset_options,
-                timeout=self.request_timeout,
-            )
+            self.resources.attach(self.mineflayer.process.pid)
+            # connections pooled to the previous process are dead
+            self.transport.reset()
+            self.program_cache.reset()
+            res = self.transport.post("/start", json=self.reset_options)
             if res.status_code != 200:
                 self.mineflayer.stop()
                 raise RuntimeError(
                     f"Minecraft server reply with code {res.status_code}"
                 )
-            return res.json()
+            self.healthy = True
+            return wire.decode_response(res)
+
+    def warm_start(self):
+        """
+        Reinitialize the bot inside the running mineflayer process.
+        Returns None if the process could not be reused.
+        """
+        try:
+            res = self.transport.post(
+                "/start", json=dict(self.reset_options, warm=True)
+            )
+        except requests.RequestException as e:
+            print(f"Warm reset failed, restarting mineflayer: {e}")
+            return None
+        if res.status_code != 200:
+            print(
+                f"Warm reset failed with code {res.status_code}, restarting mineflayer"
+            )
+            return None
+        return wire.decode_response(res)
 
     def step(
         self,
         code: str,
-        programs: str = "",
+        programs: Union[str, Sequence[str]] = "",
+        policy: Optional[Callable[[Dict], Optional[str]]] = None,
+        tick_budget: Optional[int] = None,
+        wall_budget: Optional[float] = None,
     ) -> Tuple[ObsType, SupportsFloat, bool, bool, Dict[str, Any]]:
+        """
+        :param programs: either one string that is evaluated before the code on every
+        step, or a sequence of program sources that mineflayer compiles once and
+        caches by content hash
+        :param policy: if set, events are streamed while the program runs and passed
+        to policy, which returns a reason string to abort the program early, see
+        voyager/env/stream.py
+        :param tick_budget: stop the program after this many game ticks
+        :param wall_budget: stop the program after this many seconds
+        A program that runs out of budget is stopped without an error, the events end
+        with an onTimeout event saying which budget was spent
+        """
         if not self.has_reset:
             raise RuntimeError("Environment has not been reset yet")
         self.check_process()
-        self.unpause()
+        data, sources = self.get_step_data(
+            code, programs, tick_budget=tick_budget, wall_budget=wall_budget
+        )
+        if policy is not None:
+            data["stream"] = True
+        self.start_watchdog()
+        try:
+            if self.fused_step and self.pause_server:
+                data["unpause"] = self.server_paused
+                res = self.post_step("/fused_step", data, sources)
+                # the server always re-pauses before replying
+                self.server_paused = True
+                return self.read_events(res, policy)
+            self.unpause()
+            res = self.post_step("/step", data, sources)
+            events = self.read_events(res, policy)
+            self.pause()
+            return events
+        except Exception as e:
+            self.step_failed()
+            self.raise_if_stalled(e)
+            raise
+        finally:
+            self.stop_watchdog()
+
+    def start_watchdog(self):
+        if self.watchdog is not None:
+            if self.watchdog.transport.server != self.server:
+                # the standby was swapped in since the last step
+                self.watchdog.transport.server = self.server
+                self.watchdog.transport.reset()
+            self.watchdog.start()
+
+    def stop_watchdog(self):
+        if self.watchdog is not None:
+            self.watchdog.stop()
+
+    def on_stall(self, reason):
+        print(f"\033[31mMineflayer watchdog: {reason}, stopping the process\033[0m")
+        self.healthy = False
+        # the blocked step request fails as soon as the connection drops
+        self.mineflayer.stop()
+
+    def stalled(self):
+        return self.watchdog is not None and bool(self.watchdog.reason)
+
+    def stall_error(self):
+        return RuntimeError(
+            f"Mineflayer stopped responding during the step: "
+            f"{self.watchdog.reason}\n" + "\n".join(self.mineflayer.tail(20))
+        )
+
+    def raise_if_stalled(self, error):
+        if self.stalled():
+            # the request fails before on_stall is done stopping the process
+            self.watchdog.join()
+            raise self.stall_error() from error
+
+    def get_step_data(self, code, programs, tick_budget=None, wall_budget=None):
         data = {
             "code": code,
             "programs": programs,
         }
-        res = requests.post(
-            f"{self.server}/step", json=data, timeout=self.request_timeout
-        )
+        if tick_budget is not None:
+            data["tickBudget"] = tick_budget
+        if wall_budget is not None:
+            data["wallBudget"] = wall_budget
+        sources = None
+        if not isinstance(programs, str):
+            sources = list(programs)
+            data["programs"] = ""
+            data["registry"] = self.program_cache.payload(sources)
+        if self.delta is not None:
+            data["delta"] = self.delta.seq
+        return data, sources
+
+    def step_failed(self):
+        # the program may still be running, do not reuse this process
+        self.healthy = False
+        # we may have missed a reply, make the next step resync
+        if self.delta is not None:
+            self.delta.reset()
+
+    def post_step(self, route, data, sources):
+        stream = data.get("stream", False)
+        res = self.transport.post(route, json=data, stream=stream)
+        if res.status_code == 409 and sources is not None:
+            self.resend_programs(data, sources, res.json()["missing"])
+            res = self.transport.post(route, json=data, stream=stream)
         if res.status_code != 200:
             raise RuntimeError("Failed to step Minecraft server")
-        returned_data = res.json()
-        self.pause()
-        return json.loads(returned_data)
+        if sources is not None:
+            self.program_cache.mark_sent(data["registry"])
+        return res
+
+    def resend_programs(self, data, sources, missing):
+        # the server does not hold some programs we assumed it had
+        self.program_cache.mark_sent(data["registry"])
+        data["registry"] = self.program_cache.payload(sources, resend=set(missing))
+
+    def read_events(self, res, policy):
+        if policy is None:
+            return self.decode_events(res)
+        step_stream = StepStream(policy)
+        with res:
+            for line in res.iter_lines():
+                reason = step_stream.feed(line)
+                if reason:
+                    self.abort(reason)
+        return self.decode_observation(step_stream.result())
+
+    def abort(self, reason):
+        """
+        Stop the program of the running step, its reply still carries the events.
+        """
+        print(f"\033[33mAborting step: {reason}\033[0m")
+        res = self.transport.post("/abort", json={"reason": reason})
+        return res.status_code == 200
+
+    def decode_events(self, res):
+        return self.decode_observation(wire.decode_response(res))
+
+    def decode_observation(self, data):
+        if self.delta is not None:
+            return self.delta.decode(data)
+        return data
 
     def render(self):
         raise NotImplementedError("render is not implemented")
@@ -105,14 +371,56 @@ class VoyagerEnv(gym.Env):
         seed=None,
         options=None,
     ) -> Tuple[ObsType, Dict[str, Any]]:
+        self.reset_options = self.get_reset_options(options)
+
+        self.unpause()
+        if self.delta is not None:
+            self.delta.reset()
+        returned_data = None
+        if self.warm_reset and self.healthy and self.mineflayer.is_running:
+            returned_data = self.warm_start()
+        if returned_data is None:
+            self.mineflayer.stop()
+            if self.standby is None:
+                time.sleep(1)  # wait for mineflayer to exit
+            returned_data = self.check_process()
+        self.reset_done()
+        self.pause()
+        return returned_data
+
+    def resource_usage(self):
+        """
+        The latest resource sample of the mineflayer process, see resources.series()
+        for the whole time series.
+        """
+        return self.resources.latest()
+
+    def needs_recycle(self):
+        """
+        :return: the recycle thresholds the mineflayer process crossed
+        """
+        if not self.mineflayer.is_running:
+            return []
+        return self.resources.exceeded()
+
+    def recycle(self):
+        """
+        Stop the mineflayer process on purpose, meant to be called between tasks.
+        The next reset or step starts a fresh one.
+        """
+        self.mineflayer.stop()
+        self.step_failed()
+
+    def get_reset_options(self, options):
         if options is None:
             options = {}
 
         if options.get("inventory", {}) and options.get("mode", "hard") != "hard":
             raise RuntimeError("inventory can only be set when options is hard")
 
-        self.reset_options = {
+        return {
             "port": self.mc_port,
+            "username": self.bot_username,
             "reset": options.get("mode", "hard"),
             "inventory": options.get("inventory", {}),
             "equipment": options.get("equipment", []),
@@ -121,37 +429,39 @@ class VoyagerEnv(gym.Env):
             "position": options.get("position", None),
         }
 
-        self.unpause()
-        self.mineflayer.stop()
-        time.sleep(1)  # wait for mineflayer to exit
-
-        returned_data = self.check_process()
+    def reset_done(self):
         self.has_reset = True
         self.connected = True
         # All the reset in step will be soft
         self.reset_options["reset"] = "soft"
-        self.pause()
-        return json.loads(returned_data)
 
     def close(self):
         self.unpause()
-        if self.connected:
-            res = requests.post(f"{self.server}/stop")
+        if self.connected and self.mineflayer.is_running:
+            res = self.transport.post("/stop")
             if res.status_code == 200:
                 self.connected = False
         self.mineflayer.stop()
+        if self.standby is not None:
+            self.standby.stop()
+        self.resources.stop()
+        if self.watchdog is not None:
+            self.watchdog.close()
+        self.transport.close()
         return not self.connected
 
     def pause(self):
+        if not self.pause_server:
+            return self.server_paused
         if self.mineflayer.is_running and not self.server_paused:
-            res = requests.post(f"{self.server}/pause")
+            res = self.transport.post("/pause")
             if res.status_code == 200:
                 self.server_paused = True
         return self.server_paused
 
     def unpause(self):
         if self.mineflayer.is_running and self.server_paused:
-            res = requests.post(f"{self.server}/pause")
+            res = self.transport.post("/pause")
             if res.status_code == 200:
                 self.server_paused = False
             else:
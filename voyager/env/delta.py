@@ -0,0 +1,78 @@
+import json
+
+
+class DeltaDecoder:
+    """
+    Rebuild full observation events from the delta messages sent by
+    mineflayer/lib/delta.js.
+
+    Fields that did not change are shared between the rebuilt events, so event
+    values should be treated as read-only.
+    """
+
+    def __init__(self):
+        self.seq = None
+        self.state = {}
+
+    def reset(self):
+        """
+        Forget the last observation, the next request will ask for a full resync.
+        """
+        self.seq = None
+        self.state = {}
+
+    def decode(self, message):
+        base = message["base"]
+        if base is None:
+            self.state = {}
+        elif base != self.seq:
+            expected = self.seq
+            self.reset()
+            raise RuntimeError(
+                f"Delta observation is based on sequence {base} but the last "
+                f"received sequence is {expected}"
+            )
+        events = []
+        for event_type, changed in message["events"]:
+            event_fields = {}
+            for key, value in changed.items():
+                if key.startswith("on"):
+                    event_fields[key] = value
+                else:
+                    self.state[key] = value
+            events.append([event_type, {**self.state, **event_fields}])
+        self.seq = message["seq"]
+        return events
+
+
+class DeltaEncoder:
+    """
+    Python port of mineflayer/lib/delta.js, used by the stand-in server.
+    """
+
+    def __init__(self):
+        self.seq = 0
+        self.fields = None
+
+    def reset(self):
+        self.fields = None
+
+    def encode(self, events, client_seq):
+        base = self.seq
+        if self.fields is None or client_seq != self.seq:
+            self.fields = {}
+            base = None
+        deltas = []
+        for name, event in events:
+            changed = {}
+            for key, value in event.items():
+                if key.startswith("on"):
+                    changed[key] = value
+                    continue
+                serialized = json.dumps(value, sort_keys=True)
+                if self.fields.get(key) != serialized:
+                    self.fields[key] = serialized
+                    changed[key] = value
+            deltas.append([name, changed])
+        self.seq += 1
+        return {"seq": self.seq, "base": base, "events": deltas}
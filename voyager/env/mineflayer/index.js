@@ -12,10 +12,19 @@ const { Voxels, BlockRecords } = require("./lib/observation/voxels");
 const Status = require("./lib/observation/status");
 const Inventory = require("./lib/observation/inventory");
 const OnSave = require("./lib/observation/onSave");
+const OnTimeout = require("./lib/observation/onTimeout");
 const Chests = require("./lib/observation/chests");
+const wire = require("./lib/wire");
+const { DeltaEncoder } = require("./lib/delta");
+const { ProgramRegistry } = require("./lib/programRegistry");
+const { preempt, guardBot } = require("./lib/preempt");
 const { plugin: tool } = require("mineflayer-tool");
 
 let bot = null;
+const deltaEncoder = new DeltaEncoder();
+const programRegistry = new ProgramRegistry();
+// set while a step is running, cuts the program short
+let abortStep = null;
 
 const app = express();
 
@@ -23,24 +32,37 @@ app.use(bodyParser.json({ limit: "50mb" }));
 app.use(bodyParser.urlencoded({ limit: "50mb", extended: false }));
 
 app.post("/start", (req, res) => {
+    const username = req.body.username || "bot";
+    if (
+        req.body.warm &&
+        bot &&
+        bot.entity &&
+        bot.mcPort === req.body.port &&
+        bot.username === username
+    ) {
+        // keep the process and the connection, only reinitialize bot state
+        console.log(req.body);
+        deltaEncoder.reset();
+        initBotState(req.body);
+        setupBot(req, res, true);
+        return;
+    }
     if (bot) onDisconnect("Restarting bot");
     bot = null;
+    deltaEncoder.reset();
     console.log(req.body);
     bot = mineflayer.createBot({
         host: "localhost", // minecraft server ip
         port: req.body.port, // minecraft server port
-        username: "bot",
+        username: username,
         disableChatSigning: true,
         checkTimeoutInterval: 60 * 60 * 1000,
     });
     bot.once("error", onConnectionFailed);
+    trackLiveness(bot);
 
     // Event subscriptions
-    bot.waitTicks = req.body.waitTicks;
-    bot.globalTickCounter = 0;
-    bot.stuckTickCounter = 0;
-    bot.stuckPosList = [];
-    bot.iron_pickaxe = false;
+    initBotState(req.body);
 
     bot.on("kicked", onDisconnect);
 
@@ -51,50 +73,96 @@ app.post("/start", (req, res) => {
 
     bot.once("spawn", async () => {
         bot.removeListener("error", onConnectionFailed);
-        let itemTicks = 1;
-        if (req.body.reset === "hard") {
-            bot.chat("/clear @s");
-            bot.chat("/kill @s");
-            const inventory = req.body.inventory ? req.body.inventory : {};
-            const equipment = req.body.equipment
-                ? req.body.equipment
-                : [null, null, null, null, null, null];
-            for (let key in inventory) {
-                bot.chat(`/give @s minecraft:${key} ${inventory[key]}`);
+        await setupBot(req, res, false);
+    });
+
+    function onConnectionFailed(e) {
+        console.log(e);
+        bot = null;
+        res.status(400).json({ error: e });
+    }
+    function onDisconnect(message) {
+        if (bot.viewer) {
+            bot.viewer.close();
+        }
+        bot.end();
+        console.log(message);
+        bot = null;
+    }
+});
+
+// counters reported by /health, the watchdog expects both to keep advancing
+function trackLiveness(bot) {
+    bot.totalTicks = 0;
+    bot.packetCount = 0;
+    bot.on("physicsTick", () => {
+        bot.totalTicks++;
+    });
+    bot._client.on("packet", () => {
+        bot.packetCount++;
+    });
+}
+
+function initBotState(body) {
+    bot.mcPort = body.port;
+    bot.waitTicks = body.waitTicks;
+    bot.globalTickCounter = 0;
+    bot.stuckTickCounter = 0;
+    bot.stuckPosList = [];
+    bot.iron_pickaxe = false;
+}
+
+async function setupBot(req, res, warm) {
+    if (warm) {
+        // stop whatever the previous program left running
+        preempt(bot);
+    }
+    let itemTicks = 1;
+    if (req.body.reset === "hard") {
+        bot.chat("/clear @s");
+        bot.chat("/kill @s");
+        const inventory = req.body.inventory ? req.body.inventory : {};
+        const equipment = req.body.equipment
+            ? req.body.equipment
+            : [null, null, null, null, null, null];
+        for (let key in inventory) {
+            bot.chat(`/give @s minecraft:${key} ${inventory[key]}`);
+            itemTicks += 1;
+        }
+        const equipmentNames = [
+            "armor.head",
+            "armor.chest",
+            "armor.legs",
+            "armor.feet",
+            "weapon.mainhand",
+            "weapon.offhand",
+        ];
+        for (let i = 0; i < 6; i++) {
+            if (i === 4) continue;
+            if (equipment[i]) {
+                bot.chat(
+                    `/item replace entity @s ${equipmentNames[i]} with minecraft:${equipment[i]}`
+                );
                 itemTicks += 1;
             }
-            const equipmentNames = [
-                "armor.head",
-                "armor.chest",
-                "armor.legs",
-                "armor.feet",
-                "weapon.mainhand",
-                "weapon.offhand",
-            ];
-            for (let i = 0; i < 6; i++) {
-                if (i === 4) continue;
-                if (equipment[i]) {
-                    bot.chat(
-                        `/item replace entity @s ${equipmentNames[i]} with minecraft:${equipment[i]}`
-                    );
-                    itemTicks += 1;
-                }
-            }
         }
+    }
 
-        if (req.body.position) {
-            bot.chat(
-                `/tp @s ${req.body.position.x} ${req.body.position.y} ${req.body.position.z}`
-            );
-        }
+    if (req.body.position) {
+        bot.chat(
+            `/tp @s ${req.body.position.x} ${req.body.position.y} ${req.body.position.z}`
+        );
+    }
 
-        // if iron_pickaxe is in bot's inventory
-        if (
-            bot.inventory.items().find((item) => item.name === "iron_pickaxe")
-        ) {
-            bot.iron_pickaxe = true;
-        }
+    // if iron_pickaxe is in bot's inventory
+    if (bot.inventory.items().find((item) => item.name === "iron_pickaxe")) {
+        bot.iron_pickaxe = true;
+    }
 
+    if (warm) {
+        // plugins and listeners are already in place
+        obs.reset(bot);
+    } else {
         const { pathfinder } = require("mineflayer-pathfinder");
         const tool = require("mineflayer-tool").plugin;
         const collectBlock = require("mineflayer-collectblock").plugin;
@@ -116,51 +184,117 @@ app.post("/start", (req, res) => {
             Status,
             Inventory,
             OnSave,
+            OnTimeout,
             Chests,
             BlockRecords,
         ]);
         skills.inject(bot);
+    }
 
-        if (req.body.spread) {
-            bot.chat(`/spreadplayers ~ ~ 0 300 under 80 false @s`);
-            await bot.waitForTicks(bot.waitTicks);
-        }
+    if (req.body.spread) {
+        bot.chat(`/spreadplayers ~ ~ 0 300 under 80 false @s`);
+        await bot.waitForTicks(bot.waitTicks);
+    }
 
-        await bot.waitForTicks(bot.waitTicks * itemTicks);
-        res.json(bot.observe());
+    await bot.waitForTicks(bot.waitTicks * itemTicks);
+    wire.send(req, res, bot.observe());
 
-        initCounter(bot);
-        bot.chat("/gamerule keepInventory true");
-        bot.chat("/gamerule doDaylightCycle false");
-    });
+    initCounter(bot);
+    bot.chat("/gamerule keepInventory true");
+    bot.chat("/gamerule doDaylightCycle false");
+}
 
-    function onConnectionFailed(e) {
-        console.log(e);
-        bot = null;
-        res.status(400).json({ error: e });
-    }
-    function onDisconnect(message) {
-        if (bot.viewer) {
-            bot.viewer.close();
+app.post("/step", (req, res) => step(req, res, false));
+
+// Unpause, execute and re-pause in one request to save two round trips
+app.post("/fused_step", (req, res) => step(req, res, true));
+
+async function step(req, res, fused) {
+    // programs are sent by hash, ask for unknown bodies before running anything
+    const registry = req.body.registry;
+    if (registry) {
+        const missing = programRegistry.register(registry);
+        if (missing.length > 0) {
+            res.status(409).json({ missing: missing });
+            return;
         }
-        bot.end();
-        console.log(message);
-        bot = null;
     }
-});
 
-app.post("/step", async (req, res) => {
     // import useful package
     let response_sent = false;
+
+    // streaming clients get every event as it happens and the full
+    // observation as the last line
+    const stream = req.body.stream ? new wire.EventStream(res) : null;
+    function streamEvent(name, result) {
+        if (!name.startsWith("on")) return;
+        stream.write({
+            type: "event",
+            name: name,
+            value: result[name],
+            status: result.status,
+        });
+    }
+    if (stream) {
+        bot.on("observationEvent", streamEvent);
+    }
+
+    // the program only sees stepBot, which stops working when the step ends
+    const token = { cancelled: false, reason: null };
+    const stepBot = guardBot(bot, token);
+    function cancelProgram(reason) {
+        if (token.cancelled) return;
+        token.cancelled = true;
+        token.reason = reason;
+    }
+    const aborted = new Promise((resolve) => {
+        abortStep = (reason, outcome) => {
+            abortStep = null;
+            console.log(`Aborting step: ${reason}`);
+            cancelProgram(reason);
+            preempt(bot);
+            resolve(outcome || new Error(`Execution aborted: ${reason}`));
+        };
+    });
+    if (stream) {
+        // a client that stops reading does not want the program to go on
+        res.on("close", () => {
+            if (!response_sent && abortStep) abortStep("client disconnected");
+        });
+    }
+
+    function sendObservation() {
+        if (response_sent) return;
+        response_sent = true;
+        abortStep = null;
+        // whatever the program still runs must not act in the next step
+        cancelProgram("its step is over");
+        if (stream) {
+            bot.removeListener("observationEvent", streamEvent);
+        }
+        // clients in delta mode send the sequence number they last received
+        const observation =
+            req.body.delta === undefined
+                ? bot.observe()
+                : deltaEncoder.encode(bot.observe(), req.body.delta);
+        const reply = () => {
+            if (stream) {
+                stream.end({ type: "observation", data: observation });
+            } else {
+                wire.send(req, res, observation);
+            }
+        };
+        if (!fused) {
+            reply();
+            return;
+        }
+        bot.chat("/pause");
+        bot.waitForTicks(bot.waitTicks).then(reply);
+    }
     function otherError(err) {
         console.log("Uncaught Error");
         bot.emit("error", handleError(err));
-        bot.waitForTicks(bot.waitTicks).then(() => {
-            if (!response_sent) {
-                response_sent = true;
-                res.json(bot.observe());
-            }
-        });
+        bot.waitForTicks(bot.waitTicks).then(sendObservation);
     }
 
     process.on("uncaughtException", otherError);
@@ -174,6 +308,7 @@ app.post("/step", async (req, res) => {
     mcData.itemsByName["leather_boots"] = mcData.itemsByName["leather_boots"];
     mcData.itemsByName["lapis_lazuli_ore"] = mcData.itemsByName["lapis_ore"];
     mcData.blocksByName["lapis_lazuli_ore"] = mcData.blocksByName["lapis_ore"];
+    const pathfinderModule = require("mineflayer-pathfinder");
     const {
         Movements,
         goals: {
@@ -200,7 +335,7 @@ app.post("/step", async (req, res) => {
         XYZCoordinates,
         SafeBlock,
         GoalPlaceBlockOptions,
-    } = require("mineflayer-pathfinder");
+    } = pathfinderModule;
     const { Vec3 } = require("vec3");
 
     // Set up pathfinder
@@ -211,8 +346,33 @@ app.post("/step", async (req, res) => {
     bot.stuckTickCounter = 0;
     bot.stuckPosList = [];
 
+    // optional budgets for the program, in game ticks and in seconds
+    const tickBudget = req.body.tickBudget;
+    const wallBudget = req.body.wallBudget;
+    let startTick = null;
+    let startTime = null;
+    let wallTimer = null;
+
+    function budgetExceeded(budget, limit) {
+        if (!abortStep) return;
+        bot.emit("timeout", {
+            budget: budget,
+            limit: limit,
+            ticks: bot.globalTickCounter - startTick,
+            seconds: (Date.now() - startTime) / 1000,
+        });
+        abortStep(`${budget} budget of ${limit} exceeded`, "timeout");
+    }
+
     function onTick() {
         bot.globalTickCounter++;
+        if (
+            tickBudget &&
+            startTick !== null &&
+            bot.globalTickCounter - startTick >= tickBudget
+        ) {
+            budgetExceeded("tick", tickBudget);
+        }
         if (bot.pathfinder.isMoving()) {
             bot.stuckTickCounter++;
             if (bot.stuckTickCounter >= 100) {
@@ -231,29 +391,74 @@ app.post("/step", async (req, res) => {
     let _placeItemFailCount = 0;
     let _smeltItemFailCount = 0;
 
+    if (registry) {
+        // registered programs see the same names an inline eval would
+        Object.assign(
+            programRegistry.scope,
+            pathfinderModule,
+            pathfinderModule.goals,
+            {
+                bot: stepBot,
+                mcData,
+                movements,
+                Vec3,
+                require,
+                getNextTime,
+                _craftItemFailCount,
+                _killMobFailCount,
+                _mineBlockFailCount,
+                _placeItemFailCount,
+                _smeltItemFailCount,
+            }
+        );
+    }
+
+    if (fused && req.body.unpause) {
+        bot.chat("/pause");
+    }
+
     // Retrieve array form post bod
     const code = req.body.code;
     const programs = req.body.programs;
     bot.cumulativeObs = [];
     await bot.waitForTicks(bot.waitTicks);
-    const r = await evaluateCode(code, programs);
+    startTick = bot.globalTickCounter;
+    startTime = Date.now();
+    if (wallBudget) {
+        wallTimer = setTimeout(
+            () => budgetExceeded("wall", wallBudget),
+            wallBudget * 1000
+        );
+    }
+    const r = await Promise.race([evaluateCode(code, programs), aborted]);
+    clearTimeout(wallTimer);
+    startTick = null;
     process.off("uncaughtException", otherError);
-    if (r !== "success") {
+    // a spent budget is reported by the onTimeout event, not as an error
+    if (r !== "success" && r !== "timeout") {
         bot.emit("error", handleError(r));
     }
     await returnItems();
     // wait for last message
     await bot.waitForTicks(bot.waitTicks);
-    if (!response_sent) {
-        response_sent = true;
-        res.json(bot.observe());
-    }
+    sendObservation();
     bot.removeListener("physicTick", onTick);
 
     async function evaluateCode(code, programs) {
         // Echo the code produced for players to see it. Don't echo when the bot code is already producing dialog or it will double echo
         try {
-            await eval("(async () => {" + programs + "\n" + code + "})()");
+            if (registry) {
+                programRegistry.activate(registry.hashes);
+                await eval(
+                    "with (programRegistry.scope) { (async () => {\n" +
+                        code +
+                        "})() }"
+                );
+            } else {
+                await eval(
+                    "(async (bot) => {" + programs + "\n" + code + "})(stepBot)"
+                );
+            }
             return "success";
         } catch (err) {
             return err;
@@ -270,6 +475,9 @@ app.post("/step", async (req, res) => {
             const posDifference = currentPos.distanceTo(oldestPos);
 
             if (posDifference < posThreshold) {
+                if (stream) {
+                    stream.write({ type: "stuck", position: currentPos });
+                }
                 teleportBot(); // execute the function
             }
 
@@ -393,9 +601,51 @@ app.post("/step", async (req, res) => {
                     [match_line - 1].trim()} in your code`;
             }
             return source + err.message + "\n" + code_source;
+        } else if (
+            f_line &&
+            f_line.groups &&
+            programRegistry.sourceLine(f_line.groups.file, f_line.groups.line)
+        ) {
+            const { file, line, pos } = f_line.groups;
+            const source =
+                "In your program code: " +
+                programRegistry.sourceLine(file, line) +
+                "\n";
+            const code_source = `at line ${match_line}:${code
+                .split("\n")
+                [match_line - 1].trim()} in your code`;
+            return source + err.message + "\n" + code_source;
         }
         return err.message;
     }
+}
+
+app.post("/abort", (req, res) => {
+    if (!abortStep) {
+        res.status(409).json({ error: "No step is running" });
+        return;
+    }
+    abortStep(req.body.reason || "requested by client");
+    res.json({ message: "Aborting" });
+});
+
+// cheap liveness probe polled by the python watchdog while a step runs
+app.get("/health", (req, res) => {
+    if (!bot || !bot.entity) {
+        res.json({ spawned: false, stepRunning: abortStep !== null });
+        return;
+    }
+    res.json({
+        spawned: true,
+        ticks: bot.totalTicks,
+        packets: bot.packetCount,
+        stepRunning: abortStep !== null,
+        entity: {
+            position: bot.entity.position,
+            health: bot.health,
+            food: bot.food,
+        },
+    });
 });
 
 app.post("/stop", (req, res) => {
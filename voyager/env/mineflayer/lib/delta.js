@@ -0,0 +1,45 @@
+// Delta encoding of observation events.
+//
+// Every event repeats inventory, voxels, status and so on. The encoder keeps
+// the last value it sent for each field and only sends fields that changed,
+// together with a sequence number. Event specific fields (onChat, onError,
+// ...) are always sent. If the client reports a sequence number other than
+// the last one sent, the encoder resyncs by sending every field again.
+
+class DeltaEncoder {
+    constructor() {
+        this.seq = 0;
+        this.fields = null;
+    }
+
+    reset() {
+        this.fields = null;
+    }
+
+    encode(events, clientSeq) {
+        let base = this.seq;
+        if (this.fields === null || clientSeq !== this.seq) {
+            this.fields = {};
+            base = null;
+        }
+        const deltas = events.map(([name, event]) => {
+            const changed = {};
+            for (const key of Object.keys(event)) {
+                if (key.startsWith("on")) {
+                    changed[key] = event[key];
+                    continue;
+                }
+                const serialized = JSON.stringify(event[key]);
+                if (this.fields[key] !== serialized) {
+                    this.fields[key] = serialized;
+                    changed[key] = event[key];
+                }
+            }
+            return [name, changed];
+        });
+        this.seq += 1;
+        return { seq: this.seq, base: base, events: deltas };
+    }
+}
+
+module.exports = { DeltaEncoder };
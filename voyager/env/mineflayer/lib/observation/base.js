@@ -33,13 +33,23 @@ function inject(bot, obs_list) {
             result[obs.name] = obs.observe();
         });
         bot.cumulativeObs.push([event_name, result]);
+        bot.emit("observationEvent", event_name, result);
     };
     bot.observe = function () {
         bot.event("observe");
         const result = bot.cumulativeObs;
         bot.cumulativeObs = [];
-        return JSON.stringify(result);
+        return result;
     };
 }
 
-module.exports = { Observation, inject };
+// Clear all observation state, used when a bot is reused for a new task
+function reset(bot) {
+    bot.obsList.forEach((obs) => {
+        obs.reset();
+    });
+    bot.cumulativeObs = [];
+    bot.eventMemory = {};
+}
+
+module.exports = { Observation, inject, reset };
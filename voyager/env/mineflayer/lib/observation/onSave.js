@@ -17,6 +17,10 @@ class onSave extends Observation {
         this.obs = null;
         return result;
     }
+
+    reset() {
+        this.obs = null;
+    }
 }
 
 module.exports = onSave;
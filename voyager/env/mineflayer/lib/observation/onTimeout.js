@@ -0,0 +1,26 @@
+const Observation = require("./base.js").Observation;
+
+class onTimeout extends Observation {
+    constructor(bot) {
+        super(bot);
+        this.name = "onTimeout";
+        this.obs = null;
+        bot.on("timeout", (budget) => {
+            // Save which budget ran out and how much was used
+            this.obs = budget;
+            this.bot.event(this.name);
+        });
+    }
+
+    observe() {
+        const result = this.obs;
+        this.obs = null;
+        return result;
+    }
+
+    reset() {
+        this.obs = null;
+    }
+}
+
+module.exports = onTimeout;
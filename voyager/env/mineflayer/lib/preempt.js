@@ -0,0 +1,38 @@
+// Stop whatever a program left the bot doing.
+//
+// A running program cannot be killed, but most control primitives wait on the
+// pathfinder, pvp, digging or control states. Stopping those makes their
+// pending promises settle quickly once a step has been cut short. Programs get
+// the bot through guardBot, so a program that keeps going after its step is
+// over fails on its next use of the bot instead of acting in later steps.
+
+function preempt(bot) {
+    bot.pathfinder.setGoal(null);
+    bot.pvp.stop();
+    bot.clearControlStates();
+    if (bot.targetDigBlock) {
+        bot.stopDigging();
+    }
+}
+
+// A bot for the program of one step. Once token.cancelled is set every access
+// throws, e.g. the next iteration of while (true) { await bot.waitForTicks(1) }
+function guardBot(bot, token) {
+    return new Proxy(bot, {
+        get(target, prop) {
+            if (token.cancelled) {
+                throw new Error(`Program stopped: ${token.reason}`);
+            }
+            const value = Reflect.get(target, prop, target);
+            return typeof value === "function" ? value.bind(target) : value;
+        },
+        set(target, prop, value) {
+            if (token.cancelled) {
+                throw new Error(`Program stopped: ${token.reason}`);
+            }
+            return Reflect.set(target, prop, value, target);
+        },
+    });
+}
+
+module.exports = { preempt, guardBot };
@@ -0,0 +1,96 @@
+// Content-addressed registry of skill and control primitive programs.
+//
+// Python sends the hash of every program it wants available and only the
+// bodies this process has not seen yet. Each body is compiled once and the
+// resulting functions are kept between steps. Programs resolve free names
+// (bot, mcData, goals, other programs, ...) through one shared scope object
+// that the step handler refreshes before running code.
+
+const SOURCE_PREFIX = "voyager-program-";
+// new Function adds two lines before the body and we add one more
+const HEADER_LINES = 3;
+
+function declaredFunctions(source) {
+    const names = [];
+    const pattern = /^(?:async\s+)?function\s*\*?\s*([A-Za-z_$][\w$]*)/gm;
+    let match;
+    while ((match = pattern.exec(source)) !== null) {
+        names.push(match[1]);
+    }
+    return names;
+}
+
+class ProgramRegistry {
+    constructor() {
+        this.programs = new Map();
+        this.scope = {};
+        this.active = new Set();
+    }
+
+    has(hash) {
+        return this.programs.has(hash);
+    }
+
+    add(hash, source) {
+        const names = declaredFunctions(source);
+        const exports = names
+            .map(
+                (name) =>
+                    `${name}: typeof ${name} === "function" ? ${name} : undefined`
+            )
+            .join(", ");
+        const program = { source: source.split("\n"), exports: {}, error: null };
+        try {
+            const factory = new Function(
+                "scope",
+                `with (scope) {\n${source}\nreturn { ${exports} };\n}\n` +
+                    `//# sourceURL=${SOURCE_PREFIX}${hash}.js`
+            );
+            program.exports = factory(this.scope);
+        } catch (err) {
+            // surface the error when a step actually uses this program
+            program.error = err;
+        }
+        this.programs.set(hash, program);
+    }
+
+    // Store the bodies sent along and return the hashes that are still unknown
+    register({ hashes, bodies }) {
+        for (const [hash, source] of Object.entries(bodies || {})) {
+            if (!this.has(hash)) this.add(hash, source);
+        }
+        return hashes.filter((hash) => !this.has(hash));
+    }
+
+    // Bind the functions of the given programs into the scope, in order, so
+    // later programs win on name clashes like the concatenated bundle did
+    activate(hashes) {
+        const active = new Set();
+        for (const hash of hashes) {
+            const program = this.programs.get(hash);
+            if (program.error) throw program.error;
+            for (const [name, fn] of Object.entries(program.exports)) {
+                if (fn === undefined) continue;
+                this.scope[name] = fn;
+                active.add(name);
+            }
+        }
+        for (const name of this.active) {
+            if (!active.has(name)) delete this.scope[name];
+        }
+        this.active = active;
+    }
+
+    // Map a stack frame location back to the line of program source
+    sourceLine(file, line) {
+        if (!file.startsWith(SOURCE_PREFIX)) return null;
+        const program = this.programs.get(
+            file.slice(SOURCE_PREFIX.length, -".js".length)
+        );
+        if (!program) return null;
+        const sourceLine = program.source[line - HEADER_LINES - 1];
+        return sourceLine === undefined ? null : sourceLine.trim();
+    }
+}
+
+module.exports = { ProgramRegistry };
@@ -0,0 +1,209 @@
+// Wire formats for sending observations back to Python.
+//
+// "json" is plain single-encoded JSON. "msgpack" is MessagePack with every
+// map key replaced by its index in an interned key table, sent as the
+// two-element array [keyTable, payload]. Values follow JSON.stringify
+// semantics so both formats decode to the same Python objects.
+//
+// Streaming steps always use newline delimited JSON, one message per line.
+
+const JSON_TYPE = "application/json";
+const MSGPACK_TYPE = "application/x-voyager-msgpack";
+const NDJSON_TYPE = "application/x-ndjson";
+
+class Encoder {
+    constructor() {
+        this.buffer = Buffer.allocUnsafe(1 << 16);
+        this.offset = 0;
+        this.keys = new Map();
+    }
+
+    ensure(size) {
+        if (this.offset + size <= this.buffer.length) return;
+        let length = this.buffer.length * 2;
+        while (length < this.offset + size) length *= 2;
+        const buffer = Buffer.allocUnsafe(length);
+        this.buffer.copy(buffer, 0, 0, this.offset);
+        this.buffer = buffer;
+    }
+
+    byte(value) {
+        this.ensure(1);
+        this.buffer[this.offset++] = value;
+    }
+
+    header(size, fix, fixLimit, code16, code32) {
+        if (size < fixLimit) {
+            this.byte(fix | size);
+        } else if (size < 0x10000) {
+            this.ensure(3);
+            this.buffer[this.offset++] = code16;
+            this.buffer.writeUInt16BE(size, this.offset);
+            this.offset += 2;
+        } else {
+            this.ensure(5);
+            this.buffer[this.offset++] = code32;
+            this.buffer.writeUInt32BE(size, this.offset);
+            this.offset += 4;
+        }
+    }
+
+    uint(value) {
+        if (value < 0x80) {
+            this.byte(value);
+        } else if (value < 0x100) {
+            this.ensure(2);
+            this.buffer[this.offset++] = 0xcc;
+            this.buffer[this.offset++] = value;
+        } else if (value < 0x10000) {
+            this.ensure(3);
+            this.buffer[this.offset++] = 0xcd;
+            this.buffer.writeUInt16BE(value, this.offset);
+            this.offset += 2;
+        } else if (value < 0x100000000) {
+            this.ensure(5);
+            this.buffer[this.offset++] = 0xce;
+            this.buffer.writeUInt32BE(value, this.offset);
+            this.offset += 4;
+        } else {
+            this.ensure(9);
+            this.buffer[this.offset++] = 0xcf;
+            this.buffer.writeBigUInt64BE(BigInt(value), this.offset);
+            this.offset += 8;
+        }
+    }
+
+    number(value) {
+        if (!Number.isFinite(value)) {
+            // JSON.stringify turns NaN and Infinity into null
+            this.byte(0xc0);
+        } else if (Number.isSafeInteger(value) && !Object.is(value, -0)) {
+            if (value >= 0) {
+                this.uint(value);
+            } else if (value >= -32) {
+                this.byte(value & 0xff);
+            } else {
+                this.ensure(9);
+                this.buffer[this.offset++] = 0xd3;
+                this.buffer.writeBigInt64BE(BigInt(value), this.offset);
+                this.offset += 8;
+            }
+        } else {
+            this.ensure(9);
+            this.buffer[this.offset++] = 0xcb;
+            this.buffer.writeDoubleBE(value, this.offset);
+            this.offset += 8;
+        }
+    }
+
+    string(value) {
+        const length = Buffer.byteLength(value);
+        if (length < 32) {
+            this.byte(0xa0 | length);
+        } else if (length < 0x100) {
+            this.ensure(2);
+            this.buffer[this.offset++] = 0xd9;
+            this.buffer[this.offset++] = length;
+        } else {
+            this.header(length, 0, 0, 0xda, 0xdb);
+        }
+        this.ensure(length);
+        this.buffer.write(value, this.offset);
+        this.offset += length;
+    }
+
+    key(name) {
+        let index = this.keys.get(name);
+        if (index === undefined) {
+            index = this.keys.size;
+            this.keys.set(name, index);
+        }
+        this.uint(index);
+    }
+
+    value(value) {
+        if (value != null && typeof value.toJSON === "function") {
+            value = value.toJSON();
+        }
+        switch (typeof value) {
+            case "string":
+                this.string(value);
+                return;
+            case "number":
+                this.number(value);
+                return;
+            case "boolean":
+                this.byte(value ? 0xc3 : 0xc2);
+                return;
+            case "object":
+                break;
+            default:
+                // undefined, functions and symbols
+                this.byte(0xc0);
+                return;
+        }
+        if (value === null) {
+            this.byte(0xc0);
+        } else if (Array.isArray(value)) {
+            this.header(value.length, 0x90, 16, 0xdc, 0xdd);
+            for (const item of value) this.value(item);
+        } else {
+            const keys = Object.keys(value).filter((key) => {
+                const type = typeof value[key];
+                return type !== "undefined" && type !== "function";
+            });
+            this.header(keys.length, 0x80, 16, 0xde, 0xdf);
+            for (const key of keys) {
+                this.key(key);
+                this.value(value[key]);
+            }
+        }
+    }
+}
+
+function encode(value) {
+    const payload = new Encoder();
+    payload.value(value);
+    const table = new Encoder();
+    table.byte(0x92);
+    table.value(Array.from(payload.keys.keys()));
+    return Buffer.concat([
+        table.buffer.subarray(0, table.offset),
+        payload.buffer.subarray(0, payload.offset),
+    ]);
+}
+
+// Send a value using the format the client asked for in its Accept header
+function send(req, res, value) {
+    if (req.accepts([JSON_TYPE, MSGPACK_TYPE]) === MSGPACK_TYPE) {
+        res.type(MSGPACK_TYPE).send(encode(value));
+    } else {
+        res.json(value);
+    }
+}
+
+// Newline delimited JSON messages written as they happen
+class EventStream {
+    constructor(res) {
+        this.res = res;
+        res.status(200).type(NDJSON_TYPE);
+    }
+
+    write(message) {
+        this.res.write(JSON.stringify(message) + "\n");
+    }
+
+    end(message) {
+        this.write(message);
+        this.res.end();
+    }
+}
+
+module.exports = {
+    encode,
+    send,
+    EventStream,
+    JSON_TYPE,
+    MSGPACK_TYPE,
+    NDJSON_TYPE,
+};
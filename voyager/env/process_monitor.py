@@ -1,3 +1,7 @@
+import asyncio
+import collections
+import os
+import queue
 import time
 import re
 import warnings
@@ -5,12 +9,117 @@ from typing import List
 
 import psutil
 import subprocess
-import logging
 import threading
 
 import voyager.utils as U
 
 
+class _LogWriter:
+    """
+    Write log lines from a background thread, in batches, rotating the file once
+    it grows past max_bytes like logging.handlers.RotatingFileHandler does.
+    """
+
+    BATCH_SIZE = 4096
+
+    def __init__(self, path, name, max_bytes=10 * 1024 * 1024, backup_count=3):
+        self.path = path
+        self.name = name
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.queue = queue.SimpleQueue()
+        self.thread = None
+        self.lock = threading.Lock()
+        self._second = None
+        self._second_text = None
+
+    def write(self, line):
+        self.queue.put((time.time(), line))
+        if self.thread is None or not self.thread.is_alive():
+            with self.lock:
+                if self.thread is None or not self.thread.is_alive():
+                    self.thread = threading.Thread(target=self._run, daemon=True)
+                    self.thread.start()
+
+    def flush(self):
+        """
+        Block until everything written so far is on disk.
+        """
+        done = threading.Event()
+        self.queue.put(done)
+        if self.thread is not None and self.thread.is_alive():
+            done.wait()
+
+    def close(self):
+        """
+        Write what is queued, close the file and end the thread. A later write
+        starts a new thread appending to the same file.
+        """
+        with self.lock:
+            thread = self.thread
+            if thread is None or not thread.is_alive():
+                return
+            self.queue.put(None)
+        if thread is not threading.current_thread():
+            thread.join()
+
+    def _format(self, created, line):
+        second = int(created)
+        if second != self._second:
+            self._second = second
+            self._second_text = time.strftime(
+                "%Y-%m-%d %H:%M:%S", time.localtime(second)
+            )
+        msecs = int((created - second) * 1000)
+        return f"{self._second_text},{msecs:03d} - {self.name} - INFO - {line}\n"
+
+    def _rotate(self, stream):
+        stream.close()
+        if self.backup_count > 0:
+            for i in range(self.backup_count - 1, 0, -1):
+                source = f"{self.path}.{i}"
+                if os.path.exists(source):
+                    os.replace(source, f"{self.path}.{i + 1}")
+            os.replace(self.path, f"{self.path}.1")
+        mode = "w" if self.backup_count == 0 else "a"
+        return open(self.path, mode, encoding="utf-8")
+
+    def _run(self):
+        stream = open(self.path, "a", encoding="utf-8")
+        size = stream.tell()
+        try:
+            while True:
+                batch = [self.queue.get()]
+                try:
+                    while len(batch) < self.BATCH_SIZE:
+                        batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    pass
+                lines = []
+                waiters = []
+                closing = False
+                for item in batch:
+                    if item is None:
+                        closing = True
+                    elif isinstance(item, threading.Event):
+                        waiters.append(item)
+                    else:
+                        lines.append(self._format(*item))
+                text = "".join(lines)
+                stream.write(text)
+                stream.flush()
+                size += len(text)
+                if self.max_bytes and size >= self.max_bytes:
+                    stream = self._rotate(stream)
+                    size = 0
+                for waiter in waiters:
+                    waiter.set()
+                if closing:
+                    return
+        finally:
+            stream.close()
+
+
 class SubprocessMonitor:
     def __init__(
         self,
@@ -21,63 +130,135 @@ class SubprocessMonitor:
         callback_match: str = r"^(?!x)x$",  # regex that will never match
         callback: callable = None,
         finished_callback: callable = None,
+        buffer_lines: int = 1000,
+        log_max_bytes: int = 10 * 1024 * 1024,
+        log_backup_count: int = 3,
     ):
+        """
+        :param buffer_lines: how many of the latest output lines are kept in memory,
+        see tail
+        :param log_max_bytes: rotate the log file once it is this large, 0 disables
+        rotation
+        :param log_backup_count: how many rotated log files are kept
+        """
         self.commands = commands
         start_time = time.strftime("%Y%m%d_%H%M%S")
         self.name = name
-        self.logger = logging.getLogger(name)
-        handler = logging.FileHandler(U.f_join(log_path, f"{start_time}.log"))
-        formatter = logging.Formatter(
-            "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+        # one writer per monitor, restarts of the process append to the same file
+        self.log = _LogWriter(
+            U.f_join(log_path, f"{start_time}.log"),
+            name,
+            max_bytes=log_max_bytes,
+            backup_count=log_backup_count,
         )
-        handler.setFormatter(formatter)
-        self.logger.addHandler(handler)
-        self.logger.setLevel(logging.INFO)
+        self.lines = collections.deque(maxlen=buffer_lines)
         self.process = None
         self.ready_match = ready_match
+        self.ready_pattern = re.compile(ready_match)
         self.ready_event = None
+        self.ready_waiter = None
         self.ready_line = None
         self.callback_match = callback_match
+        self.callback_pattern = re.compile(callback_match) if callback else None
         self.callback = callback
         self.finished_callback = finished_callback
         self.thread = None
 
     def _start(self):
-        self.logger.info(f"Starting subprocess with commands: {self.commands}")
+        self.log.write(f"Starting subprocess with commands: {self.commands}")
 
         self.process = psutil.Popen(
             self.commands,
             stdout=subprocess.PIPE,
             stderr=subprocess.STDOUT,
             universal_newlines=True,
+            errors="replace",
         )
         print(f"Subprocess {self.name} started with PID {self.process.pid}.")
-        for line in iter(self.process.stdout.readline, ""):
-            self.logger.info(line.strip())
-            if re.search(self.ready_match, line):
-                self.ready_line = line
-                self.logger.info("Subprocess is ready.")
-                self.ready_event.set()
-            if re.search(self.callback_match, line):
+        ready_search = self.ready_pattern.search
+        callback_search = (
+            self.callback_pattern.search if self.callback_pattern else None
+        )
+        write = self.log.write
+        remember = self.lines.append
+        ready = False
+        for line in self.process.stdout:
+            line = line.rstrip("\n")
+            remember(line)
+            write(line.strip())
+            # only the first match matters, skip the search once ready
+            if not ready and ready_search(line):
+                ready = True
+                self.ready_line = line + "\n"
+                write("Subprocess is ready.")
+                self._set_ready()
+            if callback_search is not None and callback_search(line):
                 self.callback()
         if not self.ready_event.is_set():
-            self.ready_event.set()
-            warnings.warn(f"Subprocess {self.name} failed to start.")
+            self._set_ready()
+            warnings.warn(
+                f"Subprocess {self.name} failed to start. Last output:\n"
+                + "\n".join(self.tail(20))
+            )
         if self.finished_callback:
             self.finished_callback()
 
-    def run(self):
+    def tail(self, n=None):
+        """
+        The latest output lines of the process, kept in memory.
+        """
+        lines = list(self.lines)
+        return lines if n is None else lines[-n:]
+
+    def _set_ready(self):
+        self.ready_event.set()
+        if self.ready_waiter is not None:
+            loop, future = self.ready_waiter
+            loop.call_soon_threadsafe(_resolve, future)
+
+    def _launch(self, ready_waiter=None):
         self.ready_event = threading.Event()
+        self.ready_waiter = ready_waiter
         self.ready_line = None
         self.thread = threading.Thread(target=self._start)
         self.thread.start()
+
+    def run(self):
+        self._launch()
         self.ready_event.wait()
 
+    async def arun(self):
+        """
+        Like run, but waits for readiness without blocking the event loop.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._launch((loop, future))
+        await future
+
+    async def astop(self):
+        await asyncio.get_running_loop().run_in_executor(None, self.stop)
+
     def stop(self):
-        self.logger.info("Stopping subprocess.")
+        self.log.write("Stopping subprocess.")
         if self.process and self.process.is_running():
+            # children would keep the output pipe open after the process is gone
+            try:
+                children = self.process.children(recursive=True)
+            except psutil.Error:
+                children = []
             self.process.terminate()
             self.process.wait()
+            for child in children:
+                try:
+                    child.terminate()
+                except psutil.NoSuchProcess:
+                    pass
+            psutil.wait_procs(children, timeout=5)
+        # the reader thread of this process must not touch the state of the next one
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join(timeout=5)
+        self.log.close()
 
     # def __del__(self):
     #     if self.process.is_running():
@@ -88,3 +269,8 @@ class SubprocessMonitor:
         if self.process is None:
             return False
         return self.process.is_running()
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
@@ -0,0 +1,43 @@
+import hashlib
+
+
+class ProgramCache:
+    """
+    Track which program bodies the mineflayer process already holds, so a step
+    only sends program hashes plus the bodies the server has not seen yet.
+    See mineflayer/lib/programRegistry.js for the server side.
+    """
+
+    def __init__(self):
+        self.known = set()
+        self._digests = {}
+
+    def reset(self):
+        """
+        Forget what the server holds, e.g. after the mineflayer process restarted.
+        """
+        self.known = set()
+
+    def digest(self, source):
+        digest = self._digests.get(source)
+        if digest is None:
+            digest = hashlib.sha1(source.encode("utf-8")).hexdigest()
+            self._digests[source] = digest
+        return digest
+
+    def payload(self, sources, resend=()):
+        """
+        :param sources: program sources in the order they should be bound
+        :param resend: hashes the server reported as missing
+        """
+        hashes = []
+        bodies = {}
+        for source in sources:
+            digest = self.digest(source)
+            hashes.append(digest)
+            if digest not in self.known or digest in resend:
+                bodies[digest] = source
+        return {"hashes": hashes, "bodies": bodies}
+
+    def mark_sent(self, payload):
+        self.known.update(payload["bodies"])
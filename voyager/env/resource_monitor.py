@@ -0,0 +1,103 @@
+import collections
+import threading
+import time
+
+import psutil
+
+
+class ResourceSampler:
+    """
+    Periodically sample RSS, CPU, open file descriptors and thread count of a
+    process into a bounded time series, and tell when a sample crosses the
+    configured thresholds so the process can be recycled at a convenient time.
+    """
+
+    THRESHOLDS = ("rss_mb", "cpu_percent", "num_fds", "num_threads")
+
+    def __init__(self, interval=5.0, max_samples=720, thresholds=None):
+        """
+        :param interval: seconds between two samples
+        :param max_samples: how many samples are kept, the oldest are dropped
+        :param thresholds: upper limits, any of "rss_mb", "cpu_percent", "num_fds"
+        and "num_threads"
+        """
+        thresholds = thresholds or {}
+        unknown = set(thresholds) - set(self.THRESHOLDS)
+        if unknown:
+            raise ValueError(f"Unknown resource thresholds: {sorted(unknown)}")
+        self.interval = interval
+        self.thresholds = thresholds
+        self.samples = collections.deque(maxlen=max_samples)
+        self.process = None
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def attach(self, pid):
+        """
+        Start sampling the process with this pid, replacing the previous one.
+        """
+        with self.lock:
+            self.process = psutil.Process(pid)
+            # the first cpu_percent call only sets the baseline
+            self.process.cpu_percent(None)
+        self.sample()
+        if self.thread is None or not self.thread.is_alive():
+            self.stop_event.clear()
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def sample(self):
+        with self.lock:
+            process = self.process
+        if process is None:
+            return None
+        try:
+            with process.oneshot():
+                sample = {
+                    "time": time.time(),
+                    "pid": process.pid,
+                    "rss_mb": process.memory_info().rss / (1024 * 1024),
+                    "cpu_percent": process.cpu_percent(None),
+                    "num_fds": _num_fds(process),
+                    "num_threads": process.num_threads(),
+                }
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            return None
+        self.samples.append(sample)
+        return sample
+
+    def _run(self):
+        while not self.stop_event.wait(self.interval):
+            self.sample()
+
+    def latest(self):
+        return self.samples[-1] if self.samples else None
+
+    def series(self):
+        return list(self.samples)
+
+    def exceeded(self):
+        """
+        :return: a description of every threshold the latest sample crosses
+        """
+        sample = self.latest()
+        if sample is None:
+            return []
+        reasons = []
+        for name, limit in self.thresholds.items():
+            value = sample[name]
+            if value is not None and value > limit:
+                reasons.append(f"{name} {value:.1f} > {limit}")
+        return reasons
+
+
+def _num_fds(process):
+    try:
+        return process.num_fds()
+    except AttributeError:
+        # windows has handles instead of file descriptors
+        return process.num_handles()
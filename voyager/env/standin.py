@@ -0,0 +1,396 @@
+"""
+Pure Python stand-in for the mineflayer server.
+
+It speaks the same HTTP contract as mineflayer/index.js (/start, /step,
+/fused_step, /pause, /abort, /stop and /health, with the json and msgpack wire formats,
+delta observations, the program registry and streamed steps), but serves
+observations from a world model instead of a Minecraft server:
+
+- ReplayWorld replays the events EventRecorder wrote to ckpt/events, one
+  recorded step per step call
+- ScriptedWorld is a small deterministic world that echoes bot.chat calls and
+  adds the items named in mineBlock, craftItem and smeltItem calls
+
+This lets the env layer, the recorder and the learning loop run and be
+benchmarked without node or a game.
+
+The file runs as a plain script, so the stand-in does not import the voyager
+package and the node bridge its agents start:
+    python voyager/env/standin.py PORT [--events ckpt/events] [--latency 0.05]
+
+or let VoyagerEnv start it in place of node:
+    from voyager.env import standin
+    VoyagerEnv(mc_port=25565, server_command=standin.COMMAND + ["--latency", "0.05"])
+"""
+import argparse
+import copy
+import json
+import os
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+if __package__:
+    from . import wire
+    from .delta import DeltaEncoder
+else:
+    import wire
+    from delta import DeltaEncoder
+
+COMMAND = [sys.executable, os.path.abspath(__file__)]
+
+_TIMESTAMP = re.compile(r"_(\d{8}_\d{6})(?:\.json)?$")
+
+
+def _timestamp(name):
+    match = _TIMESTAMP.search(name)
+    return match.group(1) if match else name
+
+
+class ScriptedWorld:
+    """
+    A deterministic world model. Every step takes ticks_per_step ticks, string
+    literals passed to bot.chat are echoed as chat events and literal calls like
+    mineBlock(bot, "oak_log", 3) add the item to the inventory.
+    """
+
+    CHAT = re.compile(r"bot\.chat\(\s*[\"'`]([^\"'`]*)[\"'`]\s*\)")
+    GAIN = re.compile(
+        r"(?:mineBlock|craftItem|smeltItem)\(\s*bot\s*,\s*[\"'](\w+)[\"']"
+        r"(?:\s*,\s*(\d+))?"
+    )
+    FAIL = re.compile(r"throw new Error\(\s*[\"'`]([^\"'`]*)[\"'`]\s*\)")
+
+    def __init__(self, ticks_per_step=20, biome="plains"):
+        self.ticks_per_step = ticks_per_step
+        self.biome = biome
+        self.inventory = {}
+        self.position = {"x": 0.5, "y": 64.0, "z": 0.5}
+
+    def start(self, options):
+        if options.get("reset") == "hard":
+            self.inventory = dict(options.get("inventory") or {})
+            if options.get("position"):
+                self.position = dict(options["position"])
+        return [["observe", self.observe(0)]]
+
+    def step(self, code, programs=""):
+        events = []
+        for message in self.CHAT.findall(code):
+            events.append(["onChat", self.observe(0, onChat=message)])
+        for name, count in self.GAIN.findall(code):
+            self.inventory[name] = self.inventory.get(name, 0) + int(count or 1)
+        for message in self.FAIL.findall(code):
+            events.append(["onError", self.observe(0, onError=message)])
+            break
+        self.position["x"] += 1
+        events.append(["observe", self.observe(self.ticks_per_step)])
+        return events
+
+    def observe(self, elapsed, **event):
+        status = {
+            "health": 20.0,
+            "food": 20.0,
+            "saturation": 5.0,
+            "oxygen": 20,
+            "position": dict(self.position),
+            "velocity": {"x": 0.0, "y": 0.0, "z": 0.0},
+            "yaw": 0.0,
+            "pitch": 0.0,
+            "onGround": True,
+            "equipment": [None, None, None, None, None, None],
+            "name": "bot",
+            "timeSinceOnGround": 0,
+            "isInWater": False,
+            "isInLava": False,
+            "isInWeb": False,
+            "isCollidedHorizontally": False,
+            "isCollidedVertically": True,
+            "biome": self.biome,
+            "entities": {},
+            "timeOfDay": "day",
+            "inventoryUsed": len(self.inventory),
+            "elapsedTime": elapsed,
+        }
+        return dict(
+            event,
+            voxels=["grass_block", "dirt", "stone"],
+            status=status,
+            inventory=dict(self.inventory),
+            nearbyChests={},
+            blockRecords=["grass_block", "dirt", "stone"],
+        )
+
+
+class ReplayWorld:
+    """
+    Replay the events recorded by EventRecorder in a ckpt/events directory, in the
+    order they were recorded, and start over after the last one.
+    """
+
+    def __init__(self, events_dir):
+        # timestamps have one second resolution, the name keeps the order stable
+        names = sorted(
+            os.listdir(events_dir), key=lambda name: (_timestamp(name), name)
+        )
+        self.records = []
+        for name in names:
+            with open(os.path.join(events_dir, name)) as f:
+                events = json.load(f)
+            # EventRecorder writes [] for steps whose program did not parse
+            if events:
+                self.records.append(events)
+        if not self.records:
+            raise ValueError(f"No recorded events in {events_dir}")
+        self.index = 0
+
+    def start(self, options):
+        if options.get("reset") == "hard":
+            self.index = 0
+        # the state before the next recorded step
+        observe = copy.deepcopy(self.records[self.index][0][1])
+        observe = {
+            key: value for key, value in observe.items() if not key.startswith("on")
+        }
+        observe["status"]["elapsedTime"] = 0
+        return [["observe", observe]]
+
+    def step(self, code, programs=""):
+        events = self.records[self.index]
+        self.index = (self.index + 1) % len(self.records)
+        return copy.deepcopy(events)
+
+
+class StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(
+        self,
+        port,
+        world,
+        latency=0.0,
+        start_latency=0.0,
+        freeze_after=None,
+        host="127.0.0.1",
+    ):
+        super().__init__((host, port), _Handler)
+        self.world = world
+        self.latency = latency
+        self.start_latency = start_latency
+        # after this many steps the server hangs like a deadlocked node process
+        self.freeze_after = freeze_after
+        self.steps = 0
+        self.started = time.monotonic()
+        self.frozen_at = None
+        self.delta = DeltaEncoder()
+        self.programs = set()
+        self.paused = False
+        self.lock = threading.Lock()
+        # set by /abort, cuts the simulated execution time of the running step
+        self.abort_event = None
+        self.abort_reason = None
+
+    def world_position(self):
+        return getattr(self.world, "position", None)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        if self.path != "/health":
+            self.reply({"error": f"Unknown route {self.path}"}, status=404)
+            return
+        server = self.server
+        # 20 ticks a second like the game, both counters stop once frozen
+        now = server.frozen_at or time.monotonic()
+        ticks = int((now - server.started) * 20)
+        self.reply(
+            {
+                "spawned": True,
+                "ticks": ticks,
+                "packets": ticks,
+                "stepRunning": server.abort_event is not None,
+                "entity": {"position": server.world_position()},
+            }
+        )
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length) or b"null") or {}
+        route = {
+            "/start": self.start,
+            "/step": self.step,
+            "/fused_step": self.step,
+            "/pause": self.pause,
+            "/abort": self.abort,
+            "/stop": self.stop,
+        }.get(self.path)
+        if route is None:
+            self.reply({"error": f"Unknown route {self.path}"}, status=404)
+            return
+        route(body)
+
+    def reply(self, value, status=200, observation=False):
+        accept = self.headers.get("Accept", "")
+        if observation and wire.CONTENT_TYPES[wire.MSGPACK] in accept:
+            content_type = wire.CONTENT_TYPES[wire.MSGPACK]
+            data = wire.encode(value)
+        else:
+            content_type = wire.CONTENT_TYPES[wire.JSON]
+            data = json.dumps(value).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def start(self, body):
+        server = self.server
+        time.sleep(server.start_latency)
+        with server.lock:
+            server.delta.reset()
+            server.paused = False
+            events = server.world.start(body)
+        print(body, flush=True)
+        self.reply(events, observation=True)
+
+    def step(self, body):
+        server = self.server
+        registry = body.get("registry")
+        if registry:
+            server.programs.update(registry.get("bodies") or {})
+            missing = [h for h in registry["hashes"] if h not in server.programs]
+            if missing:
+                self.reply({"missing": missing}, status=409)
+                return
+        if self.path == "/fused_step" and body.get("unpause"):
+            server.paused = False
+        stream = body.get("stream")
+        if stream:
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+
+        server.abort_event = threading.Event()
+        server.abort_reason = None
+        server.steps += 1
+        if server.freeze_after is not None and server.steps > server.freeze_after:
+            server.frozen_at = server.frozen_at or time.monotonic()
+            server.abort_event.wait()
+            return
+        with server.lock:
+            events = server.world.step(body.get("code", ""), body.get("programs", ""))
+        if stream:
+            for name, event in events[:-1]:
+                self.write_chunk(
+                    {
+                        "type": "event",
+                        "name": name,
+                        "value": event.get(name),
+                        "status": event.get("status"),
+                    }
+                )
+
+        # the events above happened right away, the rest of the step takes latency
+        wall_budget = body.get("wallBudget")
+        timed_out = wall_budget is not None and wall_budget < server.latency
+        aborted = server.abort_event.wait(wall_budget if timed_out else server.latency)
+        server.abort_event = None
+        observe = events[-1][1]
+        state = {
+            key: value for key, value in observe.items() if not key.startswith("on")
+        }
+        if aborted:
+            error = f"Execution aborted: {server.abort_reason}"
+            events.insert(-1, ["onError", dict(state, onError=error)])
+        elif timed_out:
+            timeout = {
+                "budget": "wall",
+                "limit": wall_budget,
+                "ticks": observe["status"]["elapsedTime"],
+                "seconds": wall_budget,
+            }
+            events.insert(-1, ["onTimeout", dict(state, onTimeout=timeout)])
+
+        with server.lock:
+            if self.path == "/fused_step":
+                server.paused = True
+            if "delta" in body:
+                observation = server.delta.encode(events, body["delta"])
+            else:
+                observation = events
+        if not stream:
+            self.reply(observation, observation=True)
+            return
+        self.write_chunk({"type": "observation", "data": observation})
+        self.wfile.write(b"0\r\n\r\n")
+
+    def write_chunk(self, message):
+        data = (json.dumps(message) + "\n").encode()
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+
+    def pause(self, body):
+        self.server.paused = not self.server.paused
+        self.reply({"message": "Success"})
+
+    def abort(self, body):
+        abort_event = self.server.abort_event
+        if abort_event is None:
+            self.reply({"error": "No step is running"}, status=409)
+            return
+        self.server.abort_reason = body.get("reason") or "requested by client"
+        abort_event.set()
+        self.reply({"message": "Aborting"})
+
+    def stop(self, body):
+        self.reply({"message": "Bot stopped"})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("port", type=int, nargs="?", default=3000)
+    parser.add_argument(
+        "--events", help="ckpt/events directory to replay, default is scripted"
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="seconds each step takes"
+    )
+    parser.add_argument(
+        "--start-latency", type=float, default=0.0, help="seconds /start takes"
+    )
+    parser.add_argument(
+        "--ticks-per-step", type=int, default=20, help="scripted world only"
+    )
+    parser.add_argument(
+        "--freeze-after",
+        type=int,
+        help="hang on every step after this many, to exercise the watchdog",
+    )
+    args = parser.parse_args()
+    if args.events:
+        world = ReplayWorld(args.events)
+    else:
+        world = ScriptedWorld(ticks_per_step=args.ticks_per_step)
+    server = StandInServer(
+        args.port,
+        world,
+        latency=args.latency,
+        start_latency=args.start_latency,
+        freeze_after=args.freeze_after,
+    )
+    # VoyagerEnv waits for this line, like it does for the node server
+    print(f"Server started on port {args.port}", flush=True)
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Streaming steps.
+
+With ``stream`` set in the step request, mineflayer answers with newline
+delimited JSON. Each line is one of:
+
+``{"type": "event", "name": "onChat", "value": ..., "status": {...}}``
+    sent as soon as an event (onChat, onError, onSave, ...) happens
+``{"type": "stuck", "position": {...}}``
+    sent when the bot got stuck and mineflayer teleports it
+``{"type": "observation", "data": ...}``
+    always the last line, the same payload a regular step returns
+
+A policy sees every event and stuck message while the program runs. Returning a
+reason string makes the env post /abort, mineflayer then stops the program and
+replies with the observation gathered so far.
+"""
+import json
+import re
+
+# chat messages the control primitives use to report a failure, progress chat
+# like "Placed torch" or "Killed pig!" repeats in healthy loops
+FAILURE_CHAT = re.compile(
+    r"^(No |Not enough |I cannot |I don't see |Failed |Error|Max exploration time)"
+    r"|is not a valid |must be a "
+)
+
+
+class StepStream:
+    """
+    Feed the lines of one streamed step and find out when to abort.
+    """
+
+    def __init__(self, policy):
+        self.policy = policy
+        self.observation = None
+        self.done = False
+        self.abort_reason = None
+
+    def feed(self, line):
+        """
+        :return: the abort reason the first time the policy asks for one, else None
+        """
+        if isinstance(line, bytes):
+            line = line.decode("utf-8")
+        if not line.strip():
+            return None
+        message = json.loads(line)
+        if message["type"] == "observation":
+            self.observation = message["data"]
+            self.done = True
+            return None
+        if self.abort_reason is not None:
+            return None
+        reason = self.policy(message)
+        if reason:
+            self.abort_reason = reason
+            return reason
+        return None
+
+    def result(self):
+        if not self.done:
+            raise RuntimeError("Step stream ended without an observation")
+        return self.observation
+
+
+class RepeatedErrorPolicy:
+    """
+    Abort a step once the program keeps failing the same way or the bot keeps
+    getting stuck. Use a new instance for every step.
+    """
+
+    def __init__(self, max_repeats=3, max_stuck=3):
+        """
+        :param max_repeats: abort when the same error or failure chat message shows
+        up this many times, control primitives report most failures through chat,
+        see FAILURE_CHAT
+        :param max_stuck: abort when mineflayer had to teleport the bot this many times
+        """
+        self.max_repeats = max_repeats
+        self.max_stuck = max_stuck
+        self.counts = {}
+        self.stuck = 0
+
+    def __call__(self, message):
+        if message["type"] == "stuck":
+            self.stuck += 1
+            if self.stuck >= self.max_stuck:
+                return f"bot got stuck {self.stuck} times"
+            return None
+        if message["name"] not in ("onError", "onChat"):
+            return None
+        text = message["value"]
+        if not text:
+            return None
+        if message["name"] == "onChat" and not FAILURE_CHAT.search(text):
+            return None
+        key = (message["name"], text)
+        self.counts[key] = self.counts.get(key, 0) + 1
+        if self.counts[key] >= self.max_repeats:
+            kind = "error" if message["name"] == "onError" else "failure"
+            return f"same {kind} {self.counts[key]} times: {text}"
+        return None
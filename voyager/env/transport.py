@@ -0,0 +1,148 @@
+import json
+
+import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class HttpTransport:
+    """
+    Keep-alive HTTP transport between VoyagerEnv and the mineflayer server.
+    All requests of one env share a single pooled session, so a step reuses
+    the already open TCP connection instead of opening a new one per call.
+    """
+
+    def __init__(self, server, request_timeout=600, pool_maxsize=4, headers=None):
+        self.server = server
+        self.request_timeout = request_timeout
+        self.pool_maxsize = pool_maxsize
+        self.headers = headers or {}
+        self.session = None
+        self.reset()
+
+    def reset(self):
+        """
+        Drop all pooled connections, e.g. after the mineflayer process restarted.
+        """
+        if self.session is not None:
+            self.session.close()
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=self.pool_maxsize,
+            max_retries=0,
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def post(self, route, json=None, timeout=None, **kwargs):
+        return self.session.post(
+            f"{self.server}{route}",
+            json=json,
+            timeout=timeout if timeout is not None else self.request_timeout,
+            **kwargs,
+        )
+
+    def get(self, route, timeout=None, **kwargs):
+        return self.session.get(
+            f"{self.server}{route}",
+            timeout=timeout if timeout is not None else self.request_timeout,
+            **kwargs,
+        )
+
+    def close(self):
+        self.session.close()
+
+
+class BufferedResponse:
+    """
+    A fully read aiohttp response exposing the parts of the requests response API
+    the env relies on, so the wire helpers work with both transports.
+    """
+
+    def __init__(self, status_code, headers, content):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class StreamedResponse:
+    """
+    A successful aiohttp response whose body is read line by line.
+    """
+
+    def __init__(self, res):
+        self.res = res
+        self.status_code = res.status
+        self.headers = res.headers
+
+    async def iter_lines(self):
+        async for line in self.res.content:
+            yield line
+
+    def close(self):
+        self.res.release()
+
+
+class AsyncHttpTransport:
+    """
+    Non-blocking counterpart of HttpTransport used by AsyncVoyagerEnv.
+    The aiohttp session is created lazily so it binds to the running event loop.
+    """
+
+    def __init__(self, server, request_timeout=600, pool_maxsize=4, headers=None):
+        self.server = server
+        self.request_timeout = request_timeout
+        self.pool_maxsize = pool_maxsize
+        self.headers = headers or {}
+        self.session = None
+
+    def _get_session(self):
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.pool_maxsize),
+                headers=self.headers,
+            )
+        return self.session
+
+    async def reset(self):
+        """
+        Drop all pooled connections, e.g. after the mineflayer process restarted.
+        """
+        await self.close()
+        self.session = None
+
+    async def request(self, method, route, json=None, timeout=None, stream=False):
+        """
+        :param stream: return a StreamedResponse for successful replies, the caller
+        has to close it
+        """
+        timeout = timeout if timeout is not None else self.request_timeout
+        res = await self._get_session().request(
+            method,
+            f"{self.server}{route}",
+            json=json,
+            timeout=aiohttp.ClientTimeout(total=timeout),
+        )
+        if stream and res.status == 200:
+            return StreamedResponse(res)
+        try:
+            return BufferedResponse(res.status, res.headers, await res.read())
+        finally:
+            res.release()
+
+    async def post(self, route, json=None, timeout=None, stream=False):
+        return await self.request(
+            "POST", route, json=json, timeout=timeout, stream=stream
+        )
+
+    async def get(self, route, timeout=None):
+        return await self.request("GET", route, timeout=timeout)
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
@@ -0,0 +1,180 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+import gymnasium as gym
+
+import voyager.utils as U
+
+from .bridge import VoyagerEnv
+
+
+class VoyagerVectorEnv(gym.vector.VectorEnv):
+    """
+    Run several mineflayer bots against one Minecraft server, each through its own
+    VoyagerEnv on its own server port. Batched reset and step calls are sent to all
+    bots concurrently.
+
+    Like VoyagerEnv, reset and step return mineflayer events rather than gym
+    observations. A sub-env whose step or reset fails has its mineflayer process
+    restarted without touching the others.
+    """
+
+    def __init__(
+        self,
+        mc_port,
+        num_envs,
+        server_host="http://127.0.0.1",
+        server_port=3000,
+        request_timeout=600,
+        log_path="./logs",
+        username_prefix="bot",
+        max_restarts=3,
+        **env_kwargs,
+    ):
+        """
+        :param num_envs: number of bots, sub-env i listens on server_port + i
+        :param username_prefix: sub-env i joins the Minecraft server as
+        f"{username_prefix}{i}"
+        :param max_restarts: how many times a failed sub-env is restarted within one
+        call before the error is raised
+        :param env_kwargs: passed on to every VoyagerEnv, a standby_port is offset
+        like server_port, sub-env i keeps its standby process on standby_port + i
+        """
+        if num_envs < 1:
+            raise ValueError("num_envs must be at least 1")
+        standby_port = env_kwargs.pop("standby_port", None)
+        if standby_port is not None and (
+            server_port - num_envs < standby_port < server_port + num_envs
+        ):
+            raise ValueError(
+                f"standby ports {standby_port}..{standby_port + num_envs - 1} overlap "
+                f"server ports {server_port}..{server_port + num_envs - 1}"
+            )
+        # the server is shared, one bot must not pause it for all the others
+        env_kwargs["pause_server"] = False
+        self.num_envs = num_envs
+        self.max_restarts = max_restarts
+        self.envs = [
+            VoyagerEnv(
+                mc_port=mc_port,
+                server_host=server_host,
+                server_port=server_port + i,
+                request_timeout=request_timeout,
+                log_path=U.f_join(log_path, f"{username_prefix}{i}"),
+                bot_username=f"{username_prefix}{i}",
+                standby_port=None if standby_port is None else standby_port + i,
+                **env_kwargs,
+            )
+            for i in range(num_envs)
+        ]
+        self.executor = ThreadPoolExecutor(
+            max_workers=num_envs, thread_name_prefix="voyager_env"
+        )
+        self.closed = False
+
+    def _map(self, fn, *args):
+        futures = [
+            self.executor.submit(fn, i, *arg) for i, arg in enumerate(zip(*args))
+        ]
+        return [future.result() for future in futures]
+
+    def _per_env(self, value, name):
+        if value is None or isinstance(value, dict):
+            return [value] * self.num_envs
+        value = list(value)
+        if len(value) != self.num_envs:
+            raise ValueError(f"Expected {self.num_envs} {name}, got {len(value)}")
+        return value
+
+    def restart(self, i):
+        """
+        Kill the mineflayer process of sub-env i and bring it back with the options
+        of its last reset.
+        """
+        env = self.envs[i]
+        env.mineflayer.stop()
+        env.healthy = False
+        if env.delta is not None:
+            env.delta.reset()
+        return env.check_process()
+
+    def _reset_one(self, i, options):
+        error = None
+        for attempt in range(self.max_restarts + 1):
+            try:
+                return self.envs[i].reset(options=options), error
+            except Exception as e:
+                print(
+                    f"\033[31mBot {i} failed to reset ({attempt + 1}/"
+                    f"{self.max_restarts + 1}): {e}\033[0m"
+                )
+                self.envs[i].mineflayer.stop()
+                self.envs[i].healthy = False
+                error = e
+        raise error
+
+    def _step_one(self, i, code, programs):
+        try:
+            return self.envs[i].step(code, programs=programs), None
+        except Exception as e:
+            print(f"\033[31mBot {i} failed to step, restarting it: {e}\033[0m")
+            error = e
+        for attempt in range(self.max_restarts):
+            try:
+                return self.restart(i), error
+            except Exception as e:
+                print(
+                    f"\033[31mBot {i} failed to restart ({attempt + 1}/"
+                    f"{self.max_restarts}): {e}\033[0m"
+                )
+                error = e
+        raise error
+
+    @staticmethod
+    def _infos(results):
+        errors = [error for _, error in results]
+        return [events for events, _ in results], {
+            "error": [None if e is None else str(e) for e in errors],
+            "restarted": [e is not None for e in errors],
+        }
+
+    def reset(
+        self,
+        *,
+        seed=None,
+        options: Union[Dict, Sequence[Optional[Dict]], None] = None,
+    ) -> Tuple[List[Any], Dict[str, List]]:
+        """
+        :param options: VoyagerEnv reset options, either one dict for all bots or one
+        per bot
+        :return: the events of every bot and an info dict whose "error" and
+        "restarted" lists say which bots had to be restarted
+        """
+        results = self._map(self._reset_one, self._per_env(options, "options"))
+        return self._infos(results)
+
+    def step(
+        self,
+        codes: Sequence[str],
+        programs: Union[str, Sequence[str]] = "",
+    ) -> Tuple[List[Any], Dict[str, List]]:
+        """
+        :param codes: the code each bot runs in this step
+        :param programs: programs shared by all bots, see VoyagerEnv.step
+        :return: the events of every bot and an info dict whose "error" and
+        "restarted" lists say which bots failed, a restarted bot returns the events
+        of its restart instead of the step
+        """
+        codes = self._per_env(codes, "codes")
+        results = self._map(self._step_one, codes, [programs] * self.num_envs)
+        return self._infos(results)
+
+    def render(self):
+        raise NotImplementedError("render is not implemented")
+
+    def close(self, **kwargs):
+        if getattr(self, "closed", True):
+            return
+        self._map(lambda i, _: self.envs[i].close(), range(self.num_envs))
+        self.executor.shutdown()
+        self.closed = True
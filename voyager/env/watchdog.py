@@ -0,0 +1,122 @@
+import threading
+import time
+
+import requests
+
+from .transport import HttpTransport
+
+
+class Watchdog:
+    """
+    Poll the /health endpoint of mineflayer while a step runs and call on_stall once
+    the bot left the world or one of its liveness counters stopped advancing:
+    ticks stop when the node event loop hangs, packets stop when the connection to
+    the Minecraft server silently died. A /health request that fails or times out
+    counts as no progress.
+    """
+
+    COUNTERS = ("ticks", "packets")
+
+    def __init__(self, server, on_stall, interval=2.0, stall_timeout=30.0):
+        """
+        :param server: base url of the mineflayer server
+        :param on_stall: called with the reason from the watchdog thread, typically
+        stops the process so the blocked step request fails right away
+        :param interval: seconds between two /health requests
+        :param stall_timeout: seconds a counter may stay the same
+        """
+        self.transport = HttpTransport(server, request_timeout=interval)
+        self.on_stall = on_stall
+        self.interval = interval
+        self.stall_timeout = stall_timeout
+        self.reason = None
+        # set while a step runs, one thread serves all steps of the env
+        self.armed = threading.Event()
+        self.disarmed = threading.Event()
+        self.closed = False
+        self.lock = threading.Lock()
+        self.thread = None
+        self.generation = 0
+        self.last = {}
+        self.changed = {}
+        self.error = None
+
+    def start(self):
+        with self.lock:
+            self.generation += 1
+            self.reason = None
+            self.error = None
+            self.last = {}
+            now = time.monotonic()
+            self.changed = {name: now for name in self.COUNTERS}
+            self.disarmed.clear()
+            self.armed.set()
+        if self.thread is None or not self.thread.is_alive():
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        with self.lock:
+            self.armed.clear()
+            self.disarmed.set()
+
+    def close(self):
+        self.closed = True
+        self.stop()
+        self.armed.set()
+        self.transport.close()
+
+    def join(self):
+        """
+        Wait until the watchdog is done handling a stall.
+        """
+        while self.armed.is_set() and self.thread.is_alive():
+            time.sleep(0.01)
+
+    def _run(self):
+        while True:
+            self.armed.wait()
+            if self.closed:
+                return
+            # wait one interval, or until the step is over
+            if self.disarmed.wait(self.interval):
+                continue
+            generation = self.generation
+            try:
+                health = self.transport.get("/health").json()
+            except (requests.RequestException, ValueError) as e:
+                self.error = e
+                health = None
+                # the pooled connection may belong to a process that is gone
+                self.transport.reset()
+            with self.lock:
+                if not self.armed.is_set() or generation != self.generation:
+                    continue
+                reason = self.check(health)
+                if reason:
+                    self.reason = reason
+            if reason:
+                self.on_stall(reason)
+                self.stop()
+
+    def check(self, health):
+        """
+        :return: why the process is considered hung, or None
+        """
+        now = time.monotonic()
+        if health is not None:
+            if not health.get("spawned"):
+                return "the bot is not in the world anymore"
+            for name in self.COUNTERS:
+                value = health.get(name)
+                if value != self.last.get(name):
+                    self.last[name] = value
+                    self.changed[name] = now
+        for name in self.COUNTERS:
+            stalled = now - self.changed[name]
+            if stalled >= self.stall_timeout:
+                reason = f"{name} did not advance for {stalled:.0f}s"
+                if health is None:
+                    reason += f", /health failed: {self.error}"
+                return reason
+        return None
@@ -0,0 +1,239 @@
+"""
+Wire formats for observations sent by the mineflayer server.
+
+"json" is plain single-encoded JSON. "msgpack" is MessagePack in which every
+map key is replaced by its index into an interned key table; a message is the
+two-element array ``[key_table, payload]``. See mineflayer/lib/wire.js for the
+encoder on the node side.
+
+Decoding uses the msgpack C extension when it is installed and falls back to
+the pure Python decoder below otherwise.
+"""
+import json
+import struct
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+JSON = "json"
+MSGPACK = "msgpack"
+
+CONTENT_TYPES = {
+    JSON: "application/json",
+    MSGPACK: "application/x-voyager-msgpack",
+}
+
+_unpack_from = struct.unpack_from
+
+_FIXED = {
+    0xca: (">f", 4),
+    0xcc: (">B", 1),
+    0xcd: (">H", 2),
+    0xce: (">I", 4),
+    0xcf: (">Q", 8),
+    0xd0: (">b", 1),
+    0xd1: (">h", 2),
+    0xd2: (">i", 4),
+    0xd3: (">q", 8),
+}
+
+
+def accept_header(wire_format):
+    if wire_format not in CONTENT_TYPES:
+        raise ValueError(f"Unknown wire format: {wire_format}")
+    if wire_format == JSON:
+        return CONTENT_TYPES[JSON]
+    # keep json acceptable so an older server can still answer
+    return f"{CONTENT_TYPES[wire_format]}, {CONTENT_TYPES[JSON]};q=0.5"
+
+
+def decode_response(res):
+    """
+    Decode a mineflayer response according to the content type the server chose.
+    """
+    content_type = res.headers.get("Content-Type", "")
+    if content_type.startswith(CONTENT_TYPES[MSGPACK]):
+        return decode(res.content)
+    data = res.json()
+    if isinstance(data, str):
+        # servers predating single encoding send a JSON string inside JSON
+        data = json.loads(data)
+    return data
+
+
+def _decode(data, pos, keys):
+    code = data[pos]
+    pos += 1
+    if code < 0x80:
+        return code, pos
+    if code >= 0xe0:
+        return code - 0x100, pos
+    if code < 0x90:
+        size = code & 0x0f
+        return _decode_map(data, pos, size, keys)
+    if code < 0xa0:
+        size = code & 0x0f
+        return _decode_array(data, pos, size, keys)
+    if code < 0xc0:
+        end = pos + (code & 0x1f)
+        return data[pos:end].decode(), end
+    if code == 0xc0:
+        return None, pos
+    if code == 0xc2:
+        return False, pos
+    if code == 0xc3:
+        return True, pos
+    if code == 0xcb:
+        return _unpack_from(">d", data, pos)[0], pos + 8
+    if code == 0xd9:
+        end = pos + 1 + data[pos]
+        return data[pos + 1 : end].decode(), end
+    if code == 0xda:
+        end = pos + 2 + _unpack_from(">H", data, pos)[0]
+        return data[pos + 2 : end].decode(), end
+    if code == 0xdb:
+        end = pos + 4 + _unpack_from(">I", data, pos)[0]
+        return data[pos + 4 : end].decode(), end
+    if code in _FIXED:
+        fmt, width = _FIXED[code]
+        return _unpack_from(fmt, data, pos)[0], pos + width
+    if code == 0xdc:
+        return _decode_array(data, pos + 2, _unpack_from(">H", data, pos)[0], keys)
+    if code == 0xdd:
+        return _decode_array(data, pos + 4, _unpack_from(">I", data, pos)[0], keys)
+    if code == 0xde:
+        return _decode_map(data, pos + 2, _unpack_from(">H", data, pos)[0], keys)
+    if code == 0xdf:
+        return _decode_map(data, pos + 4, _unpack_from(">I", data, pos)[0], keys)
+    raise ValueError(f"Unsupported msgpack type 0x{code:02x} at offset {pos - 1}")
+
+
+def _decode_array(data, pos, size, keys):
+    result = []
+    append = result.append
+    for _ in range(size):
+        value, pos = _decode(data, pos, keys)
+        append(value)
+    return result, pos
+
+
+def _decode_map(data, pos, size, keys):
+    result = {}
+    for _ in range(size):
+        index = data[pos]
+        if index < 0x80:
+            pos += 1
+        else:
+            index, pos = _decode(data, pos, None)
+        result[keys[index]], pos = _decode(data, pos, keys)
+    return result, pos
+
+
+def _decode_with_msgpack(data):
+    keys = None
+
+    def restore_keys(pairs):
+        return {keys[index]: value for index, value in pairs}
+
+    unpacker = msgpack.Unpacker(
+        raw=False,
+        strict_map_key=False,
+        object_pairs_hook=restore_keys,
+        max_buffer_size=len(data) + 1,
+    )
+    unpacker.feed(data)
+    unpacker.read_array_header()
+    # the key table is a list of strings, so restore_keys is not needed for it
+    keys = unpacker.unpack()
+    return unpacker.unpack()
+
+
+def decode(data):
+    data = bytes(data)
+    if not data or data[0] != 0x92:
+        raise ValueError("Not a voyager msgpack message")
+    if msgpack is not None:
+        return _decode_with_msgpack(data)
+    keys, pos = _decode(data, 1, None)
+    value, pos = _decode(data, pos, keys)
+    if pos != len(data):
+        raise ValueError(f"Trailing bytes after msgpack message at offset {pos}")
+    return value
+
+
+class _Encoder:
+    def __init__(self):
+        self.chunks = []
+        self.keys = {}
+
+    def header(self, size, fix, fix_limit, code16, code32):
+        if size < fix_limit:
+            self.chunks.append(bytes((fix | size,)))
+        elif size < 0x10000:
+            self.chunks.append(struct.pack(">BH", code16, size))
+        else:
+            self.chunks.append(struct.pack(">BI", code32, size))
+
+    def uint(self, value):
+        if value < 0x80:
+            self.chunks.append(bytes((value,)))
+        elif value < 0x100:
+            self.chunks.append(struct.pack(">BB", 0xcc, value))
+        elif value < 0x10000:
+            self.chunks.append(struct.pack(">BH", 0xcd, value))
+        elif value < 0x100000000:
+            self.chunks.append(struct.pack(">BI", 0xce, value))
+        else:
+            self.chunks.append(struct.pack(">BQ", 0xcf, value))
+
+    def value(self, value):
+        chunks = self.chunks
+        if value is None:
+            chunks.append(b"\xc0")
+        elif value is True:
+            chunks.append(b"\xc3")
+        elif value is False:
+            chunks.append(b"\xc2")
+        elif isinstance(value, int):
+            if value >= 0:
+                self.uint(value)
+            elif value >= -32:
+                chunks.append(bytes((value & 0xff,)))
+            else:
+                chunks.append(struct.pack(">Bq", 0xd3, value))
+        elif isinstance(value, float):
+            chunks.append(struct.pack(">Bd", 0xcb, value))
+        elif isinstance(value, str):
+            raw = value.encode()
+            size = len(raw)
+            if size < 32:
+                chunks.append(bytes((0xa0 | size,)))
+            elif size < 0x100:
+                chunks.append(struct.pack(">BB", 0xd9, size))
+            else:
+                self.header(size, 0, 0, 0xda, 0xdb)
+            chunks.append(raw)
+        elif isinstance(value, (list, tuple)):
+            self.header(len(value), 0x90, 16, 0xdc, 0xdd)
+            for item in value:
+                self.value(item)
+        elif isinstance(value, dict):
+            self.header(len(value), 0x80, 16, 0xde, 0xdf)
+            for key, item in value.items():
+                key = str(key)
+                if key not in self.keys:
+                    self.keys[key] = len(self.keys)
+                self.uint(self.keys[key])
+                self.value(item)
+        else:
+            raise TypeError(f"Cannot encode {type(value).__name__} as msgpack")
+
+
+def encode(value):
+    payload = _Encoder()
+    payload.value(value)
+    table = _Encoder()
+    table.value(list(payload.keys))
+    return b"\x92" + b"".join(table.chunks) + b"".join(payload.chunks)
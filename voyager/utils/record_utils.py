@@ -24,7 +24,11 @@ class EventRecorder:
         if resume:
             self.resume()
 
-    def record(self, events, task):
+    def record(self, events, task, resources=None):
+        """
+        :param resources: optional resource sample of the mineflayer process, appended
+        to resources.jsonl in the checkpoint dir
+        """
         task = re.sub(r'[\\/:"*?<>| ]', "_", task)
         task = task.replace(" ", "_") + time.strftime(
             "_%Y%m%d_%H%M%S", time.localtime()
@@ -44,6 +48,10 @@ class EventRecorder:
             f"\033[96m****Recorder message: {self.iteration} iteration passed****\033[0m"
         )
         dump_json(events, f_join(self.ckpt_dir, "events", task))
+        if resources is not None:
+            record = {"iteration": self.iteration, "task": task, **resources}
+            with open(f_join(self.ckpt_dir, "resources.jsonl"), "a") as f:
+                f.write(json_dumps(record) + "\n")
 
     def resume(self, cutoff=None):
         self.item_history = set()
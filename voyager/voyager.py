@@ -2,15 +2,20 @@ import copy
 import json
 import os
 import time
-from typing import Dict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional
 
 import voyager.utils as U
 from .env import VoyagerEnv
+from .env.stream import RepeatedErrorPolicy
 
 from .agents import ActionAgent
 from .agents import CriticAgent
 from .agents import CurriculumAgent
 from .agents import SkillManager
+from .agents import LLMCache
+from .agents import EmbeddingService, make_embeddings
+from .agents.llm_cache import evict
 
 
 # TODO: remove event memory
@@ -22,6 +27,16 @@ class Voyager:
         openai_api_key: str = None,
         env_wait_ticks: int = 20,
         env_request_timeout: int = 600,
+        env_wire_format: str = "json",
+        env_delta_observations: bool = False,
+        env_warm_reset: bool = False,
+        env_standby_port: int = None,
+        env_early_abort: bool = False,
+        env_tick_budget: int = None,
+        env_wall_budget: float = None,
+        env_server_command: List[str] = None,
+        env_recycle_thresholds: Dict[str, float] = None,
+        env_watchdog_timeout: Optional[float] = 30.0,
         max_iterations: int = 160,
         reset_placed_if_failed: bool = False,
         action_agent_model_name: str = "gpt-4",
@@ -29,6 +44,7 @@ class Voyager:
         action_agent_task_max_retries: int = 4,
         action_agent_show_chat_log: bool = True,
         action_agent_show_execution_error: bool = True,
+        action_agent_stream: bool = False,
         curriculum_agent_model_name: str = "gpt-4",
         curriculum_agent_temperature: float = 0,
         curriculum_agent_qa_model_name: str = "gpt-3.5-turbo",
@@ -37,13 +53,30 @@ class Voyager:
         curriculum_agent_core_inventory_items: str = r".*_log|.*_planks|stick|crafting_table|furnace"
         r"|cobblestone|dirt|coal|.*_pickaxe|.*_sword|.*_axe",
         curriculum_agent_mode: str = "auto",
+        curriculum_agent_retrieval_backend: str = "numpy",
+        curriculum_agent_qa_max_workers: int = 4,
         critic_agent_model_name: str = "gpt-4",
         critic_agent_temperature: float = 0,
         critic_agent_mode: str = "auto",
+        critic_agent_verifier: str = "on",
         skill_manager_model_name: str = "gpt-3.5-turbo",
         skill_manager_temperature: float = 0,
         skill_manager_retrieval_top_k: int = 5,
+        skill_manager_prune_programs: bool = True,
+        skill_manager_retrieval_backend: str = "numpy",
         openai_api_request_timeout: int = 240,
+        llm_cache_path: str = None,
+        llm_cache_max_entries: int = 100000,
+        llm_cache_max_mb: float = 512,
+        action_agent_llm_cache: bool = True,
+        curriculum_agent_llm_cache: bool = True,
+        critic_agent_llm_cache: bool = True,
+        skill_manager_llm_cache: bool = True,
+        embedding_backend: str = "openai",
+        embedding_cache_path: str = None,
+        embedding_cache_max_entries: int = 10000,
+        parallel_step: bool = True,
+        speculative_curriculum: bool = False,
         ckpt_dir: str = "ckpt",
         skill_library_dir: str = None,
         resume: bool = False,
@@ -61,10 +94,26 @@ class Voyager:
         you should increase this value
         :param env_request_timeout: how many seconds to wait for each step, if the code execution exceeds this time,
         python side will terminate the connection and need to be resumed
+        :param env_wire_format: how mineflayer encodes observations, "json" or "msgpack"
+        :param env_delta_observations: whether mineflayer only sends observation fields that changed
+        :param env_warm_reset: whether to keep the mineflayer process alive across resets
+        :param env_standby_port: port of a pre-spawned mineflayer process used when the active one dies
+        :param env_early_abort: stream events while the code runs and abort it once it keeps failing
+        the same way or the bot keeps getting stuck
+        :param env_tick_budget: how many game ticks the code of one step may run before it is stopped
+        :param env_wall_budget: how many seconds the code of one step may run before it is stopped
+        :param env_server_command: command that starts the mineflayer server instead of node,
+        e.g. voyager.env.standin.COMMAND to run without Minecraft
+        :param env_recycle_thresholds: limits on the resources of the mineflayer process, e.g.
+        {"rss_mb": 2048, "num_fds": 1000}, crossing one restarts the process before the next task
+        :param env_watchdog_timeout: fail a step after mineflayer made no progress for this many seconds
+        instead of waiting for env_request_timeout, None disables the watchdog
         :param reset_placed_if_failed: whether to reset placed blocks if failed, useful for building task
         :param action_agent_model_name: action agent model name
         :param action_agent_temperature: action agent temperature
         :param action_agent_task_max_retries: how many times to retry if failed
+        :param action_agent_stream: stream the action agent response and run the program as soon as the code block of
+        its Code: section closes, the rest of the response is read while the program runs
         :param curriculum_agent_model_name: curriculum agent model name
         :param curriculum_agent_temperature: curriculum agent temperature
         :param curriculum_agent_qa_model_name: curriculum agent qa model name
@@ -87,13 +136,40 @@ class Voyager:
         :param curriculum_agent_core_inventory_items: only show these items in inventory before optional_inventory_items
         reached in warm up
         :param curriculum_agent_mode: "auto" for automatic curriculum, "manual" for human curriculum
+        :param curriculum_agent_retrieval_backend: "numpy" to keep the qa cache question embeddings in an in-process
+        matrix, an existing Chroma vectordb is imported, or "chroma" to keep using Chroma
+        :param curriculum_agent_qa_max_workers: how many curriculum questions are answered concurrently
         :param critic_agent_model_name: critic agent model name
         :param critic_agent_temperature: critic agent temperature
         :param critic_agent_mode: "auto" for automatic critic ,"manual" for human critic
+        :param critic_agent_verifier: "on" to decide countable tasks like "Mine 3 iron ore" from what the inventory gained
+        since the task started without the llm, "shadow" to run both and report how often they agree, "off" to always ask the llm
         :param skill_manager_model_name: skill manager model name
         :param skill_manager_temperature: skill manager temperature
         :param skill_manager_retrieval_top_k: how many skills to retrieve for each task
+        :param skill_manager_prune_programs: only send the skills and control primitives the code of a step can
+        reach through its calls, instead of the whole library
+        :param skill_manager_retrieval_backend: "numpy" to keep the skill embeddings in an in-process matrix, an
+        existing Chroma vectordb is imported on first start, or "chroma" to keep using Chroma
         :param openai_api_request_timeout: how many seconds to wait for openai api
+        :param llm_cache_path: sqlite file caching llm responses across runs, e.g. ckpt/llm_cache.sqlite,
+        identical prompts to the same model with the same parameters are answered from it, None disables it
+        :param llm_cache_max_entries: how many responses the llm cache keeps, least recently used are evicted
+        :param llm_cache_max_mb: how large the cached responses may grow, least recently used are evicted
+        :param action_agent_llm_cache: whether the action agent uses the llm cache
+        :param curriculum_agent_llm_cache: whether the curriculum agent uses the llm cache
+        :param critic_agent_llm_cache: whether the critic agent uses the llm cache
+        :param skill_manager_llm_cache: whether the skill manager uses the llm cache
+        :param embedding_backend: "openai" for OpenAI embeddings, or "hashing" for local feature hashing embeddings
+        that need no network access, e.g. for benchmarks and tests
+        :param embedding_cache_path: sqlite file caching the embeddings of the skill manager and the curriculum
+        agent across runs, defaults to ckpt_dir/embedding_cache.sqlite
+        :param embedding_cache_max_entries: how many embeddings are also kept in memory
+        :param parallel_step: run the step stages that do not depend on the critic (recording, saving the chest
+        memory, skill retrieval) while the critic runs, the time of each stage is printed after every step
+        :param speculative_curriculum: while the action agent retries a task, let the curriculum agent propose the
+        next task in the background, assuming the task fails in the current state, the proposal is used when the
+        rollout ends in the same relevant state and recomputed otherwise
         :param ckpt_dir: checkpoint dir
         :param skill_library_dir: skill library dir
         :param resume: whether to resume from checkpoint
@@ -103,8 +179,18 @@ class Voyager:
             mc_port=mc_port,
             server_port=server_port,
             request_timeout=env_request_timeout,
+            wire_format=env_wire_format,
+            delta_observations=env_delta_observations,
+            warm_reset=env_warm_reset,
+            standby_port=env_standby_port,
+            server_command=env_server_command,
+            recycle_thresholds=env_recycle_thresholds,
+            watchdog_timeout=env_watchdog_timeout,
         )
         self.env_wait_ticks = env_wait_ticks
+        self.env_early_abort = env_early_abort
+        self.env_tick_budget = env_tick_budget
+        self.env_wall_budget = env_wall_budget
         self.reset_placed_if_failed = reset_placed_if_failed
         self.max_iterations = max_iterations
 
@@ -112,6 +198,23 @@ class Voyager:
         os.environ["OPENAI_API_KEY"] = openai_api_key
 
         # init agents
+        self.llm_cache = None
+        if llm_cache_path:
+            self.llm_cache = LLMCache(
+                llm_cache_path,
+                max_entries=llm_cache_max_entries,
+                max_bytes=int(llm_cache_max_mb * 1024 * 1024),
+            )
+
+        def agent_cache(enabled):
+            return self.llm_cache if enabled else None
+
+        self.embeddings = EmbeddingService(
+            make_embeddings(embedding_backend),
+            path=embedding_cache_path or f"{ckpt_dir}/embedding_cache.sqlite",
+            max_memory_entries=embedding_cache_max_entries,
+        )
+
         self.action_agent = ActionAgent(
             model_name=action_agent_model_name,
             temperature=action_agent_temperature,
@@ -120,6 +223,7 @@ class Voyager:
             resume=resume,
             chat_log=action_agent_show_chat_log,
             execution_error=action_agent_show_execution_error,
+            llm_cache=agent_cache(action_agent_llm_cache),
         )
         self.action_agent_task_max_retries = action_agent_task_max_retries
         self.curriculum_agent = CurriculumAgent(
@@ -133,12 +237,18 @@ class Voyager:
             mode=curriculum_agent_mode,
             warm_up=curriculum_agent_warm_up,
             core_inventory_items=curriculum_agent_core_inventory_items,
+            llm_cache=agent_cache(curriculum_agent_llm_cache),
+            embeddings=self.embeddings,
+            retrieval_backend=curriculum_agent_retrieval_backend,
+            qa_max_workers=curriculum_agent_qa_max_workers,
         )
         self.critic_agent = CriticAgent(
             model_name=critic_agent_model_name,
             temperature=critic_agent_temperature,
             request_timout=openai_api_request_timeout,
             mode=critic_agent_mode,
+            verifier=critic_agent_verifier,
+            llm_cache=agent_cache(critic_agent_llm_cache),
         )
         self.skill_manager = SkillManager(
             model_name=skill_manager_model_name,
@@ -147,13 +257,37 @@ class Voyager:
             request_timout=openai_api_request_timeout,
             ckpt_dir=skill_library_dir if skill_library_dir else ckpt_dir,
             resume=True if resume or skill_library_dir else False,
+            llm_cache=agent_cache(skill_manager_llm_cache),
+            retrieval_backend=skill_manager_retrieval_backend,
+            embeddings=self.embeddings,
+            parse_worker=self.action_agent.parse_worker,
+            # a skill library is a source, its imported vectordb is kept with the run
+            vectordb_import_dir=(
+                f"{ckpt_dir}/skill_library_vectordb" if skill_library_dir else None
+            ),
         )
+        self.skill_manager_prune_programs = skill_manager_prune_programs
         self.recorder = U.EventRecorder(ckpt_dir=ckpt_dir, resume=resume)
+        self.action_agent_stream = action_agent_stream
+        self.step_executor = ThreadPoolExecutor(max_workers=3) if parallel_step else None
+        self.step_timings = {}
+        # a manual curriculum asks the user, there is nothing to propose ahead
+        self.speculative_curriculum = (
+            speculative_curriculum and curriculum_agent_mode != "manual"
+        )
+        # a discarded proposal finishes on one worker while the next one starts
+        self.speculation_executor = (
+            ThreadPoolExecutor(max_workers=2) if self.speculative_curriculum else None
+        )
+        # (signature, future of (task, context)) of the proposal running ahead
+        self.speculation = None
         self.resume = resume
 
         # init variables for rollout
         self.action_agent_rollout_num_iter = -1
         self.task = None
+        # the observation the current task started from, for the rule based critic
+        self.task_start = None
         self.context = ""
         self.messages = None
         self.conversations = []
@@ -178,6 +312,7 @@ class Voyager:
             "bot.chat(`/time set ${getNextTime()}`);\n"
             + f"bot.chat('/difficulty {difficulty}');"
         )
+        self.task_start = events[-1][1]
         skills = self.skill_manager.retrieve_skills(query=self.context)
         print(
             f"\033[33mRender Action Agent system message with {len(skills)} skills\033[0m"
@@ -196,31 +331,106 @@ class Voyager:
 
     def close(self):
         self.env.close()
+        if self.action_agent.parse_worker is not None:
+            self.action_agent.parse_worker.close()
+        if self.step_executor is not None:
+            self.step_executor.shutdown()
+        if self.speculation_executor is not None:
+            self.speculation_executor.shutdown(cancel_futures=True)
+
+    def run_stage(self, name, fn, *args, **kwargs):
+        start = time.time()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            self.step_timings[name] = time.time() - start
+
+    def submit_stage(self, name, fn, *args, **kwargs):
+        """
+        Run a stage that the next stages do not wait for on the step executor.
+        :return: a future of its result
+        """
+        if self.step_executor is not None:
+            return self.step_executor.submit(self.run_stage, name, fn, *args, **kwargs)
+        future = Future()
+        try:
+            future.set_result(self.run_stage(name, fn, *args, **kwargs))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def print_step_timings(self, total):
+        stages = ", ".join(
+            f"{name} {seconds:.2f}s" for name, seconds in self.step_timings.items()
+        )
+        print(f"\033[36mStep timings: {stages}, total {total:.2f}s\033[0m")
+
+    def program_sources_for(self, code):
+        if self.skill_manager_prune_programs:
+            return self.skill_manager.program_sources_for(code)
+        return self.skill_manager.program_sources
 
     def step(self):
         if self.action_agent_rollout_num_iter < 0:
             raise ValueError("Agent must be reset before stepping")
-        ai_message = self.action_agent.llm(self.messages)
-        print(f"\033[34m****Action Agent ai message****\n{ai_message.content}\033[0m")
-        self.conversations.append(
-            (self.messages[0].content, self.messages[1].content, ai_message.content)
-        )
-        parsed_result = self.action_agent.process_ai_message(message=ai_message)
+        self.step_timings = {}
+        step_start = time.time()
+        messages = self.messages
+        if self.action_agent_stream:
+            # the program runs while the model may still be writing trailing text
+            parsed_result, ai_message = self.run_stage(
+                "action_llm", self.action_agent.stream_ai_message, messages
+            )
+        else:
+            ai_message = self.run_stage("action_llm", self.action_agent.llm, messages)
+            print(f"\033[34m****Action Agent ai message****\n{ai_message.content}\033[0m")
+            self.conversations.append(
+                (messages[0].content, messages[1].content, ai_message.content)
+            )
+            parsed_result = self.action_agent.process_ai_message(message=ai_message)
         success = False
         if isinstance(parsed_result, dict):
             code = parsed_result["program_code"] + "\n" + parsed_result["exec_code"]
-            events = self.env.step(
+            events = self.run_stage(
+                "env_step",
+                self.env.step,
                 code,
-                programs=self.skill_manager.programs,
+                programs=self.program_sources_for(code),
+                policy=RepeatedErrorPolicy() if self.env_early_abort else None,
+                tick_budget=self.env_tick_budget,
+                wall_budget=self.env_wall_budget,
+            )
+            # recording, the chest memory file and skill retrieval do not depend on
+            # the critic, they run while the critic waits for the llm
+            recording = self.submit_stage(
+                "record",
+                self.recorder.record,
+                events,
+                self.task,
+                resources=self.env.resource_usage(),
+            )
+            self.action_agent.update_chest_memory(
+                events[-1][1]["nearbyChests"], save=False
+            )
+            chest_saving = self.submit_stage(
+                "save_chest_memory", self.action_agent.save_chest_memory
+            )
+            retrieval = self.submit_stage(
+                "retrieve_skills",
+                self.skill_manager.retrieve_skills,
+                query=self.context
+                + "\n\n"
+                + self.action_agent.summarize_chatlog(events),
             )
-            self.recorder.record(events, self.task)
-            self.action_agent.update_chest_memory(events[-1][1]["nearbyChests"])
-            success, critique = self.critic_agent.check_task_success(
+            success, critique = self.run_stage(
+                "critic",
+                self.critic_agent.check_task_success,
                 events=events,
                 task=self.task,
                 context=self.context,
                 chest_observation=self.action_agent.render_chest_observation(),
                 max_retries=5,
+                start=self.task_start,
             )
 
             if self.reset_placed_if_failed and not success:
@@ -233,17 +443,18 @@ class Voyager:
                         position = event["status"]["position"]
                         blocks.append(block)
                         positions.append(position)
-                new_events = self.env.step(
-                    f"await givePlacedItemBack(bot, {U.json_dumps(blocks)}, {U.json_dumps(positions)})",
-                    programs=self.skill_manager.programs,
+                revert_code = f"await givePlacedItemBack(bot, {U.json_dumps(blocks)}, {U.json_dumps(positions)})"
+                new_events = self.run_stage(
+                    "revert_placed",
+                    self.env.step,
+                    revert_code,
+                    programs=self.program_sources_for(revert_code),
                 )
+                # the recorder must see the events as they were
+                recording.result()
                 events[-1][1]["inventory"] = new_events[-1][1]["inventory"]
                 events[-1][1]["voxels"] = new_events[-1][1]["voxels"]
-            new_skills = self.skill_manager.retrieve_skills(
-                query=self.context
-                + "\n\n"
-                + self.action_agent.summarize_chatlog(events)
-            )
+            new_skills = retrieval.result()
             system_message = self.action_agent.render_system_message(skills=new_skills)
             human_message = self.action_agent.render_human_message(
                 events=events,
@@ -254,10 +465,20 @@ class Voyager:
             )
             self.last_events = copy.deepcopy(events)
             self.messages = [system_message, human_message]
+            recording.result()
+            chest_saving.result()
+            self.print_step_timings(time.time() - step_start)
         else:
             assert isinstance(parsed_result, str)
+            # the retry sends the same messages, do not get the same reply back
+            evict(self.action_agent.llm, messages)
             self.recorder.record([], self.task)
             print(f"\033[34m{parsed_result} Trying again!\033[0m")
+        if self.action_agent_stream:
+            ai_message = ai_message.result()
+            self.conversations.append(
+                (messages[0].content, messages[1].content, ai_message.content)
+            )
         assert len(self.messages) == 2
         self.action_agent_rollout_num_iter += 1
         done = (
@@ -281,14 +502,76 @@ class Voyager:
             )
         return self.messages, 0, done, info
 
-    def rollout(self, *, task, context, reset_env=True):
+    def rollout(self, *, task, context, reset_env=True, speculate=False):
+        """
+        :param speculate: propose the next task in the background between retries,
+        see speculative_curriculum
+        """
         self.reset(task=task, context=context, reset_env=reset_env)
         while True:
             messages, reward, done, info = self.step()
             if done:
                 break
+            if speculate and self.last_events:
+                self.speculate_next_task()
         return messages, reward, done, info
 
+    def speculate_next_task(self):
+        # if the task keeps failing the state usually stays as it is now, while a
+        # success changes the inventory and needs a new proposal anyway
+        curriculum_agent = self.curriculum_agent.speculative_copy(
+            {"task": self.task, "success": False}
+        )
+        events = self.last_events
+        chest_observation = self.action_agent.render_chest_observation()
+        signature = curriculum_agent.task_signature(
+            events=events, chest_observation=chest_observation
+        )
+        if self.speculation is not None and self.speculation[0] == signature:
+            return
+        self.discard_speculation()
+        print(f"\033[35mSpeculatively proposing the task after {self.task}\033[0m")
+        future = self.speculation_executor.submit(
+            curriculum_agent.propose_next_task,
+            events=events,
+            chest_observation=chest_observation,
+            max_retries=5,
+        )
+        self.speculation = (signature, future)
+
+    def discard_speculation(self):
+        if self.speculation is None:
+            return
+        _, future = self.speculation
+        self.speculation = None
+        # a proposal already running is left to finish and its result ignored, the
+        # qa cache it may still write to is guarded by the curriculum agent
+        future.cancel()
+
+    def propose_next_task(self):
+        chest_observation = self.action_agent.render_chest_observation()
+        if self.speculation is not None:
+            signature, future = self.speculation
+            current = self.curriculum_agent.task_signature(
+                events=self.last_events, chest_observation=chest_observation
+            )
+            if signature == current:
+                self.speculation = None
+                try:
+                    task, context = future.result()
+                    print(f"\033[35mUsing the speculative proposal {task}\033[0m")
+                    return task, context
+                except Exception as e:
+                    print(f"\033[35mSpeculative proposal failed: {e}\033[0m")
+            else:
+                print("\033[35mState changed, discarding the speculative proposal\033[0m")
+                self.discard_speculation()
+        return self.curriculum_agent.propose_next_task(
+            events=self.last_events,
+            chest_observation=chest_observation,
+            max_retries=5,
+        )
+
     def learn(self, reset_env=True):
         if self.resume:
             # keep the inventory
@@ -313,11 +596,13 @@ class Voyager:
             if self.recorder.iteration > self.max_iterations:
                 print("Iteration limit reached")
                 break
-            task, context = self.curriculum_agent.propose_next_task(
-                events=self.last_events,
-                chest_observation=self.action_agent.render_chest_observation(),
-                max_retries=5,
-            )
+            reasons = self.env.needs_recycle()
+            if reasons:
+                print(
+                    f"\033[33mRecycling mineflayer before the next task: {', '.join(reasons)}\033[0m"
+                )
+                self.env.recycle()
+            task, context = self.propose_next_task()
             print(
                 f"\033[35mStarting task {task} for at most {self.action_agent_task_max_retries} times\033[0m"
             )
@@ -326,6 +611,7 @@ class Voyager:
                     task=task,
                     context=context,
                     reset_env=reset_env,
+                    speculate=self.speculative_curriculum,
                 )
             except Exception as e:
                 time.sleep(3)  # wait for mineflayer to exit
@@ -358,6 +644,23 @@ class Voyager:
                 f"\033[35mFailed tasks: {', '.join(self.curriculum_agent.failed_tasks)}\033[0m"
             )
 
+        stats = self.critic_agent.verifier_stats
+        if stats["checked"]:
+            print(
+                f"\033[36mRule based critic: resolved {stats['resolved']}/{stats['checked']} checks, "
+                f"agreed with the llm on {stats['agreed']}/{stats['compared']}\033[0m"
+            )
+        if self.llm_cache is not None:
+            stats = self.llm_cache.stats()
+            print(
+                f"\033[36mLLM cache: {stats['hits']} hits, {stats['misses']} misses, "
+                f"{stats['entries']} cached responses\033[0m"
+            )
+        stats = self.embeddings.stats()
+        print(
+            f"\033[36mEmbeddings: {stats['memory_hits']} memory hits, {stats['disk_hits']} disk hits, "
+            f"{stats['misses']} embedded in {stats['requests']} requests\033[0m"
+        )
         return {
             "completed_tasks": self.curriculum_agent.completed_tasks,
             "failed_tasks": self.curriculum_agent.failed_tasks,